@@ -1,7 +1,7 @@
 """
 答案数据模型 - 支持多答案存储
 """
-from sqlalchemy import Column, Integer, String, Text, Float, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Float, DateTime, Boolean, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from api.database import Base
@@ -12,7 +12,7 @@ class Answer(Base):
     __tablename__ = "answers"
     
     id = Column(Integer, primary_key=True, index=True)
-    question_id = Column(Integer, ForeignKey("questions.id", ondelete="CASCADE"), index=True)
+    question_id = Column(Integer, ForeignKey("questions.id", ondelete="CASCADE"))
     
     # 答案内容
     answer = Column(Text, nullable=False)  # 答案（单选：A，多选：A,B,C，填空：文本）
@@ -39,6 +39,15 @@ class Answer(Base):
     # 关联关系
     question = relationship("Question", back_populates="answers")
     
+    __table_args__ = (
+        # 答案去重: WHERE question_id = ? AND source = ? AND answer = ?，前缀兼作按题目查询答案的索引
+        Index("ux_answers_dedupe", "question_id", "source", "answer", unique=True).ddl_if(dialect="sqlite"),
+        # PostgreSQL B-tree单条记录有长度上限，长答案按md5建索引
+        Index(
+            "ux_answers_dedupe_md5", question_id, source, func.md5(answer), unique=True
+        ).ddl_if(dialect="postgresql"),
+    )
+    
     def to_dict(self):
         """转换为字典"""
         return {
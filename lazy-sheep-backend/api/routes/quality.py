@@ -140,6 +140,37 @@ async def auto_fix(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/recompute-best-answers", response_model=dict)
+async def recompute_best_answers(
+    platform: Optional[str] = None,
+    chunk_size: int = Query(1000, ge=100, le=10000),
+    session: AsyncSession = Depends(get_db)
+):
+    """
+    按当前排序规则全量重算最佳答案（管理接口）
+    
+    参数：
+    - platform: 只处理指定平台（默认全部）
+    - chunk_size: 每段题目数（100-10000）
+    
+    返回：
+    - questionsScanned: 扫描题目数
+    - answersChanged / questionsChanged: 修改的答案/题目行数
+    - questionsPerSecond: 处理速度
+    """
+    try:
+        stats = await QualityService.recompute_best_answers(session, platform, chunk_size)
+        
+        return {
+            "success": True,
+            **stats
+        }
+        
+    except Exception as e:
+        logger.error(f"重算最佳答案失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/stats", response_model=dict)
 async def quality_stats(
     session: AsyncSession = Depends(get_db)
@@ -4,11 +4,14 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
+from api.config import get_settings
 from api.database import get_db
 from api.services.search_service import SearchService
 from loguru import logger
 import uuid
 
+settings = get_settings()
+
 router = APIRouter(prefix="/api", tags=["upload"])
 
 
@@ -42,8 +45,8 @@ async def upload(
         # 生成questionId
         question_id = str(uuid.uuid4())
         
-        # 保存到数据库
-        success = await SearchService.save_question(
+        # 加入写入队列（队列不可用时同步保存）
+        success = await SearchService.save_question_deferred(
             question_data={
                 "questionId": question_id,
                 "questionContent": request.questionContent,
@@ -74,3 +77,58 @@ async def upload(
     except Exception as e:
         logger.error(f"上传失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+class BatchUploadRequest(BaseModel):
+    """批量上传请求"""
+    questions: list[UploadRequest]
+
+
+class BatchUploadResponse(BaseModel):
+    """批量上传响应"""
+    results: list[dict]
+    summary: dict
+
+
+@router.post("/upload/batch", response_model=BatchUploadResponse)
+async def batch_upload(
+    request: BatchUploadRequest,
+    session: AsyncSession = Depends(get_db)
+):
+    """批量上传题目和答案（一个事务内集合化写入）"""
+    if len(request.questions) > settings.upload_batch_max_size:
+        raise HTTPException(
+            status_code=400,
+            detail=f"单次最多上传{settings.upload_batch_max_size}道题"
+        )
+    
+    try:
+        logger.info(f"批量上传: {len(request.questions)}道题")
+        
+        items = [
+            {
+                "questionId": str(uuid.uuid4()),
+                "questionContent": q.questionContent,
+                "type": q.type,
+                "answer": q.answer,
+                "answerText": q.answerText,
+                "options": q.options,
+                "platform": q.platform,
+                "source": q.source,
+                "confidence": 0.90,  # 用户上传默认90%
+                "verified": False
+            }
+            for q in request.questions
+        ]
+        
+        results = await SearchService.batch_save_questions(items, session)
+        
+        summary = {"total": len(results)}
+        for status in ("created", "updated", "unchanged", "failed"):
+            summary[status] = sum(1 for r in results if r["status"] == status)
+        
+        return {"results": results, "summary": summary}
+        
+    except Exception as e:
+        logger.error(f"批量上传失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,10 +1,14 @@
 """
 质量审核服务 - 自动检测和标记质量问题
 """
-from typing import List, Dict
+import time
+from typing import List, Dict, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, func
+from sqlalchemy import select, update, delete, and_, or_, func
 from api.models import Question, Answer
+from api.services.answer_service import AnswerService
+from api.services.search_service import SearchService
+from api.utils.cache import invalidate_question
 from loguru import logger
 
 
@@ -186,8 +190,8 @@ class QualityService:
         自动修复质量问题
         
         修复项：
-        1. 自动设置最佳答案（如果缺失）
-        2. 删除负投票过多的答案
+        1. 删除负投票过多的答案
+        2. 自动设置最佳答案（如果缺失或已被删除）
         
         Args:
             session: 数据库会话
@@ -197,6 +201,7 @@ class QualityService:
             Dict: 修复结果
         """
         fixed_issues = []
+        question = None
         
         # 获取审核结果
         audit = await QualityService.audit_question(session, question_id)
@@ -212,45 +217,30 @@ class QualityService:
         result = await session.execute(stmt)
         answers = result.scalars().all()
         
-        # 1. 自动设置最佳答案
+        # 1. 删除负投票过多的答案（-5以下）
+        removed_accepted = False
+        for ans in answers:
+            if ans.vote_count <= -5 and not ans.verified:
+                removed_accepted = removed_accepted or ans.is_accepted
+                await session.delete(ans)
+                fixed_issues.append(f"删除负投票答案: {ans.id}")
+        
+        # 2. 自动设置最佳答案（缺失或已被删除时全量重选）
         no_best_answer = any(
-            issue["type"] == "no_best_answer" 
+            issue["type"] in ("no_best_answer", "multiple_best_answers")
             for issue in audit["issues"]
         )
         
-        if no_best_answer and answers:
-            # 按优先级选择
-            def answer_priority(ans: Answer) -> tuple:
-                return (
-                    ans.verified,
-                    ans.source == "platform_verified",
-                    ans.vote_count,
-                    ans.confidence
-                )
-            
-            best_answer = max(answers, key=answer_priority)
-            best_answer.is_accepted = True
-            
-            # 更新Question表
-            stmt = select(Question).where(Question.id == question_id)
-            result = await session.execute(stmt)
-            question = result.scalar_one_or_none()
-            
+        if no_best_answer or removed_accepted:
+            question = await SearchService.refresh_best_answer(session, question_id)
             if question:
-                question.answer = best_answer.answer
-                question.answer_text = best_answer.answer_text
-                question.source = best_answer.source
-                question.confidence = best_answer.confidence
-            
-            fixed_issues.append("设置最佳答案")
-        
-        # 2. 删除负投票过多的答案（-5以下）
-        for ans in answers:
-            if ans.vote_count <= -5 and not ans.verified:
-                await session.delete(ans)
-                fixed_issues.append(f"删除负投票答案: {ans.id}")
+                fixed_issues.append("设置最佳答案")
         
         await session.commit()
+        if fixed_issues:
+            await invalidate_question(question_id)
+        if question:
+            SearchService.publish_answer(question)
         
         return {
             "questionId": audit["questionId"],
@@ -259,6 +249,233 @@ class QualityService:
             "count": len(fixed_issues)
         }
     
+    @staticmethod
+    async def recompute_best_answers(
+        session: AsyncSession,
+        platform: Optional[str] = None,
+        chunk_size: int = 1000
+    ) -> Dict:
+        """
+        全量重算最佳答案（排序规则变更后使用）
+        
+        按题目主键分段，每段用窗口函数 ROW_NUMBER() OVER (PARTITION BY question_id)
+        选出每题排名第一的答案，再用三条集合化UPDATE修正is_accepted标记和
+        Question表的冗余字段，只改动结果有变化的行，每段提交一次。
+        
+        Args:
+            session: 数据库会话
+            platform: 只处理指定平台（None为全部）
+            chunk_size: 每段题目数
+            
+        Returns:
+            Dict: 扫描题目数、修改的答案/题目行数和吞吐量
+        """
+        start = time.perf_counter()
+        last_id = 0
+        scanned = 0
+        answers_changed = 0
+        questions_changed = 0
+        
+        while True:
+            stmt = select(Question.id).where(Question.id > last_id)
+            if platform:
+                stmt = stmt.where(Question.platform == platform)
+            ids = (await session.execute(stmt.order_by(Question.id).limit(chunk_size))).scalars().all()
+            if not ids:
+                break
+            
+            chunk = select(Question.id).where(Question.id.between(ids[0], ids[-1]))
+            if platform:
+                chunk = chunk.where(Question.platform == platform)
+            ranked = select(
+                Answer.id,
+                Answer.question_id,
+                Answer.answer,
+                Answer.answer_text,
+                Answer.source,
+                Answer.confidence,
+                func.row_number().over(
+                    partition_by=Answer.question_id,
+                    order_by=AnswerService.best_answer_order()
+                ).label("rank")
+            ).where(Answer.question_id.in_(chunk)).subquery()
+            winners = select(ranked).where(ranked.c.rank == 1).subquery()
+            
+            # 1. 取消非最佳答案的标记，补上最佳答案的标记
+            result = await session.execute(
+                update(Answer).where(
+                    Answer.question_id.in_(chunk),
+                    Answer.is_accepted == True,
+                    Answer.id.not_in(select(winners.c.id))
+                ).values(is_accepted=False),
+                execution_options={"synchronize_session": False}
+            )
+            answers_changed += result.rowcount
+            result = await session.execute(
+                update(Answer).where(
+                    Answer.id.in_(select(winners.c.id)),
+                    or_(Answer.is_accepted.is_(None), Answer.is_accepted == False)
+                ).values(is_accepted=True),
+                execution_options={"synchronize_session": False}
+            )
+            answers_changed += result.rowcount
+            
+            # 2. 同步Question表冗余字段（UPDATE ... FROM，只更新有差异的题目）
+            stmt = update(Question).where(
+                Question.id == winners.c.question_id,
+                or_(
+                    Question.answer.is_distinct_from(winners.c.answer),
+                    Question.answer_text.is_distinct_from(winners.c.answer_text),
+                    Question.source.is_distinct_from(winners.c.source),
+                    Question.confidence.is_distinct_from(winners.c.confidence)
+                )
+            ).values(
+                answer=winners.c.answer,
+                answer_text=winners.c.answer_text,
+                source=winners.c.source,
+                confidence=winners.c.confidence
+            ).returning(Question.id)
+            changed_ids = (await session.execute(
+                stmt, execution_options={"synchronize_session": False}
+            )).scalars().all()
+            await session.commit()
+            
+            # 3. 失效缓存并更新共享答案表
+            if changed_ids:
+                stmt = select(Question).where(Question.id.in_(changed_ids))
+                for question in (await session.execute(stmt)).scalars().all():
+                    await invalidate_question(question.id)
+                    SearchService.publish_answer(question)
+            
+            scanned += len(ids)
+            questions_changed += len(changed_ids)
+            last_id = ids[-1]
+            logger.info(f"重算最佳答案: 已处理{scanned}题, 修改答案{answers_changed}行, 题目{questions_changed}行")
+        
+        elapsed = time.perf_counter() - start
+        return {
+            "platform": platform,
+            "questionsScanned": scanned,
+            "answersChanged": answers_changed,
+            "questionsChanged": questions_changed,
+            "elapsedSeconds": round(elapsed, 2),
+            "questionsPerSecond": round(scanned / elapsed, 1) if elapsed > 0 else 0.0
+        }
+    
+    @staticmethod
+    async def merge_duplicate_questions(session: AsyncSession, chunk_size: int = 200) -> Dict:
+        """
+        合并重复题目和重复答案（创建唯一索引ux_questions_hash_platform/ux_answers_dedupe前执行）
+        
+        规范化hash和平台相同的题目保留id最小的一个，其余题目的答案改挂到保留的题目上，
+        来源和内容相同的答案合并为一条（投票数相加，置信度取最大值），然后删除多余题目，
+        按最佳答案规则重选。每chunk_size组提交一次。
+        
+        Args:
+            session: 数据库会话
+            chunk_size: 每次提交处理的重复组数
+            
+        Returns:
+            Dict: 重复组数、删除的题目数、改挂/合并的答案数
+        """
+        stmt = select(Question.normalized_hash, Question.platform).where(
+            Question.normalized_hash.isnot(None)
+        ).group_by(Question.normalized_hash, Question.platform).having(func.count() > 1)
+        groups = (await session.execute(stmt)).all()
+        
+        removed = 0
+        moved = 0
+        merged = 0
+        for start in range(0, len(groups), chunk_size):
+            survivors = []
+            losers = []
+            for nhash, platform in groups[start:start + chunk_size]:
+                stmt = select(Question).where(
+                    Question.normalized_hash == nhash,
+                    Question.platform == platform
+                ).order_by(Question.id)
+                questions = (await session.execute(stmt)).scalars().all()
+                survivor, others = questions[0], questions[1:]
+                survivor.verified = any(q.verified for q in questions)
+                if not survivor.options:
+                    survivor.options = next((q.options for q in others if q.options), None)
+                
+                # 保留题目自己的答案排在前面，作为合并目标
+                stmt = select(Answer).where(
+                    Answer.question_id.in_([q.id for q in questions])
+                ).order_by((Answer.question_id == survivor.id).desc(), Answer.id)
+                answers = (await session.execute(stmt)).scalars().all()
+                group_moved, group_merged = await QualityService._merge_answers(session, survivor.id, answers)
+                moved += group_moved
+                merged += group_merged
+                survivors.append(survivor.id)
+                losers.extend(q.id for q in others)
+            
+            await session.flush()
+            await session.execute(
+                delete(Question).where(Question.id.in_(losers)),
+                execution_options={"synchronize_session": False}
+            )
+            removed += len(losers)
+            await SearchService._refresh_best_answers(session, survivors)
+            await session.commit()
+            logger.info(f"合并重复题目: 已处理{min(start + chunk_size, len(groups))}/{len(groups)}组, 删除题目{removed}")
+        
+        # 非重复题目中的重复答案（同样会阻碍ux_answers_dedupe创建）
+        stmt = select(Answer.question_id).group_by(
+            Answer.question_id, Answer.source, Answer.answer
+        ).having(func.count() > 1)
+        question_ids = sorted(set((await session.execute(stmt)).scalars().all()))
+        for start in range(0, len(question_ids), chunk_size):
+            chunk = question_ids[start:start + chunk_size]
+            stmt = select(Answer).where(Answer.question_id.in_(chunk)).order_by(Answer.id)
+            answers_by_question: Dict[int, List[Answer]] = {}
+            for ans in (await session.execute(stmt)).scalars().all():
+                answers_by_question.setdefault(ans.question_id, []).append(ans)
+            for question_id, answers in answers_by_question.items():
+                merged += (await QualityService._merge_answers(session, question_id, answers))[1]
+            await session.flush()
+            await SearchService._refresh_best_answers(session, chunk)
+            await session.commit()
+        
+        return {
+            "duplicateGroups": len(groups),
+            "questionsRemoved": removed,
+            "answersMoved": moved,
+            "answersMerged": merged
+        }
+    
+    @staticmethod
+    async def _merge_answers(session: AsyncSession, question_id: int, answers: List[Answer]) -> tuple:
+        """
+        将答案合并到指定题目下（不提交）
+        
+        来源和内容相同的答案只保留先出现的一条（投票数相加，置信度取最大值），
+        其余答案改挂到question_id。
+        
+        Returns:
+            tuple: (改挂的答案数, 合并删除的答案数)
+        """
+        kept: Dict[tuple, Answer] = {}
+        moved = 0
+        merged = 0
+        for ans in answers:
+            key = (ans.source, ans.answer)
+            target = kept.get(key)
+            if target is None:
+                if ans.question_id != question_id:
+                    ans.question_id = question_id
+                    moved += 1
+                kept[key] = ans
+                continue
+            target.vote_count = (target.vote_count or 0) + (ans.vote_count or 0)
+            target.confidence = max(target.confidence or 0.0, ans.confidence or 0.0)
+            target.verified = bool(target.verified or ans.verified)
+            target.answer_text = target.answer_text or ans.answer_text
+            await session.delete(ans)
+            merged += 1
+        return moved, merged
+    
     @staticmethod
     async def get_quality_stats(session: AsyncSession) -> Dict:
         """
@@ -0,0 +1,191 @@
+"""
+布隆过滤器 - 快速判定题目必定不存在，跳过questionId/hash精确查询
+
+键为 "平台:questionId" 和 "平台:规范化hash"，按平台隔离。
+与共享答案表相同，位图分配在匿名共享mmap中，由gunicorn主进程构建、所有worker共享，
+任一worker保存题目后其他worker立即可见，不会出现假阴性。
+
+双缓冲位图：写入同时置位两个缓冲区，定期重建时先清空非活动缓冲区、
+从数据库重新填充，再切换活动缓冲区，以清除已删除题目留下的位、恢复误判率。
+
+写入由跨进程锁保护，每次只为单个键持锁，不阻塞其他worker的事件循环。
+锁带超时：持锁的worker异常退出后锁无法释放，等待超时即停用过滤器
+（一律判定为可能存在，照常查询数据库），跳过写入会产生假阴性，不能继续使用。
+"""
+import hashlib
+import math
+import mmap
+import multiprocessing
+import struct
+import time
+
+from loguru import logger
+
+from api.config import get_settings
+
+settings = get_settings()
+
+# 表头: 位数 u64 | 哈希函数数 u32 | 活动缓冲区 u8 | 是否已构建 u8 | 构建时间 f64 | 重建认领时间 f64
+_HEADER = struct.Struct("<QIBBdd")
+_HEADER_SIZE = 64
+_ACTIVE_OFFSET = 12
+_BUILT_OFFSET = 13
+_BUILT_AT_OFFSET = 14
+_CLAIM_OFFSET = 22
+_DISABLED_OFFSET = 30
+# 重建认领超时（秒），认领的worker异常退出后允许其他worker重新认领
+_CLAIM_TIMEOUT = 600
+# 锁最长等待时间（秒），正常持锁时间为微秒级（清空缓冲区为毫秒级）
+_LOCK_TIMEOUT = 1.0
+
+
+class SharedBloomFilter:
+    """共享内存双缓冲布隆过滤器"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        bits = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 64)
+        self.bits = (bits + 7) // 8 * 8
+        self.hash_count = max(round(self.bits / capacity * math.log(2)), 1)
+        self._buffer_size = self.bits // 8
+        self._mm = mmap.mmap(-1, _HEADER_SIZE + 2 * self._buffer_size)
+        self._lock = multiprocessing.Lock()
+        _HEADER.pack_into(self._mm, 0, self.bits, self.hash_count, 0, 0, 0.0, 0.0)
+        self.checks = 0
+        self.negatives = 0
+
+    @property
+    def built(self) -> bool:
+        return bool(self._mm[_BUILT_OFFSET])
+
+    @property
+    def disabled(self) -> bool:
+        return bool(self._mm[_DISABLED_OFFSET])
+
+    @property
+    def built_at(self) -> float:
+        return struct.unpack_from("<d", self._mm, _BUILT_AT_OFFSET)[0]
+
+    def _positions(self, platform: str, value: str) -> list[int]:
+        digest = hashlib.md5(f"{platform}:{value}".encode()).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hash_count)]
+
+    def might_contain(self, platform: str, value: str | None) -> bool:
+        """可能存在返回True；未构建时一律返回True（不跳过查询）"""
+        if not value or not self.built or self.disabled:
+            return True
+        self.checks += 1
+        base = _HEADER_SIZE + self._mm[_ACTIVE_OFFSET] * self._buffer_size
+        mm = self._mm
+        for pos in self._positions(platform, value):
+            if not mm[base + (pos >> 3)] & (1 << (pos & 7)):
+                self.negatives += 1
+                return False
+        return True
+
+    def add(self, platform: str, value: str | None):
+        """添加键（同时写入两个缓冲区，重建期间的写入不会丢失）"""
+        if not value:
+            return
+        positions = self._positions(platform, value)
+        if not self._acquire():
+            return
+        try:
+            for buffer in (0, 1):
+                self._set_bits(_HEADER_SIZE + buffer * self._buffer_size, positions)
+        finally:
+            self._lock.release()
+
+    def _acquire(self) -> bool:
+        """获取写锁，超时则停用过滤器并返回False"""
+        if self.disabled:
+            return False
+        if self._lock.acquire(timeout=_LOCK_TIMEOUT):
+            return True
+        self._mm[_DISABLED_OFFSET] = 1
+        logger.error("布隆过滤器锁等待超时（持锁的worker可能已异常退出），已停用布隆过滤器")
+        return False
+
+    def _set_bits(self, base: int, positions: list[int]):
+        mm = self._mm
+        for pos in positions:
+            index = base + (pos >> 3)
+            mm[index] = mm[index] | (1 << (pos & 7))
+
+    def try_claim_rebuild(self, interval: float) -> bool:
+        """距上次构建超过interval秒且无其他worker正在重建时认领重建"""
+        now = time.time()
+        if not self._acquire():
+            return False
+        try:
+            claimed_at = struct.unpack_from("<d", self._mm, _CLAIM_OFFSET)[0]
+            if self.built and now - self.built_at < interval:
+                return False
+            if now - claimed_at < _CLAIM_TIMEOUT:
+                return False
+            struct.pack_into("<d", self._mm, _CLAIM_OFFSET, now)
+        finally:
+            self._lock.release()
+        return True
+
+    def begin_rebuild(self) -> int | None:
+        """清空非活动缓冲区，返回其编号（过滤器已停用时返回None）"""
+        if not self._acquire():
+            return None
+        try:
+            inactive = 1 - self._mm[_ACTIVE_OFFSET]
+            start = _HEADER_SIZE + inactive * self._buffer_size
+            self._mm[start:start + self._buffer_size] = bytes(self._buffer_size)
+        finally:
+            self._lock.release()
+        return inactive
+
+    def add_to_buffer(self, buffer: int, items: list[tuple[str, str]]):
+        """重建期间批量写入非活动缓冲区（逐个键持锁，不长时间阻塞其他worker的写入）"""
+        base = _HEADER_SIZE + buffer * self._buffer_size
+        for platform, value in items:
+            if not value:
+                continue
+            positions = self._positions(platform, value)
+            if not self._acquire():
+                return
+            try:
+                self._set_bits(base, positions)
+            finally:
+                self._lock.release()
+
+    def finish_rebuild(self, buffer: int):
+        """切换活动缓冲区并记录构建时间"""
+        if not self._acquire():
+            return
+        try:
+            self._mm[_ACTIVE_OFFSET] = buffer
+            self._mm[_BUILT_OFFSET] = 1
+            struct.pack_into("<dd", self._mm, _BUILT_AT_OFFSET, time.time(), 0.0)
+        finally:
+            self._lock.release()
+
+    def stats(self) -> dict:
+        """构建状态与判定统计（统计数为当前进程）"""
+        return {
+            "built": self.built,
+            "disabled": self.disabled,
+            "bits": self.bits,
+            "hashCount": self.hash_count,
+            "builtAt": self.built_at or None,
+            "checks": self.checks,
+            "negatives": self.negatives
+        }
+
+
+def _create_filter() -> SharedBloomFilter | None:
+    if not settings.bloom_filter_enabled:
+        return None
+    bloom = SharedBloomFilter(settings.bloom_capacity, settings.bloom_error_rate)
+    logger.debug(f"布隆过滤器已分配: {bloom.bits}位 x 2, {bloom.hash_count}个哈希函数")
+    return bloom
+
+
+# 全局题目布隆过滤器（bloom_filter_enabled=False时为None）
+question_filter = _create_filter()
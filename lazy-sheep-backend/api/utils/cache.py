@@ -0,0 +1,122 @@
+"""
+进程内LRU/TTL缓存 - 搜索热点题目结果
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from api.config import get_settings
+from api.utils.redis_cache import shared_cache
+
+settings = get_settings()
+
+
+class TTLCache:
+    """
+    有容量上限和过期时间的LRU缓存
+
+    每个条目可关联一个标签（题目主键），按标签批量失效，
+    用于答案变更后清除该题目的所有缓存键。
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any, Any]] = OrderedDict()
+        self._tags: dict[Any, set[Hashable]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Any | None:
+        """读取缓存，过期或不存在返回None"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expire_at, value, _ = entry
+        if expire_at < time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, tag: Any = None):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        if self.max_size <= 0:
+            return
+        if key in self._data:
+            self._remove(key)
+
+        self._data[key] = (time.monotonic() + self.ttl, value, tag)
+        if tag is not None:
+            self._tags.setdefault(tag, set()).add(key)
+
+        while len(self._data) > self.max_size:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def delete(self, key: Hashable):
+        """删除单个键"""
+        if key in self._data:
+            self._remove(key)
+
+    def invalidate_tag(self, tag: Any):
+        """删除关联到标签的所有键"""
+        for key in list(self._tags.get(tag, ())):
+            self._remove(key)
+
+    def clear(self):
+        """清空缓存"""
+        self._data.clear()
+        self._tags.clear()
+
+    def stats(self) -> dict:
+        """命中统计"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxSize": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRate": round(self.hits / total, 4) if total else 0.0
+        }
+
+    def _remove(self, key: Hashable):
+        _, _, tag = self._data.pop(key)
+        if tag is not None:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+# 搜索结果缓存: 键为 ("id", platform, questionId) 或 ("hash", platform, normalized_hash)，
+# 标签为 Question.id
+search_cache = TTLCache(
+    max_size=settings.search_cache_size,
+    ttl=settings.search_cache_ttl
+)
+
+# AI答案缓存: 键为AIService请求指纹，值为按选项文本保存的答案（选项乱序的请求共用）
+ai_cache = TTLCache(
+    max_size=settings.ai_cache_size,
+    ttl=settings.ai_cache_ttl
+)
+
+
+async def invalidate_question(question_id: int):
+    """题目答案变更后清除其搜索缓存（本进程 + Redis共享缓存）"""
+    search_cache.invalidate_tag(question_id)
+    await shared_cache.invalidate_question(question_id)
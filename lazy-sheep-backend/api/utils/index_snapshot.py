@@ -0,0 +1,225 @@
+"""
+搜索索引快照 - n-gram倒排索引的只读二进制文件，worker启动时mmap加载
+
+文件格式（本机字节序，加载时校验）:
+    magic "LSNI" | 格式版本 u32 | 目录长度 u32 | 目录JSON | 对齐到8字节的数组区
+
+目录记录水位（快照包含的最大题目主键、最大updated_at）和各分区数组的偏移。
+每个分区（平台+题型）包含:
+    doc_ids      int64[文档数]   题目主键（升序）
+    doc_sizes    uint32[文档数]  文档n-gram数（Dice系数分母）
+    term_offsets uint32[词数+1]  倒排表在postings中的区间
+    postings     uint32[总数]    文档序号
+    slot_keys    uint64[槽位数]  开放寻址哈希表：n-gram键
+    slot_terms   uint32[槽位数]  开放寻址哈希表：词序号+1（0为空槽）
+
+快照之后新增/变更的题目由调用方按水位从数据库补齐，写入NgramIndex的增量部分。
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+
+from loguru import logger
+
+MAGIC = b"LSNI"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sII")
+_ARRAYS = (
+    ("doc_ids", "q"),
+    ("doc_sizes", "I"),
+    ("term_offsets", "I"),
+    ("postings", "I"),
+    ("slot_keys", "Q"),
+    ("slot_terms", "I"),
+)
+
+
+def gram_key(gram: str) -> int:
+    """n-gram -> 稳定的64位键（跨进程一致，不能用内置hash）"""
+    return int.from_bytes(hashlib.blake2b(gram.encode(), digest_size=8).digest(), "little")
+
+
+class SnapshotPartition:
+    """快照中的单个分区（只读，数据直接引用mmap内存）"""
+
+    def __init__(self, arrays: dict[str, memoryview]):
+        self.doc_ids = arrays["doc_ids"]
+        self.doc_sizes = arrays["doc_sizes"]
+        self._term_offsets = arrays["term_offsets"]
+        self._postings = arrays["postings"]
+        self._slot_keys = arrays["slot_keys"]
+        self._slot_terms = arrays["slot_terms"]
+        self._mask = len(self._slot_keys) - 1
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def __contains__(self, doc_id: int) -> bool:
+        i = bisect_left(self.doc_ids, doc_id)
+        return i < len(self.doc_ids) and self.doc_ids[i] == doc_id
+
+    def postings(self, gram: str) -> memoryview | tuple:
+        """n-gram的倒排表（文档序号），线性探测查找"""
+        key = gram_key(gram)
+        slot = key & self._mask
+        while True:
+            term = self._slot_terms[slot]
+            if term == 0:
+                return ()
+            if self._slot_keys[slot] == key:
+                return self._postings[self._term_offsets[term - 1]:self._term_offsets[term]]
+            slot = (slot + 1) & self._mask
+
+
+class IndexSnapshot:
+    """已加载的索引快照（未加载时所有分区为None）"""
+
+    def __init__(self):
+        self.path: str | None = None
+        self.watermark_id = 0
+        self.watermark_time = 0.0
+        self._partitions: dict[tuple, SnapshotPartition] = {}
+        self._mmap: mmap.mmap | None = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._mmap is not None
+
+    def partition(self, key: tuple) -> SnapshotPartition | None:
+        """获取分区，key为 (platform, question_type)"""
+        return self._partitions.get(key)
+
+    def load(self, path: str) -> bool:
+        """mmap只读加载快照文件，文件不存在或版本不符时返回False"""
+        if not os.path.exists(path):
+            return False
+
+        try:
+            with open(path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, directory_size = _HEADER.unpack_from(mm, 0)
+            if magic != MAGIC or version != FORMAT_VERSION:
+                logger.warning(f"索引快照版本不兼容，已忽略: {path} (version={version})")
+                mm.close()
+                return False
+
+            directory = json.loads(mm[_HEADER.size:_HEADER.size + directory_size])
+            if directory["byteorder"] != sys.byteorder:
+                logger.warning(f"索引快照字节序不符，已忽略: {path}")
+                mm.close()
+                return False
+
+            view = memoryview(mm)
+            partitions = {}
+            for item in directory["partitions"]:
+                arrays = {}
+                for name, typecode in _ARRAYS:
+                    offset, length = item[name]
+                    size = array(typecode).itemsize
+                    arrays[name] = view[offset:offset + length * size].cast(typecode)
+                partitions[(item["platform"], item["type"])] = SnapshotPartition(arrays)
+        except Exception as e:
+            logger.warning(f"索引快照加载失败，将从数据库构建索引: {e}")
+            return False
+
+        self.path = path
+        self.watermark_id = directory["watermark_id"]
+        self.watermark_time = directory["watermark_time"]
+        self._partitions = partitions
+        self._mmap = mm
+        docs = sum(len(p) for p in partitions.values())
+        logger.info(f"索引快照已加载: {path}, {len(partitions)}个分区, {docs}题, 水位id={self.watermark_id}")
+        return True
+
+
+def write_snapshot(
+    path: str,
+    partitions: dict[tuple, list[tuple[int, frozenset[str]]]],
+    watermark_id: int,
+    watermark_time: float
+):
+    """
+    写入索引快照（先写临时文件再原子替换，已mmap旧文件的worker不受影响）
+
+    Args:
+        path: 快照文件路径
+        partitions: {(platform, question_type): [(题目主键, n-gram集合), ...]}
+        watermark_id: 快照包含的最大题目主键
+        watermark_time: 快照包含的最大updated_at（Unix时间戳）
+    """
+    blobs = []
+    directory = {
+        "byteorder": sys.byteorder,
+        "watermark_id": watermark_id,
+        "watermark_time": watermark_time,
+        "partitions": []
+    }
+
+    for (platform, question_type), docs in partitions.items():
+        docs = sorted(docs)
+        term_docs: dict[int, list[int]] = {}
+        for ordinal, (_, grams) in enumerate(docs):
+            for gram in grams:
+                term_docs.setdefault(gram_key(gram), []).append(ordinal)
+
+        term_offsets = array("I", [0])
+        postings = array("I")
+        capacity = 1
+        while capacity < len(term_docs) * 2:
+            capacity <<= 1
+        slot_keys = array("Q", bytes(8 * capacity))
+        slot_terms = array("I", bytes(4 * capacity))
+        for term, (key, ordinals) in enumerate(term_docs.items(), start=1):
+            postings.extend(ordinals)
+            term_offsets.append(len(postings))
+            slot = key & (capacity - 1)
+            while slot_terms[slot]:
+                slot = (slot + 1) & (capacity - 1)
+            slot_keys[slot] = key
+            slot_terms[slot] = term
+
+        arrays = {
+            "doc_ids": array("q", (doc_id for doc_id, _ in docs)),
+            "doc_sizes": array("I", (len(grams) for _, grams in docs)),
+            "term_offsets": term_offsets,
+            "postings": postings,
+            "slot_keys": slot_keys,
+            "slot_terms": slot_terms,
+        }
+        entry = {"platform": platform, "type": question_type}
+        for name, _ in _ARRAYS:
+            entry[name] = len(arrays[name])
+            blobs.append((entry, name, arrays[name].tobytes()))
+        directory["partitions"].append(entry)
+
+    # 目录中的偏移依赖目录自身长度：先用足够大的占位偏移确定长度，回填实际偏移后以空格补齐
+    for entry, name, _ in blobs:
+        entry[name] = [10 ** 15, entry[name]]
+    directory_size = len(json.dumps(directory).encode())
+    offset = _align(_HEADER.size + directory_size)
+    for entry, name, data in blobs:
+        entry[name][0] = offset
+        offset = _align(offset + len(data))
+    directory_bytes = json.dumps(directory).encode().ljust(directory_size)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, directory_size))
+        f.write(directory_bytes)
+        for _, name, data in blobs:
+            f.write(bytes(_align(f.tell()) - f.tell()))
+            f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+# 全局索引快照（应用启动时加载）
+index_snapshot = IndexSnapshot()
@@ -0,0 +1,35 @@
+"""
+调用耗时统计 - 保留最近N次成功调用的耗时，用于计算对冲请求的触发阈值
+"""
+from collections import deque
+
+
+class LatencyTracker:
+    """滑动窗口耗时分位数（当前进程）"""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> float | None:
+        """第p百分位耗时（秒），无样本时返回None"""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(int(len(ordered) * p / 100), len(ordered) - 1)
+        return ordered[index]
+
+    def stats(self) -> dict:
+        def ms(value):
+            return round(value * 1000, 2) if value is not None else None
+        return {
+            "samples": len(self._samples),
+            "p50Ms": ms(self.percentile(50)),
+            "p95Ms": ms(self.percentile(95)),
+            "p99Ms": ms(self.percentile(99))
+        }
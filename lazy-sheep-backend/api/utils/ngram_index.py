@@ -0,0 +1,286 @@
+"""
+N-gram倒排索引 - 为模糊匹配提供候选题目召回
+"""
+import asyncio
+import heapq
+import re
+import time
+from collections import defaultdict
+
+from api.config import get_settings
+from api.utils.text_matcher import _normalize_text
+
+settings = get_settings()
+
+# 中文（含CJK扩展、日文假名）连续片段 或 英文数字单词
+_TOKEN_PATTERN = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[a-z0-9_]+')
+# 文档频率上限的最小值，小分区不跳过常见n-gram
+_MIN_DF_CAP = 1000
+# 补齐时每写入多少题让出一次事件循环
+_CATCH_UP_YIELD_EVERY = 500
+
+
+def iter_ngrams(text: str):
+    """
+    逐个生成文本的n-gram（保留重复，用于词频统计）
+
+    中文片段使用字符二元组（单字片段保留单字），
+    英文数字单词保留整词并拆出字符三元组，兼顾拼写差异。
+    """
+    for token in _TOKEN_PATTERN.findall(_normalize_text(text)):
+        if token[0].isascii():
+            yield token
+            if len(token) > 3:
+                yield from (token[i:i + 3] for i in range(len(token) - 2))
+        elif len(token) == 1:
+            yield token
+        else:
+            yield from (token[i:i + 2] for i in range(len(token) - 1))
+
+
+def extract_ngrams(text: str) -> set[str]:
+    """
+    提取文本的n-gram特征集合
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        n-gram集合
+    """
+    return set(iter_ngrams(text))
+
+
+def skip_common(items: list, size: int, df) -> list:
+    """
+    跳过文档频率过高的查询词（常见字词的倒排表很长但几乎没有区分度）
+
+    上限为 size * index_max_df_ratio（不低于_MIN_DF_CAP）；全部超限时保留最罕见的一个。
+
+    Args:
+        items: 查询词对应的倒排表等
+        size: 分区文档数
+        df: item -> 文档频率
+    """
+    max_df = max(int(size * settings.index_max_df_ratio), _MIN_DF_CAP)
+    kept = [item for item in items if df(item) <= max_df]
+    if kept or not items:
+        return kept
+    return [min(items, key=df)]
+
+
+class NgramIndex:
+    """
+    单个分区（平台+题型）的n-gram倒排索引
+
+    可基于只读快照分区（base）构建：快照之后新增或变更的文档写入内存部分，
+    被覆盖或移除的快照文档记录在_shadowed中，查询时跳过。
+    """
+
+    def __init__(self, base=None):
+        self._postings: dict[str, set[int]] = defaultdict(set)
+        self._doc_grams: dict[int, frozenset[str]] = {}
+        self._base = base
+        self._shadowed: set[int] = set()
+
+    def __len__(self) -> int:
+        base_size = len(self._base) - len(self._shadowed) if self._base is not None else 0
+        return len(self._doc_grams) + base_size
+
+    def __contains__(self, doc_id: int) -> bool:
+        if doc_id in self._doc_grams:
+            return True
+        return self._base is not None and doc_id in self._base and doc_id not in self._shadowed
+
+    def add(self, doc_id: int, text: str):
+        """添加或更新文档"""
+        if doc_id in self._doc_grams:
+            self.remove(doc_id)
+        elif self._base is not None and doc_id in self._base:
+            self._shadowed.add(doc_id)
+        grams = frozenset(extract_ngrams(text or ""))
+        self._doc_grams[doc_id] = grams
+        for gram in grams:
+            self._postings[gram].add(doc_id)
+
+    def remove(self, doc_id: int):
+        """移除文档"""
+        if self._base is not None and doc_id in self._base:
+            self._shadowed.add(doc_id)
+        grams = self._doc_grams.pop(doc_id, None)
+        if not grams:
+            return
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(doc_id)
+                if not posting:
+                    del self._postings[gram]
+
+    def query(self, text: str, top_k: int = 50) -> list[tuple[int, float]]:
+        """
+        召回与查询文本n-gram重叠度最高的文档
+
+        Args:
+            text: 查询文本
+            top_k: 返回数量
+
+        Returns:
+            [(doc_id, dice系数), ...]，按相似度降序
+        """
+        query_grams = extract_ngrams(text)
+        size = len(self)
+        if not query_grams or not size:
+            return []
+
+        # 查询可能在线程池中执行，与事件循环中的写入并发：倒排表复制后再遍历
+        base = self._base
+        postings = []
+        for gram in query_grams:
+            posting = self._postings.get(gram)
+            postings.append((
+                posting.copy() if posting else (),
+                base.postings(gram) if base is not None else ()
+            ))
+        postings = skip_common(postings, size, lambda item: len(item[0]) + len(item[1]))
+
+        overlap: dict[int, int] = defaultdict(int)
+        for posting, _ in postings:
+            for doc_id in posting:
+                overlap[doc_id] += 1
+
+        query_size = len(query_grams)
+        doc_grams = self._doc_grams
+        scored = []
+        for doc_id, count in overlap.items():
+            grams = doc_grams.get(doc_id)
+            if grams is not None:
+                scored.append((doc_id, 2.0 * count / (query_size + len(grams))))
+
+        if base is not None:
+            # 快照部分按文档序号计数，最后再换算为题目主键
+            base_overlap: dict[int, int] = defaultdict(int)
+            for _, base_posting in postings:
+                for ordinal in base_posting:
+                    base_overlap[ordinal] += 1
+            shadowed = self._shadowed
+            for ordinal, count in base_overlap.items():
+                doc_id = base.doc_ids[ordinal]
+                if doc_id not in shadowed:
+                    scored.append((doc_id, 2.0 * count / (query_size + base.doc_sizes[ordinal])))
+
+        return heapq.nlargest(top_k, scored, key=lambda item: item[1])
+
+
+class IndexRegistry:
+    """
+    分区索引注册表，首次使用分区时从数据库加载
+
+    index_factory创建的索引需实现 add(doc_id, *fields)，loader返回的每行按
+    add(*row) 写入，增量写入同样按 add(key, doc_id, *fields) 传参。
+    传入base（只读快照分区）时以 index_factory(base) 创建，loader只需返回快照之后的增量。
+
+    add() 只能看到本进程保存的题目。传入watermark的分区按主键水位补齐：
+    距上次补齐超过catch_up_interval秒时以 loader(水位 - catch_up_overlap) 读取题目，
+    从而收录其他worker新增的题目。主键在事务开始时分配、提交顺序可能与主键顺序不同
+    （PostgreSQL并发写入），因此每次向前多扫描catch_up_overlap个主键，
+    已在索引中的题目跳过。首次加载在线程池中构建，不阻塞事件循环。
+    """
+
+    def __init__(self, index_factory, catch_up_interval: float = 0, catch_up_overlap: int = 0):
+        self._factory = index_factory
+        self._catch_up_interval = catch_up_interval
+        self._catch_up_overlap = catch_up_overlap
+        self._indexes: dict[tuple, object] = {}
+        self._locks: dict[tuple, asyncio.Lock] = defaultdict(asyncio.Lock)
+        # 加载期间到达的增量写入，加载完成后补齐
+        self._pending: dict[tuple, list[tuple]] = defaultdict(list)
+        # 分区 -> [已从数据库读取的最大主键, 上次补齐时间]
+        self._watermarks: dict[tuple, list] = {}
+
+    def get(self, key: tuple):
+        """获取已加载的分区索引"""
+        return self._indexes.get(key)
+
+    async def ensure_loaded(self, key: tuple, loader, base=None, watermark: int | None = None):
+        """
+        获取分区索引，未加载时调用loader从数据库构建
+
+        Args:
+            key: 分区键，如 (platform, question_type)
+            loader: 异步函数，返回[(id, content, ...), ...]；传入watermark时以
+                loader(None) 全量加载、loader(起始主键) 补齐主键更大的题目
+            base: 只读快照分区（可选）
+            watermark: 初始主键水位（有快照时为快照水位，否则为0），None表示不补齐
+        """
+        index = self._indexes.get(key)
+        if index is not None:
+            if watermark is not None and self._catch_up_due(key):
+                await self._catch_up(key, index, loader)
+            return index
+
+        async with self._locks[key]:
+            index = self._indexes.get(key)
+            if index is None:
+                rows = await (loader() if watermark is None else loader(None))
+                loop = asyncio.get_running_loop()
+                index = await loop.run_in_executor(None, self._build, base, rows)
+                for row in self._pending.pop(key, []):
+                    index.add(*row)
+                if watermark is not None:
+                    last_id = max((row[0] for row in rows), default=0)
+                    self._watermarks[key] = [max(watermark, last_id), time.monotonic()]
+                self._indexes[key] = index
+        return index
+
+    def _build(self, base, rows) -> object:
+        """构建分区索引（在线程池中执行，构建完成前不对外可见）"""
+        index = self._factory(base) if base is not None else self._factory()
+        for row in rows:
+            index.add(*row)
+        return index
+
+    def _catch_up_due(self, key: tuple) -> bool:
+        state = self._watermarks.get(key)
+        return (
+            state is not None and self._catch_up_interval > 0
+            and time.monotonic() - state[1] >= self._catch_up_interval
+            and not self._locks[key].locked()
+        )
+
+    async def _catch_up(self, key: tuple, index, loader):
+        """读取水位之后（含重叠窗口）的题目写入分区（同一分区同时只有一个协程补齐，其余直接使用现有索引）"""
+        async with self._locks[key]:
+            state = self._watermarks[key]
+            state[1] = time.monotonic()
+            watermark = state[0]
+            rows = await loader(max(watermark - self._catch_up_overlap, 0))
+            for i, row in enumerate(rows):
+                # 重叠窗口内已收录的题目跳过，只补上晚于更大主键提交的题目
+                if row[0] <= watermark and row[0] in index:
+                    continue
+                index.add(*row)
+                state[0] = max(state[0], row[0])
+                # 其他worker批量导入时分段让出事件循环
+                if i % _CATCH_UP_YIELD_EVERY == _CATCH_UP_YIELD_EVERY - 1:
+                    await asyncio.sleep(0)
+
+    def add(self, key: tuple, doc_id: int, *fields):
+        """增量添加题目（分区未加载时跳过，首次使用时会从数据库读取）"""
+        index = self._indexes.get(key)
+        if index is not None:
+            index.add(doc_id, *fields)
+        elif key in self._locks and self._locks[key].locked():
+            self._pending[key].append((doc_id, *fields))
+
+    def clear(self):
+        """清空所有分区"""
+        self._indexes.clear()
+        self._pending.clear()
+        self._watermarks.clear()
+
+
+# 全局题目索引，按(平台, 题型)分区
+question_index = IndexRegistry(
+    NgramIndex, settings.index_catch_up_interval, settings.index_catch_up_overlap
+)
@@ -0,0 +1,205 @@
+"""
+Redis共享缓存 - 多个worker共享的二级缓存（搜索结果、AI答案）
+
+redis_enabled=False 或 Redis不可用时所有操作静默降级为未命中，
+连接失败后在 redis_retry_interval 秒内不再尝试，避免每个请求都等待超时。
+"""
+import json
+import time
+
+from loguru import logger
+
+from api.config import get_settings
+
+settings = get_settings()
+
+KEY_PREFIX = "ls"
+_SEQUENCE_KEY = f"{KEY_PREFIX}:qv:seq"
+# 原子地递增版本序列并写入题目版本号，避免并发失效时版本号回退
+_BUMP_VERSION_SCRIPT = """
+local version = redis.call('INCR', KEYS[1])
+redis.call('SET', KEYS[2], version)
+return version
+"""
+
+
+class RedisCache:
+    """
+    基于Redis的共享缓存
+
+    搜索结果按题目版本号失效：写入时记录题目当前版本，
+    读取时与 ls:qv:{题目主键} 比对，题目答案变更时更新版本号即可让所有worker的旧条目失效。
+
+    版本号取自全局递增序列 ls:qv:seq。未命中时随条目一起读取当前序列值，查库后写入时
+    跳过版本号大于该值的题目（查库期间答案发生了变更，查到的可能是旧答案）。
+    """
+
+    def __init__(self, client=None):
+        self._client = client
+        self._disabled_until = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.skipped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._client is not None or settings.redis_enabled
+
+    def _get_client(self):
+        """获取客户端（延迟创建，失败冷却期内返回None）"""
+        if not self.enabled or time.monotonic() < self._disabled_until:
+            return None
+        if self._client is None:
+            import redis.asyncio as redis
+            self._client = redis.from_url(
+                settings.redis_url,
+                socket_timeout=settings.redis_socket_timeout,
+                socket_connect_timeout=settings.redis_socket_timeout
+            )
+        return self._client
+
+    def _on_error(self, e: Exception):
+        self.errors += 1
+        self._disabled_until = time.monotonic() + settings.redis_retry_interval
+        logger.warning(f"Redis不可用，{settings.redis_retry_interval}s内降级为本地缓存: {e}")
+
+    @staticmethod
+    def search_key(kind: str, platform: str, value: str) -> str:
+        return f"{KEY_PREFIX}:search:{platform}:{kind}:{value}"
+
+    @staticmethod
+    def ai_key(fingerprint: str) -> str:
+        return f"{KEY_PREFIX}:ai:{fingerprint}"
+
+    @staticmethod
+    def _version_key(question_id: int) -> str:
+        return f"{KEY_PREFIX}:qv:{question_id}"
+
+    async def get_search_many(self, keys: list[str]) -> tuple[list[tuple[dict, int] | None], int | None]:
+        """
+        批量读取搜索结果（两次流水线往返：条目及当前版本序列 + 题目版本）
+
+        Returns:
+            (与keys一一对应的 (结果, 题目主键)，未命中或版本过期为None;
+             读取时的版本序列值，需在查库前读取并传给set_search_many，Redis不可用时为None)
+        """
+        client = self._get_client()
+        if client is None or not keys:
+            return [None] * len(keys), None
+
+        try:
+            *raw, sequence = await client.mget(keys + [_SEQUENCE_KEY])
+            sequence = int(sequence or 0)
+            entries = [json.loads(item) if item else None for item in raw]
+
+            hit_indexes = [i for i, entry in enumerate(entries) if entry]
+            if hit_indexes:
+                version_keys = [self._version_key(entries[i]["q"]) for i in hit_indexes]
+                versions = await client.mget(version_keys)
+                for i, version in zip(hit_indexes, versions):
+                    if int(version or 0) != entries[i]["v"]:
+                        entries[i] = None
+        except Exception as e:
+            self._on_error(e)
+            return [None] * len(keys), None
+
+        results = []
+        for entry in entries:
+            if entry:
+                self.hits += 1
+                results.append((entry["r"], entry["q"]))
+            else:
+                self.misses += 1
+                results.append(None)
+        return results, sequence
+
+    async def set_search_many(self, items: list[tuple[str, dict, int]], sequence: int | None):
+        """
+        批量写入搜索结果
+
+        Args:
+            items: [(key, 结果, 题目主键), ...]
+            sequence: 查库前由get_search_many读取的版本序列值，None时不写入
+        """
+        client = self._get_client()
+        if client is None or not items or sequence is None:
+            return
+
+        try:
+            versions = await client.mget([self._version_key(qid) for _, _, qid in items])
+            async with client.pipeline(transaction=False) as pipe:
+                for (key, result, qid), version in zip(items, versions):
+                    version = int(version or 0)
+                    if version > sequence:
+                        self.skipped += 1
+                        continue
+                    entry = {"r": result, "q": qid, "v": version}
+                    pipe.set(key, json.dumps(entry, ensure_ascii=False), ex=settings.redis_cache_ttl)
+                await pipe.execute()
+        except Exception as e:
+            self._on_error(e)
+
+    async def delete(self, key: str):
+        """删除单个键"""
+        client = self._get_client()
+        if client is None:
+            return
+        try:
+            await client.delete(key)
+        except Exception as e:
+            self._on_error(e)
+
+    async def invalidate_question(self, question_id: int):
+        """将题目版本号更新为新的序列值，使所有worker中该题的搜索缓存失效（需在提交后调用）"""
+        client = self._get_client()
+        if client is None:
+            return
+        try:
+            await client.eval(_BUMP_VERSION_SCRIPT, 2, _SEQUENCE_KEY, self._version_key(question_id))
+        except Exception as e:
+            self._on_error(e)
+
+    async def get_json(self, key: str) -> dict | None:
+        """读取JSON值（AI答案等）"""
+        client = self._get_client()
+        if client is None:
+            return None
+        try:
+            raw = await client.get(key)
+        except Exception as e:
+            self._on_error(e)
+            return None
+
+        if raw:
+            self.hits += 1
+            return json.loads(raw)
+        self.misses += 1
+        return None
+
+    async def set_json(self, key: str, value: dict, ttl: int):
+        """写入JSON值"""
+        client = self._get_client()
+        if client is None:
+            return
+        try:
+            await client.set(key, json.dumps(value, ensure_ascii=False), ex=ttl)
+        except Exception as e:
+            self._on_error(e)
+
+    def stats(self) -> dict:
+        """命中统计"""
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "available": self.enabled and time.monotonic() >= self._disabled_until,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "staleSkipped": self.skipped,
+            "hitRate": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+# 全局共享缓存
+shared_cache = RedisCache()
@@ -1,60 +1,279 @@
 ﻿"""
 文本匹配工具
 """
+import hashlib
+import html
+import re
+import unicodedata
 from difflib import SequenceMatcher
+from functools import lru_cache
 
+_HTML_TAG_PATTERN = re.compile(r'<[^>]+>')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+_IMG_SRC_PATTERN = re.compile(r'<img\b[^>]*?\bsrc\s*=\s*["\']?([^"\'\s>?#]+)[^>]*>', re.IGNORECASE)
+# NFKC不会处理的中文标点，统一为半角
+_PUNCTUATION_TABLE = str.maketrans({
+    "。": ".", "、": ",", "“": '"', "”": '"', "‘": "'", "’": "'",
+    "【": "[", "】": "]", "《": "<", "》": ">", "「": '"', "」": '"',
+    "—": "-", "～": "~", "…": "..."
+})
+# 中文（含CJK扩展、日文假名）连续片段 或 英文数字单词 或 单个其他非空白字符
+_TOKEN_PATTERN = re.compile(
+    r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[a-z0-9_]+|[^\sa-z0-9_]'
+)
 
-def fuzzy_match(query: str, candidates: list[str], threshold: float = 0.85) -> dict | None:
+
+def fuzzy_match(
+    query: str,
+    candidates: list[str],
+    threshold: float = 0.85,
+    scorer: str | None = None
+) -> dict | None:
     """
     模糊匹配文本
-    
+
     Args:
         query: 查询文本
         candidates: 候选文本列表
         threshold: 相似度阈值
-    
+        scorer: 相似度算法（sequence/indel/token_set），默认读取配置
+
     Returns:
         {"index": int, "score": float, "text": str} 或 None
     """
     if not candidates:
         return None
-    
+
+    score_func = get_scorer(scorer)
+
     best_match = None
     best_score = 0.0
     best_index = -1
-    
+
     # 规范化查询文本
     query_normalized = _normalize_text(query)
-    
+
     for i, candidate in enumerate(candidates):
         # 规范化候选文本
         candidate_normalized = _normalize_text(candidate)
-        
-        # 计算相似度
-        ratio = SequenceMatcher(None, query_normalized, candidate_normalized).ratio()
-        
+
+        # 计算相似度（低于阈值或当前最佳分数时提前退出）
+        ratio = score_func(
+            query_normalized,
+            candidate_normalized,
+            max(threshold, best_score)
+        )
+
         if ratio > best_score:
             best_score = ratio
             best_match = candidate
             best_index = i
-    
+            if best_score >= 1.0:
+                break
+
     if best_score >= threshold:
         return {
             "index": best_index,
             "score": best_score,
             "text": best_match
         }
-    
+
     return None
 
 
+def get_scorer(name: str | None = None):
+    """
+    获取相似度算法
+
+    Args:
+        name: 算法名称，None时读取配置 fuzzy_scorer
+
+    Returns:
+        score(a, b, score_cutoff) -> float，低于score_cutoff时可返回0
+    """
+    if name is None:
+        from api.config import get_settings
+        name = get_settings().fuzzy_scorer
+
+    try:
+        return SCORERS[name]
+    except KeyError:
+        raise ValueError(f"未知的相似度算法: {name}")
+
+
+def sequence_ratio(a: str, b: str, score_cutoff: float = 0.0) -> float:
+    """difflib.SequenceMatcher相似度，依次用上界估计提前退出"""
+    matcher = SequenceMatcher(None, a, b)
+    if score_cutoff > 0:
+        if matcher.real_quick_ratio() < score_cutoff:
+            return 0.0
+        if matcher.quick_ratio() < score_cutoff:
+            return 0.0
+    return matcher.ratio()
+
+
+def indel_ratio(a: str, b: str, score_cutoff: float = 0.0) -> float:
+    """
+    Indel相似度：2 * LCS / (len(a) + len(b))
+
+    LCS长度使用位并行算法计算，复杂度 O(len(b) * len(a) / 字长)。
+    """
+    total = len(a) + len(b)
+    if total == 0:
+        return 1.0
+
+    # 长度上界：LCS不超过较短文本长度
+    if score_cutoff > 0 and 2.0 * min(len(a), len(b)) / total < score_cutoff:
+        return 0.0
+
+    return 2.0 * _lcs_length(a, b) / total
+
+
+def token_set_ratio(a: str, b: str, score_cutoff: float = 0.0) -> float:
+    """
+    词集合相似度：忽略词序和重复词，取交集与差集组合的最大Indel相似度
+
+    英文数字按单词切分，中文片段按字符二元组切分（与n-gram索引一致），
+    逐字切分时常用字几乎总能构成子集。结果再乘以长度比例系数，
+    避免短文本因是长文本的子集而得到满分。
+    """
+    tokens_a = _set_tokens(a)
+    tokens_b = _set_tokens(b)
+    if not tokens_a and not tokens_b:
+        return 1.0
+    if not tokens_a or not tokens_b:
+        return 0.0
+
+    # 长度比例系数：等长为1，短文本只有长文本一半时为0.75
+    shorter, longer = sorted((len(a), len(b)))
+    penalty = 0.5 + 0.5 * shorter / longer
+    if penalty < score_cutoff:
+        return 0.0
+    score_cutoff /= penalty
+
+    intersection = " ".join(sorted(tokens_a & tokens_b))
+    diff_ab = " ".join(sorted(tokens_a - tokens_b))
+    diff_ba = " ".join(sorted(tokens_b - tokens_a))
+
+    # 一方是另一方的子集
+    if intersection and (not diff_ab or not diff_ba):
+        return penalty
+
+    combined_ab = f"{intersection} {diff_ab}".strip()
+    combined_ba = f"{intersection} {diff_ba}".strip()
+
+    best = indel_ratio(combined_ab, combined_ba, score_cutoff)
+    if intersection:
+        best = max(
+            best,
+            indel_ratio(intersection, combined_ab, score_cutoff),
+            indel_ratio(intersection, combined_ba, score_cutoff)
+        )
+    return best * penalty
+
+
+def _set_tokens(text: str) -> set[str]:
+    """词集合相似度的切分：中文片段拆成字符二元组（单字片段保留单字），其余保留整词"""
+    tokens = set()
+    for token in _TOKEN_PATTERN.findall(text):
+        if len(token) > 1 and not token[0].isascii():
+            tokens.update(token[i:i + 2] for i in range(len(token) - 1))
+        else:
+            tokens.add(token)
+    return tokens
+
+
+def _lcs_length(a: str, b: str) -> int:
+    """位并行最长公共子序列长度（Hyyrö算法）"""
+    if len(a) < len(b):
+        a, b = b, a
+    if not b:
+        return 0
+
+    # 每个字符在a中出现位置的位掩码
+    masks: dict[str, int] = {}
+    for i, ch in enumerate(a):
+        masks[ch] = masks.get(ch, 0) | (1 << i)
+
+    full = (1 << len(a)) - 1
+    v = full
+    for ch in b:
+        u = v & masks.get(ch, 0)
+        v = ((v + u) | (v - u)) & full
+
+    return len(a) - v.bit_count()
+
+
+SCORERS = {
+    "sequence": sequence_ratio,
+    "indel": indel_ratio,
+    "token_set": token_set_ratio
+}
+
+
+@lru_cache(maxsize=4096)
 def _normalize_text(text: str) -> str:
     """规范化文本（去除空格、标点等）"""
-    import re
     # 移除HTML标签
-    text = re.sub(r'<[^>]+>', '', text)
+    text = _HTML_TAG_PATTERN.sub('', text)
     # 移除多余空格
-    text = re.sub(r'\s+', ' ', text)
+    text = _WHITESPACE_PATTERN.sub(' ', text)
     # 转小写
     text = text.lower().strip()
     return text
+
+
+def canonicalize_text(text: str) -> str:
+    """
+    题干规范化（用于计算normalized_hash）
+
+    在_normalize_text基础上额外处理：
+    1. 图片保留地址但去掉查询参数（签名、时间戳）
+    2. HTML实体反转义
+    3. 全角字符转半角（NFKC），中文标点统一为半角
+    4. 去除所有空白
+    """
+    if not text:
+        return ""
+    text = _IMG_SRC_PATTERN.sub(lambda m: f"[img:{m.group(1)}]", text)
+    text = html.unescape(_normalize_text(text))
+    text = unicodedata.normalize("NFKC", text).translate(_PUNCTUATION_TABLE)
+    return _WHITESPACE_PATTERN.sub('', text).lower()
+
+
+def normalized_hash(text: str) -> str:
+    """规范化题干的MD5，格式差异不影响结果"""
+    return hashlib.md5(canonicalize_text(text).encode()).hexdigest()
+
+
+def option_keys_and_texts(options: list | None) -> tuple[list, list]:
+    """选项字母和规范化后的选项文本（字符串选项和不带key的选项按顺序编为A、B、C…）"""
+    if not options:
+        return [], []
+    keys, texts = [], []
+    for i, opt in enumerate(options):
+        if isinstance(opt, dict):
+            keys.append(opt.get("key") or chr(65 + i))
+            texts.append(canonicalize_text(str(opt.get("text", ""))))
+        else:
+            keys.append(chr(65 + i))
+            texts.append(canonicalize_text(str(opt)))
+    return keys, texts
+
+
+def answer_option_texts(answer: str | None, options: list | None) -> list | None:
+    """
+    选择题答案字母对应的选项文本（规范化、排序），用于在选项顺序不同的请求间对应答案
+
+    选项文本有重复或答案中有不属于选项的字母时返回None
+    """
+    keys, texts = option_keys_and_texts(options)
+    if not answer or not keys or len(set(texts)) != len(texts):
+        return None
+    key_to_text = dict(zip(keys, texts))
+    parts = [part.strip() for part in answer.split(",") if part.strip()]
+    if len(parts) == 1 and parts[0] not in key_to_text and all(ch in key_to_text for ch in parts[0]):
+        parts = list(parts[0])  # "AC" 形式的多选答案
+    if not parts or any(part not in key_to_text for part in parts):
+        return None
+    return sorted(key_to_text[part] for part in parts)
@@ -0,0 +1,136 @@
+"""
+TF-IDF稀疏向量索引 - 语义匹配层（识别改写、语序调整后的同一题目）
+
+特征为字符n-gram经哈希映射到固定维度（hashing vectorizer），
+文档向量以倒排表形式存储，查询即一次稀疏矩阵-向量乘法。
+"""
+import heapq
+import math
+import zlib
+from collections import Counter, defaultdict
+
+from api.config import get_settings
+from api.utils.ngram_index import IndexRegistry, iter_ngrams, skip_common
+
+settings = get_settings()
+
+N_FEATURES = 1 << 20
+
+
+def hash_features(text: str) -> Counter:
+    """文本 -> {特征哈希: 词频}"""
+    return Counter(zlib.crc32(gram.encode()) & (N_FEATURES - 1) for gram in iter_ngrams(text))
+
+
+class TfidfIndex:
+    """
+    单个平台的TF-IDF索引
+
+    文档权重使用次线性词频 1 + log(tf)。IDF随文档增加实时变化，
+    文档范数在写入时按当时的IDF计算，文档数较上次重算翻倍后整体重算一次。
+    """
+
+    def __init__(self):
+        # 特征 -> {文档ID: 次线性词频}（稀疏矩阵的列存储）
+        self._postings: dict[int, dict[int, float]] = defaultdict(dict)
+        # 文档ID -> (题型, {特征: 次线性词频})
+        self._docs: dict[int, tuple[str, dict[int, float]]] = {}
+        self._norms: dict[int, float] = {}
+        self._normalized_at = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, doc_id: int) -> bool:
+        return doc_id in self._docs
+
+    def _idf(self, feature: int) -> float:
+        return math.log((1 + len(self._docs)) / (1 + len(self._postings.get(feature, ())))) + 1
+
+    def _norm(self, weights: dict[int, float]) -> float:
+        return math.sqrt(sum((w * self._idf(f)) ** 2 for f, w in weights.items())) or 1.0
+
+    def add(self, doc_id: int, text: str, question_type: str):
+        """添加或更新文档"""
+        if doc_id in self._docs:
+            self.remove(doc_id)
+
+        weights = {f: 1 + math.log(tf) for f, tf in hash_features(text or "").items()}
+        self._docs[doc_id] = (question_type, weights)
+        for feature, weight in weights.items():
+            self._postings[feature][doc_id] = weight
+        self._norms[doc_id] = self._norm(weights)
+
+        if len(self._docs) >= 2 * max(self._normalized_at, 64):
+            self._renormalize()
+
+    def remove(self, doc_id: int):
+        """移除文档"""
+        entry = self._docs.pop(doc_id, None)
+        self._norms.pop(doc_id, None)
+        if entry is None:
+            return
+        for feature in entry[1]:
+            posting = self._postings.get(feature)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self._postings[feature]
+
+    def query(self, text: str, top_k: int = 5, question_type: str | None = None) -> list[tuple[int, float]]:
+        """
+        余弦相似度top-k
+
+        Args:
+            text: 查询文本
+            top_k: 返回数量
+            question_type: 仅返回该题型的文档
+
+        Returns:
+            [(doc_id, 余弦相似度), ...]，按相似度降序
+        """
+        features = hash_features(text)
+        if not features or not self._docs:
+            return []
+
+        # 查询可能在线程池中执行，与事件循环中的写入并发：倒排表复制后再遍历
+        postings = [
+            (feature, tf, posting.copy())
+            for feature, tf in features.items()
+            if (posting := self._postings.get(feature))
+        ]
+        if not postings:
+            return []
+        query_norm = math.sqrt(sum(
+            ((1 + math.log(tf)) * self._idf(f)) ** 2 for f, tf in features.items()
+        ))
+
+        # 稀疏矩阵-向量乘法：只遍历查询特征对应的倒排表（跳过文档频率过高、IDF很低的特征）
+        scores: dict[int, float] = defaultdict(float)
+        for feature, tf, posting in skip_common(postings, len(self._docs), lambda item: len(item[2])):
+            idf = self._idf(feature)
+            factor = (1 + math.log(tf)) * idf * idf
+            for doc_id, d_weight in posting.items():
+                scores[doc_id] += factor * d_weight
+
+        docs = self._docs
+        norms = self._norms
+        scored = []
+        for doc_id, score in scores.items():
+            doc = docs.get(doc_id)
+            norm = norms.get(doc_id)
+            if doc is None or norm is None or (question_type is not None and doc[0] != question_type):
+                continue
+            scored.append((doc_id, min(score / (query_norm * norm), 1.0)))
+        return heapq.nlargest(top_k, scored, key=lambda item: item[1])
+
+    def _renormalize(self):
+        """按当前IDF重算所有文档范数"""
+        self._norms = {doc_id: self._norm(weights) for doc_id, (_, weights) in self._docs.items()}
+        self._normalized_at = len(self._docs)
+
+
+# 全局语义索引，按平台分区
+semantic_index = IndexRegistry(
+    TfidfIndex, settings.index_catch_up_interval, settings.index_catch_up_overlap
+)
@@ -0,0 +1,138 @@
+"""
+向量化批量打分 - 多个查询 × 各自候选列表一次性计算粗排相似度
+
+规范化文本按Unicode码点编码为整数数组，相邻两个码点拼成一个64位整数作为字符bigram，
+用NumPy一次算出所有(查询, 候选)对的Dice系数，每个查询只取粗排前 rescore_top 个候选
+用精确算法复核，Python层循环次数与候选总数无关。
+
+NumPy为可选依赖，未安装时 HAS_NUMPY=False，调用方应退回逐个fuzzy_match。
+"""
+from api.utils.text_matcher import _normalize_text, get_scorer
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+
+def _shingles(text: str):
+    """规范化文本 -> 去重后的bigram整数数组（单字文本取该字本身）"""
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+    if len(codes) < 2:
+        return codes
+    return np.unique((codes[:-1] << 21) | codes[1:])
+
+
+def fuzzy_match_batch(
+    items: list[tuple[str, list[str]]],
+    threshold: float = 0.85,
+    scorer: str | None = None,
+    rescore_top: int = 5
+) -> list[dict | None]:
+    """
+    批量模糊匹配（结果格式与fuzzy_match相同）
+
+    Args:
+        items: [(查询文本, 候选文本列表), ...]
+        threshold: 相似度阈值（针对精确算法的分数）
+        scorer: 精确复核使用的相似度算法，默认读取配置
+        rescore_top: 每个查询进入精确复核的候选数
+
+    Returns:
+        与items一一对应的 {"index", "score", "text"} 或 None
+    """
+    results: list[dict | None] = [None] * len(items)
+    if not items:
+        return results
+
+    score_func = get_scorer(scorer)
+
+    # 1. 文本去重后编码（同一批次的候选列表高度重叠）
+    text_ids: dict[str, int] = {}
+    normalized: list[str] = []
+
+    def text_id(text: str) -> int:
+        key = _normalize_text(text)
+        if key not in text_ids:
+            text_ids[key] = len(normalized)
+            normalized.append(key)
+        return text_ids[key]
+
+    query_ids = [text_id(query) for query, _ in items]
+    pair_query, pair_text, pair_index = [], [], []
+    for i, (_, candidates) in enumerate(items):
+        for j, candidate in enumerate(candidates):
+            pair_query.append(i)
+            pair_text.append(text_id(candidate))
+            pair_index.append(j)
+    if not pair_query:
+        return results
+
+    shingles = [_shingles(text) for text in normalized]
+    lengths = np.array([len(s) for s in shingles], dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    # 全局词表：bigram -> 连续编号
+    vocab, flat = np.unique(np.concatenate(shingles), return_inverse=True)
+    vocab_size = max(len(vocab), 1)
+
+    # 2. 查询的 (查询编号, bigram) 组合键，排序后用于成员判断
+    query_ids_arr = np.array(query_ids, dtype=np.int64)
+    query_lengths = lengths[query_ids_arr]
+    query_rows = np.repeat(np.arange(len(items), dtype=np.int64), query_lengths)
+    query_cols = flat[_gather_ranges(offsets[query_ids_arr], query_lengths)]
+    query_keys = np.sort(query_rows * vocab_size + query_cols)
+
+    # 3. 展开每个(查询, 候选)对的候选bigram，统计交集大小
+    pair_query = np.array(pair_query, dtype=np.int64)
+    pair_text = np.array(pair_text, dtype=np.int64)
+    pair_lengths = lengths[pair_text]
+    pair_rows = np.repeat(np.arange(len(pair_query), dtype=np.int64), pair_lengths)
+    pair_cols = flat[_gather_ranges(offsets[pair_text], pair_lengths)]
+    pair_keys = pair_query[pair_rows] * vocab_size + pair_cols
+
+    if len(query_keys):
+        positions = np.minimum(np.searchsorted(query_keys, pair_keys), len(query_keys) - 1)
+        hits = (query_keys[positions] == pair_keys).astype(np.float64)
+    else:
+        hits = np.zeros(len(pair_keys))
+    intersections = np.bincount(pair_rows, weights=hits, minlength=len(pair_query))
+    totals = query_lengths[pair_query] + pair_lengths
+    dice = np.divide(2.0 * intersections, totals, out=np.ones(len(totals)), where=totals > 0)
+
+    # 4. 按 (查询, Dice降序) 排序，每个查询取前 rescore_top 个精确复核
+    order = np.lexsort((-dice, pair_query))
+    sorted_query = pair_query[order]
+    starts = np.searchsorted(sorted_query, np.arange(len(items)), side="left")
+    ends = np.searchsorted(sorted_query, np.arange(len(items)), side="right")
+
+    for i, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        query_text = normalized[query_ids[i]]
+        best_score = 0.0
+        best_pair = -1
+        for pair in order[start:min(end, start + rescore_top)].tolist():
+            ratio = score_func(query_text, normalized[pair_text[pair]], max(threshold, best_score))
+            if ratio > best_score:
+                best_score = ratio
+                best_pair = pair
+                if best_score >= 1.0:
+                    break
+        if best_pair >= 0 and best_score >= threshold:
+            index = pair_index[best_pair]
+            results[i] = {
+                "index": index,
+                "score": best_score,
+                "text": items[i][1][index]
+            }
+
+    return results
+
+
+def _gather_ranges(starts, lengths):
+    """拼接多个区间 [start, start+length) 的下标（向量化的 arange 拼接）"""
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    segment_starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(starts, lengths) + np.arange(total, dtype=np.int64) - segment_starts
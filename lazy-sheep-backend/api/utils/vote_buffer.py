@@ -0,0 +1,116 @@
+"""
+投票缓冲 - 按答案累加投票增量，定期批量落库
+
+开启vote_buffer_enabled后，投票接口只在内存中累加 answer_id -> 增量，
+后台任务每隔vote_flush_interval秒将所有非零增量交给落库函数一次写入，
+落库失败的增量合并回缓冲区等待下次重试。应用关闭时在lifespan中排空。
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from loguru import logger
+
+from api.config import get_settings
+
+settings = get_settings()
+
+FlushHandler = Callable[[dict[int, int]], Awaitable[object]]
+
+
+class VoteBuffer:
+    """投票增量缓冲（每个worker一个）"""
+
+    def __init__(self, flush_interval: float = 2.0):
+        self.flush_interval = flush_interval
+        self._deltas: dict[int, int] = {}
+        self._handler: FlushHandler | None = None
+        self._task: asyncio.Task | None = None
+        self._stop: asyncio.Event | None = None
+        self.votes = 0
+        self.flushes = 0
+        self.flushed_answers = 0
+        self.failures = 0
+        self.last_flush_ms = 0.0
+
+    def __len__(self) -> int:
+        return len(self._deltas)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self, handler: FlushHandler):
+        """启动后台落库任务（需在事件循环内调用）"""
+        self._handler = handler
+        self._stop = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def add(self, answer_id: int, delta: int) -> bool:
+        """
+        累加投票增量
+
+        Returns:
+            是否已缓冲（False时调用方应直接落库）
+        """
+        if not self.running:
+            return False
+        self._deltas[answer_id] = self._deltas.get(answer_id, 0) + delta
+        self.votes += 1
+        return True
+
+    def pending(self, answer_id: int) -> int:
+        """答案尚未落库的投票增量"""
+        return self._deltas.get(answer_id, 0)
+
+    async def _run(self):
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    async def flush(self):
+        """立即落库所有非零增量"""
+        deltas = {answer_id: delta for answer_id, delta in self._deltas.items() if delta}
+        self._deltas = {}
+        if not deltas:
+            return
+
+        start = time.perf_counter()
+        try:
+            await self._handler(deltas)
+            self.flushed_answers += len(deltas)
+        except Exception as e:
+            logger.error(f"投票落库失败，等待下次重试: {e}")
+            self.failures += 1
+            for answer_id, delta in deltas.items():
+                self._deltas[answer_id] = self._deltas.get(answer_id, 0) + delta
+        self.flushes += 1
+        self.last_flush_ms = (time.perf_counter() - start) * 1000
+
+    async def drain(self):
+        """停止后台任务并落库剩余增量（应用关闭时调用）"""
+        if self._task is None:
+            return
+        self._stop.set()
+        await self._task
+        self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        """缓冲深度与落库统计（当前进程）"""
+        return {
+            "running": self.running,
+            "pendingAnswers": len(self._deltas),
+            "votes": self.votes,
+            "flushes": self.flushes,
+            "flushedAnswers": self.flushed_answers,
+            "failures": self.failures,
+            "lastFlushMs": round(self.last_flush_ms, 2)
+        }
+
+
+# 全局投票缓冲（vote_buffer_enabled=False时为None）
+vote_buffer = VoteBuffer(settings.vote_flush_interval) if settings.vote_buffer_enabled else None
@@ -0,0 +1,241 @@
+"""
+异步写入队列 - 上传和AI答案先入队，合并重复后批量落库
+
+请求路径只做入队，不再等待数据库写入（SQLite下还包括锁等待）。
+相同 (平台, 规范化hash, 答案, 来源) 的写入在队列中合并为一条，保留最高置信度；
+待写入条数达到阈值或距上次落库超过间隔时，由后台任务调用落库函数批量写入。
+批量落库失败的写入先逐条重试（一条坏数据不影响同批其他写入），仍失败的重新入队，
+重试max_retries次后丢弃并记录日志。
+应用关闭时在lifespan中排空队列。队列满或后台任务未启动时submit返回False，调用方改为同步写入。
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from loguru import logger
+
+from api.config import get_settings
+from api.utils.text_matcher import normalized_hash
+
+settings = get_settings()
+
+FlushHandler = Callable[[list[dict]], Awaitable[list[dict]]]
+ItemHandler = Callable[[dict], Awaitable[bool]]
+
+
+class WriteBehindBuffer:
+    """合并写入的异步队列（每个worker一个）"""
+
+    def __init__(
+        self,
+        flush_size: int = 200,
+        flush_interval: float = 1.0,
+        max_pending: int = 10000,
+        max_retries: int = 3
+    ):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self._pending: dict[tuple, dict] = {}
+        self._attempts: dict[tuple, int] = {}
+        self._handler: FlushHandler | None = None
+        self._item_handler: ItemHandler | None = None
+        self._task: asyncio.Task | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._closing = False
+        self.submitted = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.written = 0
+        self.retried = 0
+        self.requeued = 0
+        self.failed = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._closing
+
+    def start(self, handler: FlushHandler, item_handler: ItemHandler | None = None):
+        """
+        启动后台落库任务（需在事件循环内调用）
+
+        Args:
+            handler: 批量落库函数，返回与输入一一对应的 {"status"}
+            item_handler: 单条落库函数，批量落库失败的写入逐条重试（可选）
+        """
+        self._handler = handler
+        self._item_handler = item_handler
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    def submit(self, question_data: dict) -> bool:
+        """
+        加入写入队列
+
+        Returns:
+            是否已入队（False时调用方应同步写入）
+        """
+        if not self.running:
+            return False
+        key = self._key(question_data)
+        existing = self._pending.get(key)
+        if existing is not None:
+            self.coalesced += 1
+            if question_data.get("confidence", 0.8) > existing.get("confidence", 0.8):
+                self._pending[key] = question_data
+            return True
+        if len(self._pending) >= self.max_pending:
+            self.rejected += 1
+            return False
+
+        self._pending[key] = question_data
+        self.submitted += 1
+        if len(self._pending) >= self.flush_size:
+            self._wakeup.set()
+        return True
+
+    @staticmethod
+    def _key(question_data: dict) -> tuple:
+        return (
+            question_data.get("platform", "czbk"),
+            normalized_hash(question_data.get("questionContent", "")),
+            question_data.get("answer"),
+            question_data.get("source", "ai")
+        )
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """立即落库当前队列中的全部写入（失败重新入队的写入留到下一次落库）"""
+        # 先取走队列，落库期间的新写入和重新入队的写入进入下一次落库
+        batch = list(self._pending.items())
+        self._pending = {}
+        for start_index in range(0, len(batch), self.flush_size):
+            chunk = batch[start_index:start_index + self.flush_size]
+            items = [item for _, item in chunk]
+
+            start = time.perf_counter()
+            try:
+                results = await self._handler(items)
+                failed = [
+                    (key, item) for (key, item), result in zip(chunk, results) if result["status"] == "failed"
+                ]
+            except Exception as e:
+                logger.error(f"异步写入落库失败: {e}")
+                failed = chunk
+
+            if failed and self._item_handler is not None:
+                failed = await self._retry_items(failed)
+
+            elapsed = (time.perf_counter() - start) * 1000
+            self.flushes += 1
+            self.written += len(chunk) - len(failed)
+            self.last_flush_ms = elapsed
+            self.max_flush_ms = max(self.max_flush_ms, elapsed)
+            self._total_flush_ms += elapsed
+            failed_keys = {key for key, _ in failed}
+            for key, _ in chunk:
+                if key not in failed_keys:
+                    self._attempts.pop(key, None)
+            self._requeue(failed)
+
+    async def _retry_items(self, failed: list[tuple]) -> list[tuple]:
+        """批量落库失败的写入逐条重试，返回仍失败的写入"""
+        still_failed = []
+        for key, item in failed:
+            self.retried += 1
+            try:
+                ok = await self._item_handler(item)
+            except Exception as e:
+                logger.error(f"异步写入单条落库失败: {e}")
+                ok = False
+            if not ok:
+                still_failed.append((key, item))
+        return still_failed
+
+    def _requeue(self, failed: list[tuple]):
+        """失败的写入重新入队，超过重试次数的丢弃"""
+        dropped = 0
+        for key, item in failed:
+            attempts = self._attempts.get(key, 0) + 1
+            if attempts > self.max_retries:
+                self._attempts.pop(key, None)
+                dropped += 1
+                logger.error(
+                    f"异步写入重试{self.max_retries}次仍失败，已丢弃: "
+                    f"platform={key[0]}, content={item.get('questionContent', '')[:50]}"
+                )
+                continue
+            self._attempts[key] = attempts
+            # 落库期间又提交了相同写入时保留置信度更高的一条
+            existing = self._pending.get(key)
+            if existing is None or item.get("confidence", 0.8) > existing.get("confidence", 0.8):
+                self._pending[key] = item
+            self.requeued += 1
+        self.failed += dropped
+        if failed:
+            logger.warning(f"异步写入: {len(failed) - dropped}条重新入队，{dropped}条丢弃")
+
+    async def drain(self):
+        """停止后台任务并落库剩余写入（应用关闭时调用）"""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        # 重新入队的写入最多再落库max_retries次
+        for _ in range(self.max_retries + 1):
+            if not self._pending:
+                break
+            await self.flush()
+        logger.info(f"异步写入队列已排空: 共写入{self.written}条")
+
+    def stats(self) -> dict:
+        """队列深度与落库耗时统计（当前进程）"""
+        return {
+            "running": self.running,
+            "depth": len(self._pending),
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "flushes": self.flushes,
+            "written": self.written,
+            "retried": self.retried,
+            "requeued": self.requeued,
+            "failed": self.failed,
+            "lastFlushMs": round(self.last_flush_ms, 2),
+            "avgFlushMs": round(self._total_flush_ms / self.flushes, 2) if self.flushes else 0.0,
+            "maxFlushMs": round(self.max_flush_ms, 2)
+        }
+
+
+def _create_buffer() -> WriteBehindBuffer | None:
+    if not settings.write_buffer_enabled:
+        return None
+    return WriteBehindBuffer(
+        flush_size=settings.write_buffer_flush_size,
+        flush_interval=settings.write_buffer_flush_interval,
+        max_pending=settings.write_buffer_max_pending,
+        max_retries=settings.write_buffer_max_retries
+    )
+
+
+# 全局写入队列（write_buffer_enabled=False时为None）
+write_buffer = _create_buffer()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""
+批量打分基准测试
+对比逐个fuzzy_match与NumPy向量化粗排+精确复核的耗时与匹配一致性
+
+用法: python benchmarks/bench_batch_scoring.py [查询数量] [每题候选数] [复核数]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.utils.text_matcher import fuzzy_match
+from api.utils.vector_scorer import HAS_NUMPY, fuzzy_match_batch
+from bench_scorers import build_corpus, perturb
+
+
+def main():
+    if not HAS_NUMPY:
+        print("未安装numpy，无法运行向量化打分")
+        return
+
+    queries_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    candidates_count = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    rescore_top = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    corpus = build_corpus(queries_count * 4)
+    rng = random.Random(7)
+    items = []
+    for i in range(queries_count):
+        target = corpus[i]
+        candidates = rng.sample(corpus, candidates_count - 1) + [target]
+        rng.shuffle(candidates)
+        items.append((perturb(target, i), candidates))
+
+    print(f"查询数量: {queries_count}, 每题候选: {candidates_count}, 复核数: {rescore_top}")
+
+    for scorer in ("sequence", "indel"):
+        start = time.perf_counter()
+        expected = [fuzzy_match(q, c, threshold=0.85, scorer=scorer) for q, c in items]
+        loop_ms = (time.perf_counter() - start) * 1e3
+
+        start = time.perf_counter()
+        actual = fuzzy_match_batch(items, threshold=0.85, scorer=scorer, rescore_top=rescore_top)
+        batch_ms = (time.perf_counter() - start) * 1e3
+
+        same = sum(
+            (a and a["text"]) == (b and b["text"]) for a, b in zip(expected, actual)
+        )
+        print(f"{scorer:<10} 逐个: {loop_ms:8.1f}ms  向量化: {batch_ms:8.1f}ms  一致: {same}/{len(items)}")
+
+
+if __name__ == "__main__":
+    main()
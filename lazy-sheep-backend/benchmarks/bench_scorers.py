@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""
+相似度算法基准测试
+对比各算法在中文题干上的打分耗时与匹配结果
+
+用法: python benchmarks/bench_scorers.py [候选数量] [重复次数]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.utils.text_matcher import SCORERS, fuzzy_match, _normalize_text
+
+STEMS = [
+    "下列关于Java中String类的说法，正确的是（ ）",
+    "在Python中，以下哪个选项可以正确地创建一个空字典？",
+    "关于HTTP协议中GET与POST请求的区别，下列描述错误的是",
+    "MySQL数据库中，用于删除表中所有数据但保留表结构的语句是",
+    "以下关于Linux文件权限chmod 755的含义，描述正确的是",
+    "在<p>Vue.js</p>中，v-if与v-show指令的主要区别是什么？",
+    "TCP三次握手过程中，客户端发送的第一个报文段的SYN标志位为",
+    "下列排序算法中，平均时间复杂度为O(nlogn)且不稳定的是",
+    "JavaScript中，typeof null 的返回值是下列哪一项",
+    "Spring框架中，@Autowired注解默认按照哪种方式进行依赖注入",
+]
+
+FILLERS = ["（单选题）", "，请选择最合适的一项", "【2024期中】", "下列说法中", "以下选项"]
+
+
+def build_corpus(size: int, seed: int = 42) -> list[str]:
+    """生成带随机扰动的候选题干"""
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(size):
+        stem = rng.choice(STEMS)
+        corpus.append(f"{rng.choice(FILLERS)}{stem}{i}{rng.choice(FILLERS)}")
+    return corpus
+
+
+def perturb(text: str, seed: int) -> str:
+    """模拟平台改写：插入空格、HTML标签、删除个别字符"""
+    rng = random.Random(seed)
+    chars = list(text)
+    for _ in range(2):
+        if len(chars) > 4:
+            del chars[rng.randrange(len(chars))]
+    return "<span>" + " ".join(["".join(chars[:5]), "".join(chars[5:])]) + "</span>"
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    corpus = build_corpus(size)
+    queries = [perturb(corpus[i * 7 % size], i) for i in range(repeat)]
+
+    print(f"候选数量: {size}, 查询次数: {repeat}")
+    print(f"{'算法':<12}{'单对(μs)':>12}{'fuzzy_match(ms)':>18}{'命中率':>10}")
+
+    for name, scorer in SCORERS.items():
+        # 单对打分（不提前退出）
+        a = _normalize_text(queries[0])
+        pairs = [_normalize_text(c) for c in corpus[:100]]
+        start = time.perf_counter()
+        for b in pairs:
+            scorer(a, b)
+        pair_us = (time.perf_counter() - start) / len(pairs) * 1e6
+
+        # 完整模糊匹配（含提前退出）
+        hits = 0
+        start = time.perf_counter()
+        for i, query in enumerate(queries):
+            result = fuzzy_match(query, corpus, threshold=0.85, scorer=name)
+            if result and result["index"] == i * 7 % size:
+                hits += 1
+        match_ms = (time.perf_counter() - start) / len(queries) * 1e3
+
+        print(f"{name:<12}{pair_us:>12.1f}{match_ms:>18.2f}{hits / len(queries):>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""
+模拟OpenAI兼容的AI服务（/chat/completions）
+可配置响应延迟、慢请求比例和错误比例，用于验证超时、重试、对冲请求和熔断
+
+用法: python benchmarks/mock_llm_server.py [--port 8100] [--delay 0.2] [--slow-rate 0.05]
+                                          [--slow-delay 10] [--error-rate 0.1] [--error-status 503]
+启动后后端设置 DEEPSEEK_BASE_URL=http://127.0.0.1:8100 即可
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="模拟OpenAI兼容的AI服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--delay", type=float, default=0.2, help="正常响应延迟（秒）")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="慢请求比例")
+    parser.add_argument("--slow-delay", type=float, default=10.0, help="慢请求延迟（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回错误的比例")
+    parser.add_argument("--error-status", type=int, default=503, help="错误状态码")
+    parser.add_argument("--answer", default="A", help="返回的答案内容")
+    return parser.parse_args()
+
+
+def completion(model: str, content: str) -> dict:
+    return {
+        "id": f"mock-{time.time_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {"prompt_tokens": 50, "completion_tokens": 5, "total_tokens": 55}
+    }
+
+
+async def write_response(writer, status: int, body: dict):
+    data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+    writer.write(
+        f"HTTP/1.1 {status} MOCK\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(data)}\r\n\r\n".encode("ascii") + data
+    )
+    await writer.drain()
+
+
+async def handle(reader, writer, args, counters):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, path, _ = request_line.decode("ascii").split(" ", 2)
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+            if method != "POST" or not path.rstrip("/").endswith("/chat/completions"):
+                await write_response(writer, 404, {"error": {"message": "not found"}})
+                continue
+
+            counters["requests"] += 1
+            payload = json.loads(body or b"{}")
+            if random.random() < args.error_rate:
+                counters["errors"] += 1
+                await asyncio.sleep(args.delay)
+                await write_response(writer, args.error_status, {"error": {"message": "mock error"}})
+                continue
+            slow = random.random() < args.slow_rate
+            counters["slow"] += slow
+            await asyncio.sleep(args.slow_delay if slow else args.delay)
+            await write_response(writer, 200, completion(payload.get("model", "mock"), args.answer))
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def main():
+    args = parse_args()
+    counters = {"requests": 0, "errors": 0, "slow": 0}
+    server = await asyncio.start_server(
+        lambda reader, writer: handle(reader, writer, args, counters), args.host, args.port
+    )
+    print(f"模拟AI服务: http://{args.host}:{args.port}")
+    async with server:
+        try:
+            await server.serve_forever()
+        finally:
+            print(f"请求数: {counters['requests']}, 错误: {counters['errors']}, 慢请求: {counters['slow']}")
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
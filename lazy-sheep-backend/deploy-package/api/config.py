@@ -21,11 +21,92 @@ class Settings(BaseSettings):
     # Redis
     redis_url: str = "redis://localhost:6379/0"
     redis_enabled: bool = False  # 开发时默认关闭
+    redis_socket_timeout: float = 0.5  # 连接/读写超时（秒）
+    redis_retry_interval: int = 30  # 连接失败后降级时长（秒）
+    redis_cache_ttl: int = 600  # 搜索结果缓存时间（秒）
+    redis_ai_cache_ttl: int = 86400  # AI答案缓存时间（秒）
+    
+    # 模糊匹配
+    search_backend: str = "ngram"  # 候选召回: ngram（进程内索引）/fulltext（SQLite FTS5 / PostgreSQL pg_trgm）
+    fuzzy_candidate_limit: int = 50  # 召回的候选数量
+    fuzzy_scorer: str = "sequence"  # 相似度算法: sequence/indel/token_set
+    index_snapshot_path: str = "./data/search_index.bin"  # n-gram索引快照（manage_questions.py build-index生成）
+    index_max_df_ratio: float = 0.2  # 召回时跳过文档频率超过该比例（且超过1000）的n-gram/特征
+    index_catch_up_interval: float = 5.0  # 内存索引从数据库补齐其他worker新增题目的间隔（秒），0表示不补齐
+    index_catch_up_overlap: int = 200  # 补齐时在水位之前重新扫描的主键数（补上提交晚于更大主键的题目）
+    scoring_executor: str = "inline"  # 打分执行器: inline（事件循环内）/thread/process（按需开启，每个worker额外启动scoring_workers个子进程）
+    scoring_workers: int = 2  # 线程/进程池大小
+    scoring_inline_threshold: int = 64  # 候选总数低于该值时直接在事件循环内打分
+    scoring_chunk_size: int = 16  # 批量搜索时每个工作单元包含的题目数
+    batch_rescore_top: int = 5  # 批量打分时每题经NumPy粗排后精确复核的候选数，0表示逐个精确打分
+    
+    # 语义匹配（TF-IDF，模糊匹配未命中时启用）
+    semantic_search_enabled: bool = True
+    semantic_threshold: float = 0.75  # 余弦相似度阈值
+    semantic_confidence_discount: float = 0.85  # 命中结果的置信度折扣
+    
+    # 共享精确答案表（worker间共享内存，规范化hash -> 最佳答案）
+    answer_table_enabled: bool = True
+    answer_table_slots: int = 65536  # 槽位数（取2的幂），装载率超过70%后不再插入新题
+    answer_table_slot_size: int = 512  # 单个槽位字节数，超长答案不进表
+    
+    # 布隆过滤器（worker间共享内存，必定不存在的题目跳过精确查询）
+    bloom_filter_enabled: bool = True
+    bloom_capacity: int = 2000000  # 预计键数量（每题2个键：questionId、规范化hash）
+    bloom_error_rate: float = 0.01  # 目标误判率
+    bloom_rebuild_interval: int = 21600  # 定期从数据库重建的间隔（秒）
+    
+    # 搜索结果缓存（进程内）
+    search_cache_size: int = 10000  # 最大条目数，0表示关闭
+    search_cache_ttl: int = 300  # 过期时间（秒）
+    
+    # 批量搜索
+    batch_search_chunk_size: int = 500  # 单条IN查询的最大参数数量
+    upload_batch_max_size: int = 1000  # 单次批量上传的最大题目数
+    
+    # 异步写入（上传与AI答案先入队，合并后批量落库）
+    write_buffer_enabled: bool = True
+    write_buffer_flush_size: int = 200  # 待写入条数达到该值时立即落库
+    write_buffer_flush_interval: float = 1.0  # 最长落库间隔（秒）
+    write_buffer_max_pending: int = 10000  # 队列上限，超出时改为同步写入
+    write_buffer_max_retries: int = 3  # 落库失败的写入重新入队的次数，用尽后丢弃并记录日志
+    
+    # 投票
+    vote_buffer_enabled: bool = False  # 开启后投票先在内存中按答案累加，定期批量落库
+    vote_flush_interval: float = 2.0  # 投票增量落库间隔（秒）
+    vote_batch_max_size: int = 500  # 单次批量投票的最大条数
     
     # DeepSeek AI
     deepseek_api_key: str = ""
     deepseek_base_url: str = "https://api.deepseek.com"
     deepseek_model: str = "deepseek-chat"
+    ai_cache_size: int = 2000  # 进程内AI答案缓存条目数，0表示关闭
+    ai_cache_ttl: int = 600  # 进程内AI答案缓存时间（秒）
+    ai_bank_first: bool = True  # AI答题前先查题库（精确/模糊匹配）
+    ai_bank_min_confidence: float = 0.8  # 题库答案置信度不低于该值时直接返回，不调用AI
+    ai_batch_max_size: int = 100  # 批量AI答题单次最大题目数
+    ai_batch_pack_size: int = 10  # 每次AI调用打包的客观题数量
+    ai_batch_retries: int = 1  # 解析失败的题目重新打包重试次数，仍失败时逐题调用
+    
+    # AI调用并发限制
+    llm_max_concurrency: int = 16  # 每个worker同时进行的AI请求数
+    llm_global_concurrency: int = 0  # 所有worker合计上限（需preload_app，worker异常退出后由child_exit钩子归还许可，0表示不限制）
+    llm_max_queue_wait: float = 10.0  # 交互请求最长排队时间（秒），超时返回503
+    llm_batch_max_queue_wait: float = 60.0  # 批量答题最长排队时间（秒）
+    
+    # AI调用超时、重试与熔断
+    llm_connect_timeout: float = 5.0  # 连接超时（秒）
+    llm_read_timeout: float = 30.0  # 读取超时（秒）
+    llm_max_retries: int = 2  # 超时/连接错误/429/5xx的重试次数
+    llm_retry_base_delay: float = 0.5  # 指数退避初始间隔（秒）
+    llm_retry_max_delay: float = 8.0  # 指数退避最大间隔（秒）
+    llm_hedge_enabled: bool = False  # 调用超过耗时分位数仍未返回时再发一个相同请求，取先返回的结果
+    llm_hedge_percentile: float = 95.0  # 对冲请求触发的耗时分位数
+    llm_hedge_min_delay: float = 1.0  # 对冲请求最短等待时间（秒）
+    llm_hedge_min_samples: int = 20  # 耗时样本数达到该值后才启用对冲
+    llm_breaker_threshold: int = 5  # 连续失败次数达到该值时熔断，0表示不熔断
+    llm_breaker_recovery: float = 30.0  # 熔断后多久放行探测请求（秒）
+    ai_bank_fallback: bool = True  # AI不可用时返回题库中置信度不足的答案
     
     # API认证
     api_key_required: bool = False  # 开发时默认关闭
@@ -6,10 +6,19 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 from loguru import logger
+import asyncio
 import sys
 
 from api.config import get_settings
-from api.database import init_db
+from api.database import init_db, async_session_maker
+from api.services.search_service import SearchService
+from api.services.vote_service import VoteService
+from api.utils.answer_table import answer_table
+from api.utils.bloom_filter import question_filter
+from api.utils.executor import start_executor, shutdown_executor
+from api.utils.index_snapshot import index_snapshot
+from api.utils.vote_buffer import vote_buffer
+from api.utils.write_buffer import write_buffer
 from api.routes import search, ai, upload, answers, quality
 
 settings = get_settings()
@@ -32,9 +41,32 @@ async def lifespan(app: FastAPI):
     logger.info("🚀 启动应用...")
     await init_db()
     logger.info("✅ 数据库初始化完成")
+    await start_executor()
+    index_snapshot.load(settings.index_snapshot_path)
+    # gunicorn preload时主进程已构建共享答案表，单进程运行时在此构建
+    if answer_table is not None and not answer_table.built:
+        async with async_session_maker() as session:
+            await SearchService.build_answer_table(session)
+    refresh_task = None
+    if question_filter is not None:
+        if not question_filter.built and question_filter.try_claim_rebuild(settings.bloom_rebuild_interval):
+            async with async_session_maker() as session:
+                await SearchService.rebuild_question_filter(session)
+        refresh_task = asyncio.create_task(SearchService.refresh_question_filter_loop())
+    if write_buffer is not None:
+        write_buffer.start(SearchService.flush_saves, SearchService.flush_save)
+    if vote_buffer is not None:
+        vote_buffer.start(VoteService.flush_votes)
     yield
     # 关闭时
     logger.info("👋 关闭应用...")
+    if refresh_task:
+        refresh_task.cancel()
+    if write_buffer is not None:
+        await write_buffer.drain()
+    if vote_buffer is not None:
+        await vote_buffer.drain()
+    shutdown_executor()
 
 
 # 创建FastAPI应用
@@ -1,7 +1,7 @@
 """
 题目数据模型
 """
-from sqlalchemy import Column, Integer, String, Text, Float, DateTime, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Text, Float, DateTime, Boolean, JSON, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from api.database import Base
@@ -10,11 +10,18 @@ from api.database import Base
 class Question(Base):
     """题目表"""
     __tablename__ = "questions"
+    __table_args__ = (
+        # 精确匹配/去重: WHERE normalized_hash = ? AND platform = ?（同平台规范化题干唯一）
+        Index("ux_questions_hash_platform", "normalized_hash", "platform", unique=True),
+        # 模糊匹配索引加载: WHERE platform = ? AND type = ?
+        Index("ix_questions_platform_type", "platform", "type"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     question_id = Column(String(64), unique=True, index=True)
     content = Column(Text, nullable=False)
     content_hash = Column(String(32), index=True)  # MD5用于快速查重
+    normalized_hash = Column(String(32))  # 规范化题干MD5（忽略HTML、空白、全半角差异）
     type = Column(String(10), index=True)  # 0=单选 1=多选 2=判断 3=填空 4=简答
     
     # 保留answer字段用于兼容旧逻辑（存储最佳答案）
@@ -4,11 +4,15 @@ AI答题API路由
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
+from api.config import get_settings
 from api.database import get_db
-from api.services.ai_service import AIService
+from api.services.ai_service import AIService, AIUnavailable
 from api.services.search_service import SearchService
+from api.utils.llm_limiter import LimiterBusy
 from loguru import logger
 
+settings = get_settings()
+
 router = APIRouter(prefix="/api/ai", tags=["ai"])
 
 
@@ -27,27 +31,89 @@ class AIAnswerResponse(BaseModel):
     data: dict
 
 
+def _bank_match(stored: dict | None, question_type: str, options: list[str]) -> dict | None:
+    """
+    题库答案按本次请求的选项顺序映射字母
+    
+    选择题的选项与题库中的选项对应不上时返回None（不使用题库答案）
+    """
+    if not stored:
+        return None
+    answer = AIService.remap_bank_answer(stored, question_type, options)
+    if answer is None:
+        logger.info(f"题库答案选项对应不上，不使用: {stored['questionId']}")
+        return None
+    return {**stored, "answer": answer}
+
+
+def _bank_answer(stored: dict, served_by: str) -> dict:
+    """题库答案转换为AI答题响应格式"""
+    return {
+        "answer": stored["answer"],
+        "reasoning": "",
+        "confidence": stored["confidence"],
+        "model": None,
+        "tokens": 0,
+        "questionId": stored["questionId"],
+        "servedBy": served_by
+    }
+
+
 @router.post("/answer", response_model=AIAnswerResponse)
 async def ai_answer(
     request: AIAnswerRequest,
     session: AsyncSession = Depends(get_db)
 ):
-    """使用AI生成答案"""
+    """
+    使用AI生成答案
+    
+    先查题库，答案置信度达到ai_bank_min_confidence时直接返回；AI服务不可用时
+    返回题库中置信度不足的答案（ai_bank_fallback），都没有时返回503。
+    返回的servedBy表示答案来源：bank（题库）/bank_fallback（AI不可用时的题库答案）/
+    ai_cache（AI答案缓存）/ai（调用AI）
+    """
     try:
         logger.info(f"AI答题: type={request.type}")
         
+        # 题库优先（重答请求需要新答案，不查题库）
+        stored = None
+        if settings.ai_bank_first and not request.attemptedAnswers:
+            stored = _bank_match(await SearchService.search_question(
+                content=request.questionContent,
+                question_type=request.type,
+                platform=request.platform,
+                session=session
+            ), request.type, request.options)
+            if stored and stored["confidence"] >= settings.ai_bank_min_confidence:
+                logger.info(f"题库命中，跳过AI: {stored['questionId']}")
+                return {"data": _bank_answer(stored, "bank")}
+        
         # 调用AI服务
-        result = await AIService.answer_question(
-            content=request.questionContent,
-            question_type=request.type,
-            options=request.options,
-            model=request.model,
-            attempted_answers=request.attemptedAnswers
-        )
+        try:
+            result = await AIService.answer_question(
+                content=request.questionContent,
+                question_type=request.type,
+                options=request.options,
+                model=request.model,
+                attempted_answers=request.attemptedAnswers
+            )
+        except AIUnavailable:
+            if settings.ai_bank_fallback and not request.attemptedAnswers:
+                if not settings.ai_bank_first:
+                    stored = _bank_match(await SearchService.search_question(
+                        content=request.questionContent,
+                        question_type=request.type,
+                        platform=request.platform,
+                        session=session
+                    ), request.type, request.options)
+                if stored:
+                    logger.info(f"AI服务不可用，返回题库答案: {stored['questionId']}")
+                    return {"data": _bank_answer(stored, "bank_fallback")}
+            raise
         
-        # 自动保存到题库（可选）
+        # 自动保存到题库（加入写入队列，不阻塞响应）
         try:
-            await SearchService.save_question(
+            await SearchService.save_question_deferred(
                 question_data={
                     "questionId": None,  # 自动生成
                     "questionContent": request.questionContent,
@@ -65,8 +131,159 @@ async def ai_answer(
         except Exception as e:
             logger.warning(f"保存AI答案失败: {e}")
         
+        result["servedBy"] = "ai_cache" if result.pop("cached", False) else "ai"
         return {"data": result}
         
+    except (LimiterBusy, AIUnavailable) as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         logger.error(f"AI答题失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+class AIBatchItem(BaseModel):
+    """批量AI答题中的单题"""
+    questionId: str | None = None
+    questionContent: str
+    type: str
+    options: list[str] = []
+
+
+class AIBatchRequest(BaseModel):
+    """批量AI答题请求"""
+    questions: list[AIBatchItem]
+    platform: str = "czbk"
+    model: str | None = None
+
+
+class AIBatchResponse(BaseModel):
+    """批量AI答题响应"""
+    results: list[dict]
+    summary: dict
+
+
+@router.post("/answer/batch", response_model=AIBatchResponse)
+async def ai_answer_batch(
+    request: AIBatchRequest,
+    session: AsyncSession = Depends(get_db)
+):
+    """
+    批量AI答题（整张试卷）
+    
+    先批量查题库，其余题目中的客观题打包进少量AI调用，批次内相同题目只回答一次。
+    AI未能回答的题目有题库答案时（置信度不足）按bank_fallback返回。
+    """
+    if len(request.questions) > settings.ai_batch_max_size:
+        raise HTTPException(
+            status_code=400,
+            detail=f"单次最多{settings.ai_batch_max_size}道题"
+        )
+    
+    try:
+        logger.info(f"批量AI答题: {len(request.questions)}道题")
+        results: list[dict | None] = [None] * len(request.questions)
+        matches: list[dict | None] = [None] * len(request.questions)
+        
+        # 1. 题库优先
+        if settings.ai_bank_first:
+            matches, _ = await SearchService.batch_search_questions(
+                questions=[q.model_dump() for q in request.questions],
+                platform=request.platform,
+                session=session
+            )
+            matches = [
+                _bank_match(stored, q.type, q.options) for q, stored in zip(request.questions, matches)
+            ]
+            for i, stored in enumerate(matches):
+                if stored and stored["confidence"] >= settings.ai_bank_min_confidence:
+                    results[i] = {
+                        "answer": stored["answer"],
+                        "confidence": stored["confidence"],
+                        "tokens": 0,
+                        "servedBy": "bank"
+                    }
+        
+        # 2. 其余题目调用AI
+        remaining = [i for i, result in enumerate(results) if result is None]
+        answers = await AIService.answer_questions_batch(
+            [
+                {
+                    "content": request.questions[i].questionContent,
+                    "type": request.questions[i].type,
+                    "options": request.questions[i].options
+                }
+                for i in remaining
+            ],
+            model=request.model
+        )
+        
+        for i, answer in zip(remaining, answers):
+            if answer is None:
+                continue
+            q = request.questions[i]
+            results[i] = {
+                "answer": answer["answer"],
+                "confidence": answer["confidence"],
+                "tokens": answer["tokens"],
+                "servedBy": "ai_cache" if answer.pop("cached", False) else "ai"
+            }
+            # 自动保存到题库（加入写入队列）
+            try:
+                await SearchService.save_question_deferred(
+                    question_data={
+                        "questionId": None,
+                        "questionContent": q.questionContent,
+                        "type": q.type,
+                        "answer": answer["answer"],
+                        "answerText": None,
+                        "options": [{"text": opt} for opt in q.options] if q.options else None,
+                        "platform": request.platform,
+                        "source": "ai",
+                        "confidence": answer["confidence"],
+                        "verified": False
+                    },
+                    session=session
+                )
+            except Exception as e:
+                logger.warning(f"保存AI答案失败: {e}")
+        
+        # 3. AI未能回答的题目降级为题库中置信度不足的答案
+        failed = [i for i, result in enumerate(results) if result is None]
+        if failed and settings.ai_bank_fallback:
+            if not settings.ai_bank_first:
+                found, _ = await SearchService.batch_search_questions(
+                    questions=[request.questions[i].model_dump() for i in failed],
+                    platform=request.platform,
+                    session=session
+                )
+                for i, stored in zip(failed, found):
+                    matches[i] = _bank_match(stored, request.questions[i].type, request.questions[i].options)
+            for i in failed:
+                if matches[i]:
+                    results[i] = {
+                        "answer": matches[i]["answer"],
+                        "confidence": matches[i]["confidence"],
+                        "tokens": 0,
+                        "servedBy": "bank_fallback"
+                    }
+        
+        output = []
+        summary = {
+            "total": len(results), "bank": 0, "bank_fallback": 0, "ai_cache": 0, "ai": 0, "failed": 0, "tokens": 0
+        }
+        for q, result in zip(request.questions, results):
+            if result is None:
+                output.append({"questionId": q.questionId, "status": "failed"})
+                summary["failed"] += 1
+                continue
+            output.append({"questionId": q.questionId, "status": "success", **result})
+            summary[result["servedBy"]] += 1
+            summary["tokens"] += result["tokens"]
+        
+        return {"results": output, "summary": summary}
+        
+    except LimiterBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except Exception as e:
+        logger.error(f"批量AI答题失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
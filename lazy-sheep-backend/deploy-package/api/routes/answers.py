@@ -6,12 +6,18 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import List, Optional
 from pydantic import BaseModel
+from api.config import get_settings
 from api.database import get_db
 from api.models import Question, Answer
 from api.services.answer_service import AnswerService
+from api.services.search_service import SearchService
+from api.services.vote_service import VoteService
+from api.utils.vote_buffer import vote_buffer
 from loguru import logger
 
 
+settings = get_settings()
+
 router = APIRouter(prefix="/api/answers", tags=["answers"])
 
 
@@ -30,6 +36,17 @@ class AnswerVote(BaseModel):
     vote: int  # 1=赞同，-1=反对
 
 
+class BatchVoteItem(BaseModel):
+    """批量投票中的单条投票"""
+    answerId: int
+    vote: int
+
+
+class BatchVoteRequest(BaseModel):
+    """批量投票请求模型"""
+    votes: List[BatchVoteItem]
+
+
 class AnswerResponse(BaseModel):
     """答案响应模型"""
     id: int
@@ -88,7 +105,8 @@ async def create_answer(
             # 更新置信度
             if data.confidence > existing.confidence:
                 existing.confidence = data.confidence
-                await session.commit()
+                await session.flush()
+                await SearchService.update_best_answer(session, existing)
                 await session.refresh(existing)
                 return {
                     "success": True,
@@ -112,11 +130,11 @@ async def create_answer(
         )
         
         session.add(new_answer)
-        await session.commit()
-        await session.refresh(new_answer)
+        await session.flush()
         
-        # 评估最佳答案
-        await _evaluate_best_answer_async(session, question.id)
+        # 与当前最佳答案比较，和新答案一起提交
+        await SearchService.update_best_answer(session, new_answer)
+        await session.refresh(new_answer)
         
         return {
             "success": True,
@@ -178,6 +196,60 @@ async def get_answers(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/vote/batch", response_model=dict)
+async def batch_vote(
+    data: BatchVoteRequest,
+    session: AsyncSession = Depends(get_db)
+):
+    """
+    批量投票
+    
+    同一答案的多条投票先合并为一个增量，一条UPDATE原子累加。
+    
+    请求体：
+    - votes: [{answerId, vote}, ...]
+    """
+    if len(data.votes) > settings.vote_batch_max_size:
+        raise HTTPException(
+            status_code=400,
+            detail=f"单次最多提交{settings.vote_batch_max_size}条投票"
+        )
+    
+    try:
+        deltas: dict[int, int] = {}
+        for item in data.votes:
+            deltas[item.answerId] = deltas.get(item.answerId, 0) + item.vote
+        
+        if vote_buffer is not None and vote_buffer.running:
+            # 缓冲模式：只校验答案存在，增量定期落库
+            stmt = select(Answer.id).where(Answer.id.in_(list(deltas)))
+            existing = set((await session.execute(stmt)).scalars().all())
+            for answer_id in existing:
+                vote_buffer.add(answer_id, deltas[answer_id])
+            results = [
+                {"answerId": answer_id, "status": "queued" if answer_id in existing else "not_found"}
+                for answer_id in deltas
+            ]
+        else:
+            updated = await VoteService.apply_votes(session, deltas)
+            results = [
+                {"answerId": answer_id, "status": "success", "voteCount": updated[answer_id]["voteCount"]}
+                if answer_id in updated else {"answerId": answer_id, "status": "not_found"}
+                for answer_id in deltas
+            ]
+        
+        return {
+            "success": True,
+            "total": len(data.votes),
+            "answers": len(deltas),
+            "results": results
+        }
+        
+    except Exception as e:
+        logger.error(f"批量投票失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/{answer_id}/vote", response_model=dict)
 async def vote_answer(
     answer_id: int,
@@ -192,26 +264,29 @@ async def vote_answer(
     - vote: 投票值（1=赞同，-1=反对）
     """
     try:
-        # 查找答案
-        stmt = select(Answer).where(Answer.id == answer_id)
-        result = await session.execute(stmt)
-        answer = result.scalar_one_or_none()
+        if vote_buffer is not None:
+            # 缓冲模式：确认答案存在后只在内存中累加，定期落库
+            answer = await session.get(Answer, answer_id)
+            if not answer:
+                raise HTTPException(status_code=404, detail="答案不存在")
+            if vote_buffer.add(answer_id, data.vote):
+                result = answer.to_dict()
+                result["voteCount"] += vote_buffer.pending(answer_id)
+                return {
+                    "success": True,
+                    "message": "投票已记录",
+                    "answer": result
+                }
         
-        if not answer:
+        # 原子累加投票数，排序可能变化时重新评估最佳答案
+        updated = await VoteService.apply_votes(session, {answer_id: data.vote})
+        if answer_id not in updated:
             raise HTTPException(status_code=404, detail="答案不存在")
         
-        # 投票
-        answer.vote_count += data.vote
-        await session.commit()
-        await session.refresh(answer)
-        
-        # 重新评估最佳答案
-        await _evaluate_best_answer_async(session, answer.question_id)
-        
         return {
             "success": True,
             "message": "投票成功",
-            "answer": answer.to_dict()
+            "answer": updated[answer_id]
         }
         
     except HTTPException:
@@ -300,48 +375,3 @@ async def detect_conflicts(
         logger.error(f"检测冲突失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-
-async def _evaluate_best_answer_async(session: AsyncSession, question_id: int):
-    """异步版本：评估并更新最佳答案"""
-    try:
-        # 获取所有答案
-        stmt = select(Answer).where(Answer.question_id == question_id)
-        result = await session.execute(stmt)
-        answers = result.scalars().all()
-        
-        if not answers:
-            return
-        
-        # 先清除所有is_accepted标记
-        for ans in answers:
-            ans.is_accepted = False
-        
-        # 按优先级选择最佳答案
-        def answer_priority(ans: Answer) -> tuple:
-            return (
-                ans.verified,
-                ans.source == "platform_verified",
-                ans.vote_count,
-                ans.confidence
-            )
-        
-        best_answer = max(answers, key=answer_priority)
-        best_answer.is_accepted = True
-        
-        # 更新Question表（向后兼容）
-        stmt = select(Question).where(Question.id == question_id)
-        result = await session.execute(stmt)
-        question = result.scalar_one_or_none()
-        
-        if question:
-            question.answer = best_answer.answer
-            question.answer_text = best_answer.answer_text
-            question.source = best_answer.source
-            question.confidence = best_answer.confidence
-        
-        await session.commit()
-        logger.info(f"更新最佳答案: Question {question_id}")
-        
-    except Exception as e:
-        logger.error(f"评估最佳答案失败: {e}")
-        await session.rollback()
@@ -5,7 +5,15 @@ from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 from api.database import get_db
+from api.services.ai_service import ai_flights, llm_breaker, llm_call_stats, llm_latency
 from api.services.search_service import SearchService
+from api.utils.answer_table import answer_table
+from api.utils.bloom_filter import question_filter
+from api.utils.cache import ai_cache, search_cache
+from api.utils.llm_limiter import llm_limiter
+from api.utils.redis_cache import shared_cache
+from api.utils.vote_buffer import vote_buffer
+from api.utils.write_buffer import write_buffer
 from loguru import logger
 
 router = APIRouter(prefix="/api", tags=["search"])
@@ -72,18 +80,16 @@ async def batch_search(
     try:
         logger.info(f"批量搜索: {len(request.questions)}道题")
         
+        matches, tiers = await SearchService.batch_search_questions(
+            questions=request.questions,
+            platform=request.platform,
+            session=session
+        )
+        
         results = []
         found_count = 0
         
-        for q in request.questions:
-            result = await SearchService.search_question(
-                content=q.get("questionContent", ""),
-                question_type=q.get("type", "0"),
-                platform=request.platform,
-                session=session,
-                question_id=q.get("questionId")  # 传递questionId
-            )
-            
+        for q, result in zip(request.questions, matches):
             if result:
                 results.append({
                     "questionId": q.get("questionId"),
@@ -102,10 +108,32 @@ async def batch_search(
             "summary": {
                 "total": len(request.questions),
                 "found": found_count,
-                "notFound": len(request.questions) - found_count
+                "notFound": len(request.questions) - found_count,
+                "tiers": tiers
             }
         }
         
     except Exception as e:
         logger.error(f"批量搜索失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/search/cache/stats")
+async def cache_stats():
+    """搜索缓存命中统计（监控用）"""
+    return {
+        "cache": search_cache.stats(),
+        "shared": shared_cache.stats(),
+        "answerTable": answer_table.stats() if answer_table is not None else None,
+        "bloomFilter": question_filter.stats() if question_filter is not None else None,
+        "writeBuffer": write_buffer.stats() if write_buffer is not None else None,
+        "voteBuffer": vote_buffer.stats() if vote_buffer is not None else None,
+        "ai": {
+            "cache": ai_cache.stats(),
+            "singleflight": ai_flights.stats(),
+            "limiter": llm_limiter.stats(),
+            "breaker": llm_breaker.stats(),
+            "latency": llm_latency.stats(),
+            "calls": dict(llm_call_stats)
+        }
+    }
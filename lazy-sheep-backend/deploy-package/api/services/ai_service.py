@@ -1,18 +1,51 @@
 """
 AI答题服务
 """
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+import httpx
+import openai
 from openai import AsyncOpenAI
 from api.config import get_settings
+from api.utils.cache import ai_cache
+from api.utils.circuit_breaker import CircuitBreaker
+from api.utils.latency import LatencyTracker
+from api.utils.llm_limiter import LimiterBusy, PRIORITY_BATCH, PRIORITY_INTERACTIVE, llm_limiter
+from api.utils.redis_cache import shared_cache
+from api.utils.singleflight import SingleFlight
+from api.utils.text_matcher import normalized_hash, option_keys_and_texts
 from loguru import logger
 
 settings = get_settings()
 
-# 初始化DeepSeek客户端
+# 初始化DeepSeek客户端（重试由AIService._complete统一处理，关闭SDK自带重试）
 client = AsyncOpenAI(
     api_key=settings.deepseek_api_key,
-    base_url=settings.deepseek_base_url
+    base_url=settings.deepseek_base_url,
+    timeout=httpx.Timeout(settings.llm_read_timeout, connect=settings.llm_connect_timeout),
+    max_retries=0
 )
 
+# 进行中的AI请求（请求指纹 -> 任务），并发的相同请求共享一次调用
+ai_flights = SingleFlight()
+
+# AI服务熔断器与调用耗时统计（每个worker一个）
+llm_breaker = CircuitBreaker(settings.llm_breaker_threshold, settings.llm_breaker_recovery)
+llm_latency = LatencyTracker()
+llm_call_stats = {"calls": 0, "retries": 0, "failures": 0, "hedged": 0, "hedgeWins": 0, "hedgeSkipped": 0}
+
+
+class AIUnavailable(Exception):
+    """AI服务不可用（熔断中或重试后仍失败）"""
+    
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
 # 题型Prompt模板
 PROMPTS = {
     "0": """你是一个答题助手。请回答以下单选题（只选一个选项）。
@@ -72,6 +105,22 @@ PROMPTS = {
 答案："""
 }
 
+# 批量答题：可打包的客观题题型
+BATCH_TYPES = {"0": "单选题", "1": "多选题", "2": "判断题"}
+
+BATCH_PROMPT = """你是一个答题助手。请依次回答以下{count}道题目。
+每道题输出一行，格式为"题号. 答案"，不要有任何解释：
+- 单选题只写一个选项字母（仅从该题给定选项中选择）
+- 多选题写所有正确选项字母，用逗号分隔（如：2. A,B,D），至少选两个
+- 判断题写"对"或"错"
+
+{questions}
+
+答案："""
+
+# 批量答题输出行: "题号. 答案"
+_PACKED_LINE_PATTERN = re.compile(r"^\s*(\d+)\s*[.、:：)）]\s*(.+?)\s*$")
+
 
 class AIService:
     """AI答题服务"""
@@ -82,93 +131,556 @@ class AIService:
         question_type: str,
         options: list = None,
         model: str = None,
-        attempted_answers: list = None
+        attempted_answers: list = None,
+        priority: int = PRIORITY_INTERACTIVE
     ) -> dict:
-        """使用AI生成答案"""
+        """
+        使用AI生成答案
+        
+        先查进程内缓存和Redis共享缓存，未命中时相同指纹的并发请求只调用一次AI。
+        已尝试答案的重答请求需要新答案，不走缓存也不合并。
+        AI调用受llm_limiter并发限制，排队超时抛出LimiterBusy；
+        熔断中或重试后仍失败抛出AIUnavailable。
+        """
         try:
             # 选择模型
             if model is None:
                 model = settings.deepseek_model
             
-            # 构建prompt
-            prompt_template = PROMPTS.get(question_type, PROMPTS["4"])
+            if attempted_answers:
+                return await AIService._generate(content, question_type, options, model, attempted_answers, priority)
             
-            # 格式化选项并获取有效选项keys
-            options_text = ""
-            valid_keys = []
-            if options:
-                # 处理字典格式: [{key: "A", text: "..."}, ...]
-                if isinstance(options[0], dict):
-                    options_text = "\n".join([f"{opt['key']}. {opt['text']}" for opt in options])
-                    valid_keys = [opt['key'] for opt in options]
-                # 处理字符串格式: ["选项1", "选项2", ...]
-                elif isinstance(options[0], str):
-                    options_text = "\n".join([f"{chr(65+i)}. {opt}" for i, opt in enumerate(options)])
-                    valid_keys = [chr(65+i) for i in range(len(options))]
-                else:
-                    options_text = "\n".join(str(opt) for opt in options)
-            
-            # 已尝试答案提示
-            attempted_hint = ""
-            if attempted_answers and len(attempted_answers) > 0:
-                attempted_hint = f"注意：以下答案已被证明错误，请避免：{', '.join(attempted_answers)}\n请给出标准答案，注意区分大小写、空格和标点符号。"
-            
-            prompt = prompt_template.format(
-                question=content,
-                options=options_text,
-                attempted_hint=attempted_hint
-            )
+            keys, texts = AIService._option_texts(options)
+            fingerprint = AIService._fingerprint(content, question_type, keys, texts, model, 0.1)
             
-            # 调用AI
-            logger.info(f"调用AI: model={model}, type={question_type}")
+            entry = ai_cache.get(fingerprint)
+            if entry is None:
+                entry = await shared_cache.get_json(shared_cache.ai_key(fingerprint))
+                if entry:
+                    ai_cache.set(fingerprint, entry)
+            cached = bool(entry)
+            if cached:
+                logger.info(f"AI答案缓存命中: {fingerprint}")
+            else:
+                entry = await ai_flights.do(
+                    fingerprint,
+                    lambda: AIService._generate_entry(
+                        fingerprint, content, question_type, options, model, keys, texts, priority
+                    )
+                )
             
-            # 如果有已尝试答案，提高temperature增加多样性
-            temperature = 0.5 if (attempted_answers and len(attempted_answers) > 0) else 0.1
+            result = AIService._from_entry(entry, keys, texts)
+            if result is None:
+                # 缓存的选项与本次请求对应不上，直接调用AI
+                return await AIService._generate(content, question_type, options, model, priority=priority)
+            result["cached"] = cached
+            return result
             
-            response = await client.chat.completions.create(
+        except LimiterBusy:
+            logger.warning("AI调用排队超时")
+            raise
+        except AIUnavailable as e:
+            logger.warning(f"AI服务不可用: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"AI答题失败: {e}")
+            raise
+    
+    @staticmethod
+    async def answer_questions_batch(items: list[dict], model: str = None) -> list[dict | None]:
+        """
+        批量AI答题
+        
+        批次内指纹相同的题目只回答一次；先查AI答案缓存，未命中的客观题（单选/多选/判断）
+        每ai_batch_pack_size道打包进一个prompt按题号输出，逐题校验后用_clean_answer清理，
+        解析失败的题目重新打包重试，仍失败时逐题调用answer_question；其他题型逐题调用。
+        AI服务不可用时不再逐题调用，未回答的题目返回None。
+        
+        Args:
+            items: [{"content", "type", "options"}, ...]
+            model: 模型（默认deepseek_model）
+        
+        Returns:
+            与items一一对应的答案（结构同answer_question），失败为None
+        """
+        if model is None:
+            model = settings.deepseek_model
+        
+        # 1. 批次内去重
+        option_texts = [AIService._option_texts(item.get("options")) for item in items]
+        groups: dict[str, list[int]] = {}
+        for i, (item, (keys, texts)) in enumerate(zip(items, option_texts)):
+            fingerprint = AIService._fingerprint(item["content"], item["type"], keys, texts, model, 0.1)
+            groups.setdefault(fingerprint, []).append(i)
+        
+        # 2. AI答案缓存
+        entries: dict[str, dict] = {}
+        cached = set()
+        for fingerprint in groups:
+            entry = ai_cache.get(fingerprint)
+            if entry is None:
+                entry = await shared_cache.get_json(shared_cache.ai_key(fingerprint))
+            if entry:
+                entries[fingerprint] = entry
+                cached.add(fingerprint)
+        
+        pending = [fingerprint for fingerprint in groups if fingerprint not in entries]
+        packable = [
+            fingerprint for fingerprint in pending
+            if items[groups[fingerprint][0]]["type"] == "2"
+            or (items[groups[fingerprint][0]]["type"] in BATCH_TYPES and option_texts[groups[fingerprint][0]][0])
+        ]
+        
+        # 3. 客观题打包回答，只重试解析失败的题目
+        unavailable = False
+        for attempt in range(settings.ai_batch_retries + 1):
+            if not packable:
+                break
+            size = settings.ai_batch_pack_size
+            chunks = [packable[i:i + size] for i in range(0, len(packable), size)]
+            answers = await asyncio.gather(*[
+                AIService._generate_packed([items[groups[fingerprint][0]] for fingerprint in chunk], model)
+                for chunk in chunks
+            ], return_exceptions=True)
+            failed = []
+            for chunk, results in zip(chunks, answers):
+                if isinstance(results, AIUnavailable):
+                    unavailable = True
+                    continue
+                if isinstance(results, BaseException):
+                    raise results
+                for fingerprint, result in zip(chunk, results):
+                    if result is None:
+                        failed.append(fingerprint)
+                        continue
+                    first = groups[fingerprint][0]
+                    keys, texts = option_texts[first]
+                    entries[fingerprint] = await AIService._store_entry(
+                        fingerprint, result, items[first]["type"], keys, texts
+                    )
+            if unavailable:
+                logger.warning("批量AI答题: AI服务不可用，停止调用")
+                break
+            if failed:
+                logger.warning(f"批量AI答题第{attempt + 1}次: {len(failed)}题解析失败")
+            packable = failed
+        
+        # 4. 按各题自己的选项顺序还原答案
+        results: list[dict | None] = [None] * len(items)
+        for fingerprint, indexes in groups.items():
+            entry = entries.get(fingerprint)
+            if entry is None:
+                continue
+            for i in indexes:
+                keys, texts = option_texts[i]
+                result = AIService._from_entry(entry, keys, texts)
+                if result is not None:
+                    result["cached"] = fingerprint in cached or i != indexes[0]
+                    results[i] = result
+        
+        # 5. 其余题目逐题调用（同指纹的题目由answer_question合并为一次调用）
+        async def answer_single(i: int):
+            item = items[i]
+            try:
+                results[i] = await AIService.answer_question(
+                    item["content"], item["type"], item.get("options"), model, priority=PRIORITY_BATCH
+                )
+            except LimiterBusy:
+                raise
+            except AIUnavailable:
+                pass
+            except Exception as e:
+                logger.error(f"批量AI答题单题失败: {e}")
+        
+        if not unavailable:
+            await asyncio.gather(*[answer_single(i) for i, result in enumerate(results) if result is None])
+        
+        logger.info(f"批量AI答题: {len(items)}题, 去重后{len(groups)}题, 缓存命中{len(cached)}题")
+        return results
+    
+    @staticmethod
+    async def _generate_packed(items: list[dict], model: str) -> list[dict | None]:
+        """
+        将多道客观题打包进一个prompt调用AI
+        
+        Returns:
+            与items一一对应的答案，缺失或不合法为None
+        """
+        blocks = []
+        valid_keys = []
+        for number, item in enumerate(items, 1):
+            options_text, keys = AIService._format_options(item.get("options"))
+            block = f"{number}. [{BATCH_TYPES[item['type']]}] {item['content']}"
+            if options_text and item["type"] != "2":
+                block += "\n" + options_text
+            blocks.append(block)
+            valid_keys.append(keys)
+        prompt = BATCH_PROMPT.format(count=len(items), questions="\n\n".join(blocks))
+        
+        logger.info(f"批量调用AI: model={model}, {len(items)}题")
+        try:
+            response = await AIService._complete(
+                PRIORITY_BATCH,
                 model=model,
                 messages=[
                     {"role": "system", "content": "你是一个专业的答题助手。"},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=temperature,
+                temperature=0.1,
+                max_tokens=32 * len(items) + 64
+            )
+        except (LimiterBusy, AIUnavailable):
+            raise
+        except Exception as e:
+            logger.error(f"批量调用AI失败: {e}")
+            return [None] * len(items)
+        
+        raw_answers = {}
+        for line in (response.choices[0].message.content or "").splitlines():
+            match = _PACKED_LINE_PATTERN.match(line)
+            if match:
+                raw_answers.setdefault(int(match.group(1)), match.group(2))
+        
+        tokens = (response.usage.total_tokens if response.usage else 0) // len(items)
+        results = []
+        for number, (item, keys) in enumerate(zip(items, valid_keys), 1):
+            raw = raw_answers.get(number)
+            if raw is None or not AIService._is_valid_packed(raw, item["type"], keys):
+                results.append(None)
+                continue
+            results.append({
+                "answer": AIService._clean_answer(raw, item["type"], keys),
+                "reasoning": "",
+                "confidence": 0.85,
+                "model": model,
+                "tokens": tokens
+            })
+        return results
+    
+    @staticmethod
+    def _is_valid_packed(raw: str, question_type: str, valid_keys: list) -> bool:
+        """
+        校验打包输出中的单题答案
+        
+        _clean_answer遇到不合法答案会退回默认选项，打包输出需先校验，不合法的题目重试。
+        """
+        if question_type == "2":
+            return any(word in raw for word in ["对", "错", "正确", "错误"])
+        letters = {c for c in raw.upper() if c in valid_keys}
+        return len(letters) >= (2 if question_type == "1" else 1)
+    
+    @staticmethod
+    async def _generate_entry(
+        fingerprint: str,
+        content: str,
+        question_type: str,
+        options: list | None,
+        model: str,
+        keys: list,
+        texts: list,
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> dict:
+        """调用AI并写入缓存，返回缓存条目（选择题答案按选项文本保存）"""
+        result = await AIService._generate(content, question_type, options, model, priority=priority)
+        return await AIService._store_entry(fingerprint, result, question_type, keys, texts)
+    
+    @staticmethod
+    async def _store_entry(fingerprint: str, result: dict, question_type: str, keys: list, texts: list) -> dict:
+        """AI答案写入进程内缓存和共享缓存，返回缓存条目"""
+        entry = dict(result)
+        if question_type in ("0", "1") and AIService._remappable(keys, texts):
+            key_to_text = dict(zip(keys, texts))
+            parts = [part for part in result["answer"].split(",") if part]
+            if not parts or any(part not in key_to_text for part in parts):
+                # 答案无法对应到选项，不缓存；记录本次的选项顺序，
+                # 合并到同一调用但选项顺序不同的请求不能共用这些字母，需单独调用
+                entry["optionOrder"] = list(texts)
+                return entry
+            entry["optionTexts"] = sorted(key_to_text[part] for part in parts)
+        
+        ai_cache.set(fingerprint, entry)
+        await shared_cache.set_json(shared_cache.ai_key(fingerprint), entry, settings.redis_ai_cache_ttl)
+        return entry
+    
+    @staticmethod
+    def _from_entry(entry: dict, keys: list, texts: list) -> dict | None:
+        """
+        缓存条目转为本次请求的答案（按选项文本映射回本次请求的选项字母）
+        
+        无法映射时返回None（选项对应不上，或条目的字母只对另一种选项顺序有效）
+        """
+        result = dict(entry)
+        option_texts = result.pop("optionTexts", None)
+        option_order = result.pop("optionOrder", None)
+        if option_order is not None and option_order != list(texts):
+            return None
+        if option_texts is None:
+            return result
+        text_to_key = dict(zip(texts, keys))
+        if any(text not in text_to_key for text in option_texts):
+            return None
+        result["answer"] = ",".join(sorted(text_to_key[text] for text in option_texts))
+        return result
+    
+    @staticmethod
+    def remap_bank_answer(stored: dict, question_type: str, options: list | None) -> str | None:
+        """
+        题库答案转为本次请求的选项字母
+        
+        选择题按题库中答案对应的选项文本（optionTexts）映射，本次请求的选项与题库选项
+        对应不上时返回None（不能直接使用题库字母）。
+        """
+        if question_type not in ("0", "1") or not options:
+            return stored["answer"]
+        keys, texts = AIService._option_texts(options)
+        if not stored.get("optionTexts") or not AIService._remappable(keys, texts):
+            return None
+        result = AIService._from_entry(
+            {"answer": stored["answer"], "optionTexts": stored["optionTexts"]}, keys, texts
+        )
+        return result["answer"] if result else None
+    
+    @staticmethod
+    async def _generate(
+        content: str,
+        question_type: str,
+        options: list | None,
+        model: str,
+        attempted_answers: list = None,
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> dict:
+        """构建prompt并调用AI"""
+        # 构建prompt
+        prompt_template = PROMPTS.get(question_type, PROMPTS["4"])
+        
+        # 格式化选项并获取有效选项keys
+        options_text, valid_keys = AIService._format_options(options)
+        
+        # 已尝试答案提示
+        attempted_hint = ""
+        if attempted_answers and len(attempted_answers) > 0:
+            attempted_hint = f"注意：以下答案已被证明错误，请避免：{', '.join(attempted_answers)}\n请给出标准答案，注意区分大小写、空格和标点符号。"
+        
+        prompt = prompt_template.format(
+            question=content,
+            options=options_text,
+            attempted_hint=attempted_hint
+        )
+        
+        # 调用AI
+        logger.info(f"调用AI: model={model}, type={question_type}")
+        
+        # 如果有已尝试答案，提高temperature增加多样性
+        temperature = 0.5 if (attempted_answers and len(attempted_answers) > 0) else 0.1
+        
+        response = await AIService._complete(
+            priority,
+            model=model,
+            messages=[
+                {"role": "system", "content": "你是一个专业的答题助手。"},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=temperature,
+            max_tokens=500
+        )
+        
+        answer = response.choices[0].message.content.strip()
+        
+        # 清理答案
+        answer = AIService._clean_answer(answer, question_type, valid_keys)
+        
+        # 检查是否与已尝试答案重复
+        if attempted_answers and answer in attempted_answers:
+            logger.warning(f"AI返回了重复答案: {answer}，尝试重新生成")
+            # 如果重复，提高temperature再试一次
+            response = await AIService._complete(
+                priority,
+                model=model,
+                messages=[
+                    {"role": "system", "content": "你是一个专业的答题助手。请给出与之前完全不同的答案！"},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.8,  # 进一步提高多样性
                 max_tokens=500
             )
-            
             answer = response.choices[0].message.content.strip()
-            
-            # 清理答案
             answer = AIService._clean_answer(answer, question_type, valid_keys)
+        
+        logger.info(f"AI答案: {answer}")
+        
+        result = {
+            "answer": answer,
+            "reasoning": "",  # 可选：添加推理过程
+            "confidence": 0.85,
+            "model": model,
+            "tokens": response.usage.total_tokens if response.usage else 0
+        }
+        return result
+    
+    @staticmethod
+    async def _complete(priority: int, **kwargs):
+        """
+        调用AI（并发限制、重试与熔断）
+        
+        每次尝试在并发限制内进行（批量任务排队时间更长、优先级更低），退避等待时不占用槽位。
+        超时、连接错误、429和5xx按指数退避重试，其他错误直接抛出；
+        熔断中或重试后仍失败抛出AIUnavailable。
+        """
+        max_wait = settings.llm_max_queue_wait if priority <= PRIORITY_INTERACTIVE else settings.llm_batch_max_queue_wait
+        for attempt in range(settings.llm_max_retries + 1):
+            if not llm_breaker.allow():
+                raise AIUnavailable("AI服务暂不可用（熔断中）", llm_breaker.retry_after())
+            try:
+                async with llm_limiter.slot(priority, max_wait):
+                    response = await AIService._attempt(kwargs)
+                llm_breaker.record_success()
+                return response
+            except LimiterBusy:
+                raise
+            except Exception as e:
+                if not AIService._retryable(e):
+                    if isinstance(e, openai.APIStatusError):
+                        # 服务正常响应的错误（如400/401）不计入熔断
+                        llm_breaker.record_success()
+                    raise
+                llm_breaker.record_failure()
+                llm_call_stats["failures"] += 1
+                if attempt >= settings.llm_max_retries:
+                    raise AIUnavailable(f"AI服务调用失败: {e}", llm_breaker.retry_after()) from e
+                delay = AIService._backoff(attempt, e)
+                llm_call_stats["retries"] += 1
+                logger.warning(f"AI调用失败（第{attempt + 1}次），{delay:.2f}秒后重试: {e}")
+                await asyncio.sleep(delay)
+    
+    @staticmethod
+    async def _attempt(kwargs: dict):
+        """
+        发起一次AI调用
+        
+        开启对冲时，调用耗时超过近期耗时分位数仍未返回则再发一个相同请求，
+        取先成功的结果并取消另一个。对冲请求不排队地额外占用一个并发槽位，
+        没有空闲槽位时放弃对冲，保证实际并发不超过llm_limiter的上限。
+        """
+        llm_call_stats["calls"] += 1
+        start = time.monotonic()
+        delay = AIService._hedge_delay()
+        if delay is None:
+            response = await client.chat.completions.create(**kwargs)
+            llm_latency.record(time.monotonic() - start)
+            return response
+        
+        primary = asyncio.create_task(client.chat.completions.create(**kwargs))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                if llm_limiter.try_acquire():
+                    llm_call_stats["hedged"] += 1
+                    logger.info(f"AI调用超过{delay:.2f}秒未返回，发起对冲请求")
+                    tasks.add(asyncio.create_task(AIService._hedge(kwargs)))
+                else:
+                    llm_call_stats["hedgeSkipped"] += 1
             
-            # 检查是否与已尝试答案重复
-            if attempted_answers and answer in attempted_answers:
-                logger.warning(f"AI返回了重复答案: {answer}，尝试重新生成")
-                # 如果重复，提高temperature再试一次
-                response = await client.chat.completions.create(
-                    model=model,
-                    messages=[
-                        {"role": "system", "content": "你是一个专业的答题助手。请给出与之前完全不同的答案！"},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.8,  # 进一步提高多样性
-                    max_tokens=500
-                )
-                answer = response.choices[0].message.content.strip()
-                answer = AIService._clean_answer(answer, question_type, valid_keys)
-            
-            logger.info(f"AI答案: {answer}")
-            
-            return {
-                "answer": answer,
-                "reasoning": "",  # 可选：添加推理过程
-                "confidence": 0.85,
-                "model": model,
-                "tokens": response.usage.total_tokens if response.usage else 0
-            }
-            
-        except Exception as e:
-            logger.error(f"AI答题失败: {e}")
-            raise
+            error = None
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                winner = None
+                for task in done:
+                    tasks.discard(task)
+                    if task.exception() is None:
+                        winner = winner or task
+                    else:
+                        error = task.exception()
+                if winner is not None:
+                    if winner is not primary:
+                        llm_call_stats["hedgeWins"] += 1
+                    llm_latency.record(time.monotonic() - start)
+                    return winner.result()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    @staticmethod
+    async def _hedge(kwargs: dict):
+        """对冲请求（已由调用方占用槽位，结束或被取消时归还）"""
+        try:
+            return await client.chat.completions.create(**kwargs)
+        finally:
+            llm_limiter.release()
+    
+    @staticmethod
+    def _hedge_delay() -> float | None:
+        """对冲请求的等待时间，未开启或耗时样本不足时返回None"""
+        if not settings.llm_hedge_enabled or len(llm_latency) < settings.llm_hedge_min_samples:
+            return None
+        return max(llm_latency.percentile(settings.llm_hedge_percentile), settings.llm_hedge_min_delay)
+    
+    @staticmethod
+    def _retryable(error: Exception) -> bool:
+        """超时、连接错误、408/409/429和5xx可以重试"""
+        if isinstance(error, openai.APIConnectionError):
+            return True
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code in (408, 409, 429) or error.status_code >= 500
+        return False
+    
+    @staticmethod
+    def _backoff(attempt: int, error: Exception) -> float:
+        """指数退避间隔（带抖动），服务端返回Retry-After时优先使用"""
+        if isinstance(error, openai.APIStatusError):
+            retry_after = error.response.headers.get("retry-after", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), settings.llm_retry_max_delay)
+        delay = min(settings.llm_retry_base_delay * 2 ** attempt, settings.llm_retry_max_delay)
+        return delay / 2 + random.uniform(0, delay / 2)
+    
+    @staticmethod
+    def _format_options(options: list | None) -> tuple[str, list]:
+        """格式化选项文本，返回 (选项文本, 有效选项keys)"""
+        if not options:
+            return "", []
+        # 处理字典格式: [{key: "A", text: "..."}, ...]
+        if isinstance(options[0], dict):
+            return "\n".join([f"{opt['key']}. {opt['text']}" for opt in options]), [opt['key'] for opt in options]
+        # 处理字符串格式: ["选项1", "选项2", ...]
+        if isinstance(options[0], str):
+            options_text = "\n".join([f"{chr(65+i)}. {opt}" for i, opt in enumerate(options)])
+            return options_text, [chr(65+i) for i in range(len(options))]
+        return "\n".join(str(opt) for opt in options), []
+    
+    @staticmethod
+    def _remappable(option_keys: list, option_texts: list) -> bool:
+        """选项能否按文本对应（乱序请求共用缓存）"""
+        return bool(option_keys) and len(set(option_texts)) == len(option_texts)
+    
+    @staticmethod
+    def _option_texts(options: list | None) -> tuple[list, list]:
+        """选项字母和规范化后的选项文本"""
+        return option_keys_and_texts(options)
+    
+    @staticmethod
+    def _fingerprint(
+        content: str,
+        question_type: str,
+        option_keys: list,
+        option_texts: list,
+        model: str,
+        temperature: float
+    ) -> str:
+        """
+        AI请求指纹（题型、规范化题干、选项文本、模型、温度）
+        
+        选项带字母且文本互不相同时排序后参与计算，选项顺序打乱的请求共用同一指纹，
+        选择题答案按选项文本缓存、命中后映射回本次请求的字母。
+        """
+        if AIService._remappable(option_keys, option_texts):
+            option_texts = sorted(option_texts)
+        payload = json.dumps(
+            [question_type, normalized_hash(content), option_texts, model, round(temperature, 1)],
+            ensure_ascii=False
+        )
+        return hashlib.md5(payload.encode()).hexdigest()
     
     @staticmethod
     def _clean_answer(answer: str, question_type: str, valid_keys: list = None) -> str:
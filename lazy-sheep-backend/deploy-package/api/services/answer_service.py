@@ -3,7 +3,7 @@
 """
 from typing import List, Optional, Dict
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_
+from sqlalchemy import desc, and_, func, select
 from api.models.question import Question
 from api.models.answer import Answer
 import hashlib
@@ -50,6 +50,7 @@ class AnswerService:
             # 如果已存在，更新置信度（取更高值）
             if confidence > existing.confidence:
                 existing.confidence = confidence
+                AnswerService._update_best_answer(session, existing)
                 session.commit()
                 session.refresh(existing)
             return existing
@@ -65,12 +66,13 @@ class AnswerService:
         )
         
         session.add(new_answer)
+        session.flush()
+        
+        # 与当前最佳答案比较，增量更新
+        AnswerService._update_best_answer(session, new_answer)
         session.commit()
         session.refresh(new_answer)
         
-        # 自动评估是否应该设为最佳答案
-        AnswerService._evaluate_best_answer(session, question_id)
-        
         return new_answer
     
     @staticmethod
@@ -133,17 +135,20 @@ class AnswerService:
         Returns:
             Answer: 更新后的答案
         """
-        answer = session.query(Answer).get(answer_id)
-        if not answer:
+        # 原子累加，并发投票不丢失更新
+        updated = session.query(Answer).filter(Answer.id == answer_id).update(
+            {Answer.vote_count: Answer.vote_count + vote},
+            synchronize_session=False
+        )
+        if not updated:
             raise ValueError(f"答案 {answer_id} 不存在")
+        answer = session.get(Answer, answer_id, populate_existing=True)
         
-        answer.vote_count += vote
+        # 重新评估最佳答案（只比较被投票的答案）
+        AnswerService._update_best_answer(session, answer, demoted=vote < 0)
         session.commit()
         session.refresh(answer)
         
-        # 重新评估最佳答案
-        AnswerService._evaluate_best_answer(session, answer.question_id)
-        
         return answer
     
     @staticmethod
@@ -212,54 +217,140 @@ class AnswerService:
         }
     
     @staticmethod
-    def _evaluate_best_answer(session: Session, question_id: int):
+    def answer_priority(ans: Answer) -> tuple:
         """
-        自动评估并设置最佳答案
-        
-        评估规则（优先级从高到低）：
+        最佳答案优先级（从高到低）：
         1. 人工验证的答案
         2. platform_verified来源的答案
         3. 投票数最高的答案
         4. 置信度最高的答案
+        """
+        return (
+            bool(ans.verified),  # 人工验证
+            ans.source == "platform_verified",  # 平台验证
+            ans.vote_count or 0,  # 投票数
+            ans.confidence or 0.0  # 置信度
+        )
+    
+    @staticmethod
+    def best_answer_order() -> tuple:
+        """与answer_priority一致的ORDER BY子句（同优先级取先创建的答案）"""
+        return (
+            func.coalesce(Answer.verified, False).desc(),
+            (Answer.source == "platform_verified").desc(),
+            func.coalesce(Answer.vote_count, 0).desc(),
+            func.coalesce(Answer.confidence, 0.0).desc(),
+            Answer.id
+        )
+    
+    @staticmethod
+    def accepted_answers_stmt(question_id: int):
+        """题目当前带最佳答案标记的答案（正常情况下至多一个）"""
+        return select(Answer).where(
+            Answer.question_id == question_id,
+            Answer.is_accepted == True
+        )
+    
+    @staticmethod
+    def top_answer_stmt(answer: Answer, accepted: Optional[Answer], demoted: bool = False):
+        """
+        增量选择时需要比较的排名第一的其他答案
+        
+        只在题目尚无最佳答案，或当前最佳答案排序可能下降（demoted）时需要查询，否则返回None
+        """
+        if accepted is not None and not (accepted is answer and demoted):
+            return None
+        return select(Answer).where(
+            Answer.question_id == answer.question_id,
+            Answer.id != answer.id
+        ).order_by(*AnswerService.best_answer_order()).limit(1)
+    
+    @staticmethod
+    def choose_best_answer(
+        answer: Answer,
+        accepted: Optional[Answer],
+        top: Optional[Answer] = None
+    ) -> Optional[Answer]:
+        """
+        增量选择最佳答案
+        
+        Args:
+            answer: 新增或排序字段变化的答案
+            accepted: 当前最佳答案
+            top: 需要时按best_answer_order查询的排名第一的其他答案
+            
+        Returns:
+            Optional[Answer]: 新的最佳答案，不变时返回None
+        """
+        if accepted is answer:
+            if top is not None and AnswerService.answer_priority(top) > AnswerService.answer_priority(answer):
+                return top
+            # 仍为最佳答案，排序字段变化需同步到题目
+            return answer
+        if accepted is None or AnswerService.answer_priority(answer) > AnswerService.answer_priority(accepted):
+            if top is not None and AnswerService.answer_priority(top) > AnswerService.answer_priority(answer):
+                return top
+            return answer
+        return None
+    
+    @staticmethod
+    def accept_answer(question: Optional[Question], best: Answer, previous: Optional[Answer] = None):
+        """切换最佳答案标记（最多修改两行答案）并同步到Question表（向后兼容）"""
+        if previous is not None and previous is not best:
+            previous.is_accepted = False
+        best.is_accepted = True
+        if question:
+            question.answer = best.answer
+            question.answer_text = best.answer_text
+            question.source = best.source
+            question.confidence = best.confidence
+    
+    @staticmethod
+    def _update_best_answer(session: Session, answer: Answer, demoted: bool = False):
+        """
+        增量维护最佳答案（不提交，与SearchService._update_best_answer共用查询和选择规则）
+        
+        Args:
+            session: 数据库会话
+            answer: 新增或排序字段变化的答案
+            demoted: 答案的排序字段是否可能下降（如反对票）
+        """
+        accepted = session.execute(AnswerService.accepted_answers_stmt(answer.question_id)).scalars().all()
+        if len(accepted) > 1:
+            # 历史数据存在多个最佳答案标记，全量重选
+            AnswerService._evaluate_best_answer(session, answer.question_id)
+            return
+        
+        current = accepted[0] if accepted else None
+        top_stmt = AnswerService.top_answer_stmt(answer, current, demoted)
+        top = session.execute(top_stmt).scalar_one_or_none() if top_stmt is not None else None
+        
+        best = AnswerService.choose_best_answer(answer, current, top)
+        if best is not None:
+            question = session.get(Question, answer.question_id)
+            AnswerService.accept_answer(question, best, current)
+    
+    @staticmethod
+    def _evaluate_best_answer(session: Session, question_id: int):
+        """
+        全量重选最佳答案（不提交，用于删除/合并答案后）
         
         Args:
             session: 数据库会话
             question_id: 题目ID
         """
-        # 获取所有答案
         answers = session.query(Answer).filter(
             Answer.question_id == question_id
-        ).all()
+        ).order_by(Answer.id).all()
         
         if not answers:
             return
         
-        # 先清除所有is_accepted标记
+        best_answer = max(answers, key=AnswerService.answer_priority)
         for ans in answers:
-            ans.is_accepted = False
-        
-        # 按优先级排序
-        def answer_priority(ans: Answer) -> tuple:
-            return (
-                ans.verified,  # 人工验证
-                ans.source == "platform_verified",  # 平台验证
-                ans.vote_count,  # 投票数
-                ans.confidence  # 置信度
-            )
-        
-        # 选择最佳答案
-        best_answer = max(answers, key=answer_priority)
-        best_answer.is_accepted = True
-        
-        # 更新Question表的answer字段（向后兼容）
-        question = session.query(Question).get(question_id)
-        if question:
-            question.answer = best_answer.answer
-            question.answer_text = best_answer.answer_text
-            question.source = best_answer.source
-            question.confidence = best_answer.confidence
-        
-        session.commit()
+            if ans.is_accepted and ans is not best_answer:
+                ans.is_accepted = False
+        AnswerService.accept_answer(session.get(Question, question_id), best_answer)
     
     @staticmethod
     def merge_answers(
@@ -294,5 +385,5 @@ class AnswerService:
             target.confidence = max(target.confidence, ans.confidence)
             session.delete(ans)
         
-        session.commit()
         AnswerService._evaluate_best_answer(session, question_id)
+        session.commit()
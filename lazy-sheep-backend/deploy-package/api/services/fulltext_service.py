@@ -0,0 +1,121 @@
+"""
+数据库全文检索服务 - 模糊匹配候选召回（search_backend=fulltext 时启用）
+
+SQLite: FTS5虚拟表 questions_fts，存储题干n-gram词串，按bm25排序
+PostgreSQL: question_search表 + pg_trgm GIN索引，按similarity排序
+
+表结构见 migrations/003_add_fulltext_sqlite.sql / 003_add_fulltext_postgresql.sql
+"""
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from api.models import Question
+from api.utils.ngram_index import extract_ngrams
+from api.utils.text_matcher import canonicalize_text
+from loguru import logger
+
+
+class FulltextService:
+    """全文检索服务"""
+
+    @staticmethod
+    def _dialect(session: AsyncSession) -> str:
+        return session.bind.dialect.name
+
+    @staticmethod
+    def _fts_document(content: str) -> str:
+        """FTS5文档：空格分隔的n-gram（unicode61分词器会把每个n-gram作为一个词）"""
+        return " ".join(sorted(extract_ngrams(content)))
+
+    @staticmethod
+    async def search_candidates(
+        session: AsyncSession,
+        content: str,
+        question_type: str,
+        platform: str,
+        limit: int = 50
+    ) -> list[int]:
+        """
+        召回模糊匹配候选
+
+        Returns:
+            题目主键列表，按相关度降序
+        """
+        if FulltextService._dialect(session) == "postgresql":
+            stmt = text(
+                "SELECT question_id FROM question_search "
+                "WHERE platform = :platform AND type = :type AND content_normalized % :query "
+                "ORDER BY similarity(content_normalized, :query) DESC LIMIT :limit"
+            )
+            params = {"query": canonicalize_text(content)}
+        else:
+            grams = extract_ngrams(content)
+            if not grams:
+                return []
+            stmt = text(
+                "SELECT rowid FROM questions_fts "
+                "WHERE questions_fts MATCH :query AND platform = :platform AND type = :type "
+                "ORDER BY rank LIMIT :limit"
+            )
+            params = {"query": " OR ".join(f'"{gram}"' for gram in grams)}
+
+        params.update({"platform": platform, "type": question_type, "limit": limit})
+        result = await session.execute(stmt, params)
+        return [row[0] for row in result.all()]
+
+    @staticmethod
+    async def index_question(session: AsyncSession, question: Question):
+        """写入/更新单个题目的检索记录（随调用方事务提交，失败不影响题目保存）"""
+        await FulltextService.index_questions(session, [question])
+    
+    @staticmethod
+    async def index_questions(session: AsyncSession, questions: list[Question]):
+        """批量写入/更新检索记录（随调用方事务提交，失败不影响题目保存）"""
+        try:
+            async with session.begin_nested():
+                await FulltextService._upsert(session, questions)
+        except Exception as e:
+            logger.warning(f"全文索引写入失败（请确认已执行全文检索迁移）: {e}")
+
+    @staticmethod
+    async def rebuild(session: AsyncSession, chunk_size: int = 1000) -> int:
+        """重建全部检索记录，返回处理的题目数"""
+        last_id = 0
+        total = 0
+        while True:
+            stmt = select(Question).where(Question.id > last_id).order_by(Question.id).limit(chunk_size)
+            questions = (await session.execute(stmt)).scalars().all()
+            if not questions:
+                break
+            last_id = questions[-1].id
+            total += len(questions)
+            await FulltextService._upsert(session, questions)
+            await session.commit()
+        return total
+
+    @staticmethod
+    async def _upsert(session: AsyncSession, questions: list[Question]):
+        if FulltextService._dialect(session) == "postgresql":
+            stmt = text(
+                "INSERT INTO question_search (question_id, platform, type, content_normalized) "
+                "VALUES (:id, :platform, :type, :content) "
+                "ON CONFLICT (question_id) DO UPDATE SET "
+                "platform = EXCLUDED.platform, type = EXCLUDED.type, "
+                "content_normalized = EXCLUDED.content_normalized"
+            )
+            rows = [
+                {"id": q.id, "platform": q.platform, "type": q.type,
+                 "content": canonicalize_text(q.content or "")}
+                for q in questions
+            ]
+        else:
+            # FTS5虚拟表不支持UPSERT，INSERT OR REPLACE按rowid覆盖
+            stmt = text(
+                "INSERT OR REPLACE INTO questions_fts (rowid, content, platform, type) "
+                "VALUES (:id, :content, :platform, :type)"
+            )
+            rows = [
+                {"id": q.id, "platform": q.platform, "type": q.type,
+                 "content": FulltextService._fts_document(q.content or "")}
+                for q in questions
+            ]
+        await session.execute(stmt, rows)
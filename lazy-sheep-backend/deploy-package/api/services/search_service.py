@@ -1,13 +1,32 @@
 """
 搜索服务
 """
+import asyncio
 import hashlib
-from sqlalchemy import select
+import time
+from sqlalchemy import select, func, text
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
+from api.config import get_settings
 from api.models import Question, Answer
-from api.utils.text_matcher import fuzzy_match
+from api.services.answer_service import AnswerService
+from api.services.fulltext_service import FulltextService
+from api.services.snapshot_service import SnapshotService
+from api.database import async_session_maker
+from api.utils.answer_table import answer_table
+from api.utils.bloom_filter import question_filter
+from api.utils.cache import search_cache, invalidate_question
+from api.utils.executor import fuzzy_match_async, fuzzy_match_many, run_index_query
+from api.utils.redis_cache import shared_cache
+from api.utils.ngram_index import question_index
+from api.utils.index_snapshot import index_snapshot
+from api.utils.tfidf_index import semantic_index
+from api.utils.text_matcher import answer_option_texts, normalized_hash
+from api.utils.write_buffer import write_buffer
 from loguru import logger
 
+settings = get_settings()
+
 
 class SearchService:
     """搜索服务"""
@@ -22,8 +41,25 @@ class SearchService:
     ) -> dict | None:
         """搜索题目答案"""
         try:
-            # 1. 优先通过questionId精确查询（最快）
-            if question_id:
+            content_hash = normalized_hash(content)
+            id_key = ("id", platform, question_id) if question_id else None
+            hash_key = ("hash", platform, content_hash)
+            
+            # 0. 共享精确答案表（worker间共享内存，无需查库）
+            # 先于进程内缓存查询：其他worker更新最佳答案时只会覆盖共享表，不会清除本进程缓存
+            if answer_table is not None:
+                result = answer_table.get(platform, content_hash)
+                if result:
+                    return result
+            
+            # 0.5 缓存（进程内 → Redis共享缓存）
+            cached, sequence = await SearchService._cache_get_many([k for k in (id_key, hash_key) if k])
+            for result in cached:
+                if result:
+                    return result
+            
+            # 1. 优先通过questionId精确查询（最快，布隆过滤器判定必定不存在时跳过）
+            if question_id and SearchService._might_exist(platform, question_id):
                 stmt = select(Question).where(
                     Question.question_id == question_id,
                     Question.platform == platform
@@ -33,154 +69,570 @@ class SearchService:
                 
                 if question:
                     logger.info(f"ID精确匹配: {question.question_id}")
-                    return {
-                        "answer": question.answer,
-                        "answerText": question.answer_text,
-                        "confidence": question.confidence,
-                        "source": question.source,
-                        "questionId": question.question_id
-                    }
-            
-            # 2. 计算content hash
-            content_hash = hashlib.md5(content.encode()).hexdigest()
+                    return (await SearchService._cache_set_many([(id_key, question, 1.0)], sequence))[0]
             
-            # 3. 精确匹配（通过hash）
+            # 2. 精确匹配（通过规范化hash）
+            if SearchService._might_exist(platform, content_hash):
+                stmt = select(Question).where(
+                    Question.normalized_hash == content_hash,
+                    Question.platform == platform
+                ).limit(1)
+                result = await session.execute(stmt)
+                question = result.scalar_one_or_none()
+                
+                if question:
+                    logger.info(f"Hash精确匹配: {question.question_id}")
+                    return (await SearchService._cache_set_many([(hash_key, question, 1.0)], sequence))[0]
+            
+            # 3. 模糊匹配
+            match = await SearchService._fuzzy_search(content, question_type, platform, session)
+            
+            # 4. 语义匹配（改写、语序调整）
+            if not match:
+                match = await SearchService._semantic_search(content, question_type, platform, session)
+            
+            if match:
+                matched_q, score = match
+                return (await SearchService._cache_set_many([(hash_key, matched_q, score)], sequence))[0]
+            
+            logger.info("未找到匹配题目")
+            return None
+            
+        except Exception as e:
+            logger.error(f"搜索失败: {e}")
+            return None
+    
+    @staticmethod
+    async def batch_search_questions(
+        questions: list[dict],
+        platform: str,
+        session: AsyncSession
+    ) -> tuple[list[dict | None], dict]:
+        """
+        批量搜索题目答案
+        
+        先查缓存，再用一次IN查询解析全部questionId，再用一次IN查询解析剩余题目的hash，
+        只有都未命中的题目才进入模糊匹配。超大批次按chunk分段查询。
+        
+        Args:
+            questions: [{"questionId", "questionContent", "type"}, ...]
+            platform: 平台
+            session: 数据库会话
+        
+        Returns:
+            (与questions一一对应的结果列表（未命中为None）, 各级命中统计)
+        """
+        results: list[dict | None] = [None] * len(questions)
+        tiers = {"cache": 0, "id": 0, "hash": 0, "fuzzy": 0, "semantic": 0}
+        chunk_size = settings.batch_search_chunk_size
+        hashes = {i: normalized_hash(q.get("questionContent", "")) for i, q in enumerate(questions)}
+        # 数据库命中: 题目下标 -> (缓存键, 题目, 相似度, 命中层级)
+        matched: dict[int, tuple[tuple, Question, float, str]] = {}
+        
+        # 0. 共享精确答案表（先于进程内缓存，保证其他worker更新的最佳答案立即可见）
+        if answer_table is not None:
+            for i in range(len(questions)):
+                result = answer_table.get(platform, hashes[i])
+                if result:
+                    results[i] = {**result, "matchType": "hash"}
+                    tiers["hash"] += 1
+        
+        # 0.5 缓存（进程内 → Redis共享缓存，一次流水线批量读取）
+        cache_keys = []
+        for i, q in enumerate(questions):
+            if results[i] is not None:
+                continue
+            if q.get("questionId"):
+                cache_keys.append((i, ("id", platform, q["questionId"])))
+            cache_keys.append((i, ("hash", platform, hashes[i])))
+        cached, sequence = await SearchService._cache_get_many([key for _, key in cache_keys])
+        for (i, _), result in zip(cache_keys, cached):
+            if result and results[i] is None:
+                results[i] = {**result, "matchType": "cache"}
+                tiers["cache"] += 1
+        
+        # 1. questionId批量精确查询
+        pending = [
+            i for i, q in enumerate(questions)
+            if q.get("questionId") and results[i] is None
+            and SearchService._might_exist(platform, q["questionId"])
+        ]
+        id_values = list({questions[i]["questionId"] for i in pending})
+        by_question_id = {}
+        for chunk in _chunks(id_values, chunk_size):
             stmt = select(Question).where(
-                Question.content_hash == content_hash,
+                Question.question_id.in_(chunk),
                 Question.platform == platform
             )
             result = await session.execute(stmt)
-            question = result.scalar_one_or_none()
-            
+            by_question_id.update({q.question_id: q for q in result.scalars().all()})
+        
+        for i in pending:
+            question = by_question_id.get(questions[i]["questionId"])
             if question:
-                logger.info(f"Hash精确匹配: {question.question_id}")
-                return {
-                    "answer": question.answer,
-                    "answerText": question.answer_text,
-                    "confidence": question.confidence,
-                    "source": question.source,
-                    "questionId": question.question_id
-                }
-            
-            # 3. 模糊匹配
+                matched[i] = (("id", platform, questions[i]["questionId"]), question, 1.0, "id")
+        
+        # 2. 规范化hash批量精确查询
+        pending = [
+            i for i in range(len(questions))
+            if results[i] is None and i not in matched and SearchService._might_exist(platform, hashes[i])
+        ]
+        by_hash = {}
+        for chunk in _chunks(list({hashes[i] for i in pending}), chunk_size):
             stmt = select(Question).where(
-                Question.type == question_type,
+                Question.normalized_hash.in_(chunk),
                 Question.platform == platform
-            ).limit(50)  # 限制候选数量
+            )
             result = await session.execute(stmt)
-            candidates = result.scalars().all()
-            
-            if candidates:
-                # 使用文本相似度匹配
-                best_match = fuzzy_match(content, [q.content for q in candidates])
-                if best_match and best_match["score"] > 0.85:
-                    matched_q = candidates[best_match["index"]]
-                    logger.info(f"模糊匹配: {matched_q.question_id}, 相似度: {best_match['score']}")
-                    return {
-                        "answer": matched_q.answer,
-                        "answerText": matched_q.answer_text,
-                        "confidence": matched_q.confidence * best_match["score"],
-                        "source": matched_q.source,
-                        "questionId": matched_q.question_id
-                    }
-            
-            logger.info("未找到匹配题目")
-            return None
-            
+            for q in result.scalars().all():
+                by_hash.setdefault(q.normalized_hash, q)
+        
+        for i in pending:
+            question = by_hash.get(hashes[i])
+            if question:
+                matched[i] = (("hash", platform, hashes[i]), question, 1.0, "hash")
+        
+        # 3. 仅对真正未命中的题目做模糊匹配（候选召回后统一提交执行器打分），再做语义匹配
+        pending = [i for i in range(len(questions)) if results[i] is None and i not in matched]
+        candidates: dict[int, list[Question]] = {}
+        for i in pending:
+            try:
+                candidates[i] = await SearchService._fuzzy_candidates(
+                    questions[i].get("questionContent", ""),
+                    questions[i].get("type", "0"),
+                    platform,
+                    session
+                )
+            except Exception as e:
+                logger.error(f"模糊匹配候选召回失败: {e}")
+        
+        scored = [i for i in pending if candidates.get(i)]
+        try:
+            best_matches = await fuzzy_match_many([
+                (questions[i].get("questionContent", ""), [q.content for q in candidates[i]])
+                for i in scored
+            ])
         except Exception as e:
-            logger.error(f"搜索失败: {e}")
+            logger.error(f"模糊匹配失败: {e}")
+            best_matches = [None] * len(scored)
+        
+        for i, best_match in zip(scored, best_matches):
+            match = SearchService._pick_fuzzy(candidates[i], best_match)
+            if match:
+                matched[i] = (("hash", platform, hashes[i]), *match, "fuzzy")
+        
+        for i in pending:
+            if i in matched:
+                continue
+            try:
+                match = await SearchService._semantic_search(
+                    questions[i].get("questionContent", ""),
+                    questions[i].get("type", "0"),
+                    platform,
+                    session
+                )
+            except Exception as e:
+                logger.error(f"语义匹配失败: {e}")
+                match = None
+            if match:
+                matched[i] = (("hash", platform, hashes[i]), *match, "semantic")
+        
+        # 4. 回写缓存
+        indexes = list(matched)
+        built = await SearchService._cache_set_many([matched[i][:3] for i in indexes], sequence)
+        for i, result in zip(indexes, built):
+            match_type = matched[i][3]
+            results[i] = {**result, "matchType": match_type}
+            tiers[match_type] += 1
+        
+        logger.info(f"批量搜索完成: {tiers}")
+        return results, tiers
+    
+    @staticmethod
+    def _build_result(question: Question, score: float = 1.0) -> dict:
+        """
+        构造搜索结果（score为模糊匹配相似度，用于折算置信度）
+        
+        选择题附带答案对应的选项文本（optionTexts），选项顺序不同时可映射回正确字母
+        """
+        result = {
+            "answer": question.answer,
+            "answerText": question.answer_text,
+            "confidence": question.confidence * score,
+            "source": question.source,
+            "questionId": question.question_id
+        }
+        if question.type in ("0", "1"):
+            result["optionTexts"] = answer_option_texts(question.answer, question.options)
+        return result
+    
+    @staticmethod
+    def publish_answer(question: Question):
+        """将题目当前最佳答案写入共享精确答案表（所有worker立即可见）"""
+        if answer_table is not None:
+            answer_table.put(question.platform, question.normalized_hash, SearchService._build_result(question))
+    
+    @staticmethod
+    async def build_answer_table(session: AsyncSession, chunk_size: int = 1000) -> int:
+        """从数据库构建共享精确答案表，返回写入的题目数"""
+        if answer_table is None:
+            return 0
+        
+        last_id = 0
+        total = 0
+        while True:
+            stmt = select(
+                Question.id, Question.question_id, Question.platform, Question.normalized_hash,
+                Question.answer, Question.answer_text, Question.source, Question.confidence,
+                Question.type, Question.options
+            ).where(Question.id > last_id).order_by(Question.id).limit(chunk_size)
+            rows = (await session.execute(stmt)).all()
+            if not rows:
+                break
+            for row in rows:
+                # Row与Question字段同名，直接复用结果构造
+                if answer_table.put(row.platform, row.normalized_hash, SearchService._build_result(row)):
+                    total += 1
+            last_id = rows[-1].id
+        
+        answer_table.mark_built()
+        logger.info(f"共享答案表构建完成: {total}题, 容量{answer_table.capacity}")
+        return total
+    
+    @staticmethod
+    def _might_exist(platform: str, value: str) -> bool:
+        """布隆过滤器判定（未启用时视为可能存在）"""
+        return question_filter is None or question_filter.might_contain(platform, value)
+    
+    @staticmethod
+    async def rebuild_question_filter(session: AsyncSession, chunk_size: int = 1000) -> int:
+        """从数据库重建布隆过滤器（写入非活动缓冲区后切换），返回题目数"""
+        if question_filter is None:
+            return 0
+        
+        buffer = question_filter.begin_rebuild()
+        if buffer is None:
+            return 0
+        last_id = 0
+        total = 0
+        while True:
+            stmt = select(
+                Question.id, Question.platform, Question.question_id, Question.normalized_hash
+            ).where(Question.id > last_id).order_by(Question.id).limit(chunk_size)
+            rows = (await session.execute(stmt)).all()
+            if not rows:
+                break
+            items = []
+            for row in rows:
+                items.append((row.platform, row.question_id))
+                items.append((row.platform, row.normalized_hash))
+            question_filter.add_to_buffer(buffer, items)
+            last_id = rows[-1].id
+            total += len(rows)
+        
+        question_filter.finish_rebuild(buffer)
+        logger.info(f"布隆过滤器重建完成: {total}题")
+        return total
+    
+    @staticmethod
+    async def refresh_question_filter_loop(check_interval: int = 60):
+        """后台任务：到达重建间隔时由其中一个worker重建布隆过滤器"""
+        while True:
+            await asyncio.sleep(check_interval)
+            if not question_filter.try_claim_rebuild(settings.bloom_rebuild_interval):
+                continue
+            try:
+                async with async_session_maker() as session:
+                    await SearchService.rebuild_question_filter(session)
+            except Exception as e:
+                logger.error(f"布隆过滤器重建失败: {e}")
+    
+    @staticmethod
+    async def _cache_get_many(keys: list[tuple]) -> tuple[list[dict | None], int | None]:
+        """
+        依次查询进程内缓存和Redis共享缓存，Redis命中时回填进程内缓存
+        
+        Returns:
+            (与keys一一对应的结果, Redis版本序列值)，序列值需传给_cache_set_many
+        """
+        results = [search_cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        sequence = None
+        if missing and shared_cache.enabled:
+            remote, sequence = await shared_cache.get_search_many(
+                [shared_cache.search_key(*keys[i]) for i in missing]
+            )
+            for i, item in zip(missing, remote):
+                if item:
+                    result, question_pk = item
+                    search_cache.set(keys[i], result, tag=question_pk)
+                    results[i] = result
+        return results, sequence
+    
+    @staticmethod
+    async def _cache_set_many(
+        items: list[tuple[tuple, Question, float]],
+        sequence: int | None
+    ) -> list[dict]:
+        """
+        构造搜索结果并写入进程内缓存和Redis共享缓存
+        
+        以题目主键为标签/版本，便于答案变更时失效。
+        
+        Args:
+            items: [(缓存键, 题目, 相似度), ...]
+            sequence: 查库前_cache_get_many返回的Redis版本序列值
+        
+        Returns:
+            与items一一对应的搜索结果
+        """
+        results = []
+        shared_items = []
+        for key, question, score in items:
+            result = SearchService._build_result(question, score)
+            search_cache.set(key, result, tag=question.id)
+            shared_items.append((shared_cache.search_key(*key), result, question.id))
+            results.append(result)
+        
+        if shared_items and shared_cache.enabled:
+            await shared_cache.set_search_many(shared_items, sequence)
+        return results
+    
+    @staticmethod
+    async def _fuzzy_search(
+        content: str,
+        question_type: str,
+        platform: str,
+        session: AsyncSession
+    ) -> tuple[Question, float] | None:
+        """模糊匹配（n-gram倒排索引召回候选，再逐个精确打分），返回(题目, 相似度)"""
+        candidates = await SearchService._fuzzy_candidates(
+            content, question_type, platform, session
+        )
+        
+        if not candidates:
+            return None
+        
+        # 文本相似度打分（候选较多时在执行器中进行，不阻塞事件循环）
+        best_match = await fuzzy_match_async(content, [q.content for q in candidates])
+        return SearchService._pick_fuzzy(candidates, best_match)
+    
+    @staticmethod
+    def _pick_fuzzy(candidates: list[Question], best_match: dict | None) -> tuple[Question, float] | None:
+        """由打分结果取出匹配题目"""
+        if best_match and best_match["score"] > 0.85:
+            matched_q = candidates[best_match["index"]]
+            logger.info(f"模糊匹配: {matched_q.question_id}, 相似度: {best_match['score']}")
+            return matched_q, best_match["score"]
+        return None
+    
+    @staticmethod
+    async def _semantic_search(
+        content: str,
+        question_type: str,
+        platform: str,
+        session: AsyncSession
+    ) -> tuple[Question, float] | None:
+        """
+        TF-IDF语义匹配，返回(题目, 折算系数)
+        
+        折算系数 = 余弦相似度 * semantic_confidence_discount，用于降低该层结果的置信度。
+        """
+        if not settings.semantic_search_enabled:
+            return None
+        
+        async def load_platform(after_id: int | None):
+            stmt = select(Question.id, Question.content, Question.type).where(
+                Question.platform == platform
+            )
+            if after_id is not None:
+                # 补齐其他worker新增的题目
+                result = await session.execute(stmt.where(Question.id > after_id))
+                return result.all()
+            result = await session.execute(stmt)
+            rows = result.all()
+            logger.info(f"加载TF-IDF索引: platform={platform}, {len(rows)}题")
+            return rows
+        
+        index = await semantic_index.ensure_loaded((platform,), load_platform, watermark=0)
+        hits = await run_index_query(index.query, content, 1, question_type)
+        if not hits or hits[0][1] < settings.semantic_threshold:
+            return None
+        
+        doc_id, similarity = hits[0]
+        questions = await SearchService._load_questions(session, [doc_id])
+        if not questions:
             return None
+        
+        logger.info(f"语义匹配: {questions[0].question_id}, 余弦相似度: {similarity:.3f}")
+        return questions[0], similarity * settings.semantic_confidence_discount
+    
+    @staticmethod
+    async def _fuzzy_candidates(
+        content: str,
+        question_type: str,
+        platform: str,
+        session: AsyncSession
+    ) -> list[Question]:
+        """召回模糊匹配候选题目（按相关度降序）"""
+        if settings.search_backend == "fulltext":
+            ids = await FulltextService.search_candidates(
+                session, content, question_type, platform, settings.fuzzy_candidate_limit
+            )
+            return await SearchService._load_questions(session, ids)
+        
+        # 有快照时只需从数据库补齐快照水位之后的题目
+        snapshot = index_snapshot.partition((platform, question_type))
+        
+        async def load_partition(after_id: int | None):
+            stmt = select(Question.id, Question.content).where(
+                Question.type == question_type,
+                Question.platform == platform
+            )
+            if after_id is not None:
+                # 补齐其他worker新增的题目
+                result = await session.execute(stmt.where(Question.id > after_id))
+                return result.all()
+            if snapshot is not None:
+                stmt = stmt.where(SnapshotService.catch_up_filter(session))
+            result = await session.execute(stmt)
+            rows = result.all()
+            logger.info(
+                f"加载n-gram索引: platform={platform}, type={question_type}, "
+                f"{'快照' + str(len(snapshot)) + '题 + ' if snapshot is not None else ''}{len(rows)}题"
+            )
+            return rows
+        
+        index = await question_index.ensure_loaded(
+            (platform, question_type), load_partition, snapshot,
+            watermark=index_snapshot.watermark_id if snapshot is not None else 0
+        )
+        hits = await run_index_query(index.query, content, settings.fuzzy_candidate_limit)
+        if not hits:
+            return []
+        
+        return await SearchService._load_questions(session, [doc_id for doc_id, _ in hits])
+    
+    @staticmethod
+    async def _load_questions(session: AsyncSession, ids: list[int]) -> list[Question]:
+        """按主键批量加载题目，保持ids顺序"""
+        if not ids:
+            return []
+        stmt = select(Question).where(Question.id.in_(ids))
+        result = await session.execute(stmt)
+        by_id = {q.id: q for q in result.scalars().all()}
+        return [by_id[doc_id] for doc_id in ids if doc_id in by_id]
     
     @staticmethod
     async def save_question(
         question_data: dict,
         session: AsyncSession
     ) -> bool:
-        """保存题目到数据库（支持多答案存储）"""
+        """
+        保存题目到数据库（支持多答案存储）
+        
+        题目和答案均使用 INSERT ... ON CONFLICT，并发上传同一题目不会冲突；
+        写入答案、刷新最佳答案在同一事务中完成，只提交一次。
+        尚未执行 migrations/004（缺少唯一索引）时退回先查询再写入。
+        """
         try:
             # 计算hash
             content = question_data.get("questionContent", "")
+            platform = question_data.get("platform", "czbk")
             content_hash = hashlib.md5(content.encode()).hexdigest()
-            
-            # 检查是否已存在
-            stmt = select(Question).where(Question.content_hash == content_hash)
-            result = await session.execute(stmt)
-            existing = result.scalar_one_or_none()
+            content_normalized_hash = normalized_hash(content)
             
             answer_text = question_data.get("answer")
             answer_desc = question_data.get("answerText")
             source = question_data.get("source", "ai")
             confidence = question_data.get("confidence", 0.8)
             
-            if existing:
-                # 题目已存在，添加新答案到answers表
+            values = {
+                "question_id": question_data.get("questionId"),
+                "content": content,
+                "content_hash": content_hash,
+                "normalized_hash": content_normalized_hash,
+                "type": question_data.get("type"),
+                "answer": answer_text,  # 保留用于向后兼容
+                "answer_text": answer_desc,
+                "options": question_data.get("options"),
+                "platform": platform,
+                "source": source,
+                "confidence": confidence,
+                "verified": question_data.get("verified", False)
+            }
+            
+            upsert = await _unique_indexes_ready(session)
+            existing_stmt = select(Question.id, Question.question_id).where(
+                Question.normalized_hash == content_normalized_hash,
+                Question.platform == platform
+            ).order_by(Question.id).limit(1)
+            
+            # 1. 插入题目，同平台规范化题干已存在时不插入
+            if upsert:
+                stmt = _insert(session, Question).values(**values).on_conflict_do_nothing(
+                    index_elements=[Question.normalized_hash, Question.platform]
+                ).returning(Question.id)
+                question_pk = (await session.execute(stmt)).scalar_one_or_none()
+            elif (await session.execute(existing_stmt)).first() is None:
+                stmt = _insert(session, Question).values(**values).returning(Question.id)
+                question_pk = (await session.execute(stmt)).scalar_one()
+            else:
+                question_pk = None
+            
+            if question_pk is None:
+                # 题目已存在，写入答案后在同一事务中刷新最佳答案
+                existing = (await session.execute(existing_stmt)).one()
                 logger.info(f"题目已存在: {existing.question_id}，添加新答案")
                 
-                # 检查是否已有相同来源的答案
-                stmt = select(Answer).where(
-                    Answer.question_id == existing.id,
-                    Answer.answer == answer_text,
-                    Answer.source == source
-                )
-                result = await session.execute(stmt)
-                existing_answer = result.scalar_one_or_none()
-                
-                if existing_answer:
-                    # 答案已存在，更新置信度
-                    if confidence > existing_answer.confidence:
-                        existing_answer.confidence = confidence
-                        await session.commit()
-                        logger.info(f"更新答案置信度: {existing.question_id}")
+                # 新答案插入；相同来源的相同答案仅在置信度更高时更新
+                row = {
+                    "question_id": existing.id,
+                    "answer": answer_text,
+                    "answer_text": answer_desc,
+                    "source": source,
+                    "contributor": source,
+                    "confidence": confidence
+                }
+                if upsert:
+                    stmt = _insert(session, Answer).values(**row)
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=_answer_conflict_target(session),
+                        set_={"confidence": stmt.excluded.confidence},
+                        where=Answer.confidence < stmt.excluded.confidence
+                    ).returning(Answer.id)
+                    changed = (await session.execute(stmt)).scalar_one_or_none()
                 else:
-                    # 添加新答案
-                    new_answer = Answer(
-                        question_id=existing.id,
-                        answer=answer_text,
-                        answer_text=answer_desc,
-                        source=source,
-                        contributor=source,
-                        confidence=confidence
-                    )
-                    session.add(new_answer)
+                    changed_rows = await SearchService._save_answers_fallback(session, [row])
+                    changed = next(iter(changed_rows.values()), None)
+                
+                if changed is None:
                     await session.commit()
-                    logger.info(f"添加新答案: {existing.question_id} from {source}")
-                    
-                    # 自动评估最佳答案
-                    await SearchService._evaluate_best_answer(session, existing.id)
+                    return True
                 
+                # 只与当前最佳答案比较（置信度只升不降）
+                answer = await session.get(Answer, changed, populate_existing=True)
+                await SearchService.update_best_answer(session, answer)
+                logger.info(f"添加/更新答案: {existing.question_id} from {source}")
                 return True
             
-            # 创建新题目
-            question = Question(
-                question_id=question_data.get("questionId"),
-                content=content,
-                content_hash=content_hash,
-                type=question_data.get("type"),
-                answer=answer_text,  # 保留用于向后兼容
-                answer_text=answer_desc,
-                options=question_data.get("options"),
-                platform=question_data.get("platform", "czbk"),
-                source=source,
-                confidence=confidence,
-                verified=question_data.get("verified", False)
-            )
-            
-            session.add(question)
-            await session.flush()  # 获取question.id
-            
-            # 同时添加到answers表
-            answer = Answer(
-                question_id=question.id,
+            # 2. 新题目：第一个答案默认为最佳答案
+            question = Question(id=question_pk, **values)
+            await session.execute(_insert(session, Answer).values(
+                question_id=question_pk,
                 answer=answer_text,
                 answer_text=answer_desc,
                 source=source,
                 contributor=source,
                 confidence=confidence,
-                is_accepted=True  # 第一个答案默认为最佳答案
-            )
-            session.add(answer)
+                is_accepted=True
+            ))
+            
+            if settings.search_backend == "fulltext":
+                await FulltextService.index_question(session, question)
             
             await session.commit()
+            await SearchService._on_questions_created([question])
             logger.info(f"保存新题目和答案: {question.question_id}")
             return True
             
@@ -190,47 +642,390 @@ class SearchService:
             return False
     
     @staticmethod
-    async def _evaluate_best_answer(session: AsyncSession, question_id: int):
-        """评估并更新最佳答案"""
+    async def batch_save_questions(
+        items: list[dict],
+        session: AsyncSession
+    ) -> list[dict]:
+        """
+        批量保存题目（集合化写入，一个事务）
+        
+        一次遍历计算hash，按平台用IN查询取出已有题目，题目和答案分别用一条
+        多行 INSERT ... ON CONFLICT 写入，受影响题目的最佳答案统一刷新后提交一次。
+        尚未执行 migrations/004（缺少唯一索引）时改为按查询结果插入或更新。
+        
+        Args:
+            items: [save_question的question_data, ...]（questionId需已生成）
+            session: 数据库会话
+        
+        Returns:
+            与items一一对应的 {"questionId", "status"}，status为
+            created（新题目）/updated（新增或更新了答案）/unchanged（答案已存在）/failed
+        """
+        statuses: list[dict] = [{"questionId": None, "status": "failed"} for _ in items]
+        chunk_size = settings.batch_search_chunk_size
+        
+        # 1. 一次遍历计算hash，批次内同一题目只插入第一条
+        rows = {}  # (platform, normalized_hash) -> 题目行
+        keys: list[tuple | None] = []
+        for item in items:
+            content = item.get("questionContent", "")
+            if not content or item.get("answer") is None:
+                keys.append(None)
+                continue
+            platform = item.get("platform", "czbk")
+            key = (platform, normalized_hash(content))
+            keys.append(key)
+            if key not in rows:
+                rows[key] = {
+                    "question_id": item.get("questionId"),
+                    "content": content,
+                    "content_hash": hashlib.md5(content.encode()).hexdigest(),
+                    "normalized_hash": key[1],
+                    "type": item.get("type"),
+                    "answer": item.get("answer"),
+                    "answer_text": item.get("answerText"),
+                    "options": item.get("options"),
+                    "platform": platform,
+                    "source": item.get("source", "ai"),
+                    "confidence": item.get("confidence", 0.8),
+                    "verified": item.get("verified", False)
+                }
+        
         try:
-            # 获取所有答案
-            stmt = select(Answer).where(Answer.question_id == question_id)
-            result = await session.execute(stmt)
-            answers = result.scalars().all()
+            # 2. 已有题目：每个平台一次IN查询（超大批次分段）
+            existing: dict[tuple, tuple[int, str]] = {}
             
-            if not answers:
-                return
+            async def load_existing(pending_keys):
+                by_platform: dict[str, list[str]] = {}
+                for platform, nhash in pending_keys:
+                    by_platform.setdefault(platform, []).append(nhash)
+                for platform, hashes in by_platform.items():
+                    for chunk in _chunks(hashes, chunk_size):
+                        stmt = select(Question.id, Question.question_id, Question.normalized_hash).where(
+                            Question.normalized_hash.in_(chunk),
+                            Question.platform == platform
+                        )
+                        for row in (await session.execute(stmt)).all():
+                            existing[(platform, row.normalized_hash)] = (row.id, row.question_id)
             
-            # 先清除所有is_accepted标记
-            for ans in answers:
-                ans.is_accepted = False
-            
-            # 按优先级选择最佳答案
-            def answer_priority(ans: Answer) -> tuple:
-                return (
-                    ans.verified,
-                    ans.source == "platform_verified",
-                    ans.vote_count,
-                    ans.confidence
-                )
+            await load_existing(list(rows))
+            upsert = await _unique_indexes_ready(session)
             
-            best_answer = max(answers, key=answer_priority)
-            best_answer.is_accepted = True
+            # 3. 新题目：多行INSERT，并发上传造成的冲突跳过后再查一次
+            created: dict[tuple, Question] = {}
+            new_rows = [row for key, row in rows.items() if key not in existing]
+            if new_rows:
+                stmt = _insert(session, Question)
+                if upsert:
+                    stmt = stmt.on_conflict_do_nothing(
+                        index_elements=[Question.normalized_hash, Question.platform]
+                    )
+                stmt = stmt.returning(Question.id, Question.platform, Question.normalized_hash)
+                for row in (await session.execute(stmt, new_rows)).all():
+                    key = (row.platform, row.normalized_hash)
+                    created[key] = Question(id=row.id, **rows[key])
+                    existing[key] = (row.id, rows[key]["question_id"])
+                conflicted = [(r["platform"], r["normalized_hash"]) for r in new_rows]
+                await load_existing([key for key in conflicted if key not in existing])
             
-            # 更新Question表（向后兼容）
-            stmt = select(Question).where(Question.id == question_id)
-            result = await session.execute(stmt)
-            question = result.scalar_one_or_none()
+            # 4. 答案：多行 INSERT ... ON CONFLICT，相同答案只在置信度更高时更新
+            answer_rows = {}
+            accepted = set()
+            for item, key in zip(items, keys):
+                if key is None or key not in existing:
+                    continue
+                question_pk = existing[key][0]
+                source = item.get("source", "ai")
+                answer_key = (question_pk, source, item["answer"])
+                row = {
+                    "question_id": question_pk,
+                    "answer": item["answer"],
+                    "answer_text": item.get("answerText"),
+                    "source": source,
+                    "contributor": source,
+                    "confidence": item.get("confidence", 0.8),
+                    # 新题目的第一个答案默认为最佳答案
+                    "is_accepted": key in created and question_pk not in accepted
+                }
+                if key in created:
+                    accepted.add(question_pk)
+                # 同一语句内不能两次更新同一行，批次内重复答案取最高置信度
+                if answer_key not in answer_rows or row["confidence"] > answer_rows[answer_key]["confidence"]:
+                    if answer_key in answer_rows:
+                        row["is_accepted"] = answer_rows[answer_key]["is_accepted"]
+                    answer_rows[answer_key] = row
             
-            if question:
-                question.answer = best_answer.answer
-                question.answer_text = best_answer.answer_text
-                question.source = best_answer.source
-                question.confidence = best_answer.confidence
+            changed: set[tuple] = set()
+            if answer_rows and not upsert:
+                changed.update(await SearchService._save_answers_fallback(session, list(answer_rows.values())))
+            elif answer_rows:
+                stmt = _insert(session, Answer)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=_answer_conflict_target(session),
+                    set_={"confidence": stmt.excluded.confidence},
+                    where=Answer.confidence < stmt.excluded.confidence
+                ).returning(Answer.question_id, Answer.source, Answer.answer)
+                for row in (await session.execute(stmt, list(answer_rows.values()))).all():
+                    changed.add((row.question_id, row.source, row.answer))
             
-            await session.commit()
-            logger.info(f"更新最佳答案: Question {question_id}")
+            # 5. 答案有变化的题目统一刷新最佳答案（只有一个答案的新题目无需刷新）
+            answer_counts: dict[int, int] = {}
+            for question_pk, _, _ in changed:
+                answer_counts[question_pk] = answer_counts.get(question_pk, 0) + 1
+            created_ids = {q.id for q in created.values()}
+            refresh_ids = [
+                question_pk for question_pk, count in answer_counts.items()
+                if question_pk not in created_ids or count > 1
+            ]
+            refreshed = await SearchService._refresh_best_answers(session, refresh_ids)
+            
+            if created and settings.search_backend == "fulltext":
+                await FulltextService.index_questions(session, list(created.values()))
             
+            await session.commit()
+        
         except Exception as e:
-            logger.error(f"评估最佳答案失败: {e}")
+            logger.error(f"批量保存题目失败: {e}")
             await session.rollback()
+            return statuses
+        
+        await SearchService._on_questions_created(list(created.values()))
+        for question in refreshed:
+            await invalidate_question(question.id)
+            SearchService.publish_answer(question)
+        
+        reported = set()
+        for i, (item, key) in enumerate(zip(items, keys)):
+            if key is None or key not in existing:
+                continue
+            question_pk, question_id = existing[key]
+            answer_key = (question_pk, item.get("source", "ai"), item["answer"])
+            # 批次内重复的题目/答案只在第一次出现时计为created/updated
+            if key in created and key not in reported:
+                status = "created"
+            elif answer_key in changed and answer_key not in reported:
+                status = "updated"
+            else:
+                status = "unchanged"
+            reported.update((key, answer_key))
+            statuses[i] = {"questionId": question_id, "status": status}
+        
+        logger.info(f"批量保存完成: {len(items)}条, 新题目{len(created)}, 刷新最佳答案{len(refreshed)}")
+        return statuses
+    
+    @staticmethod
+    async def _save_answers_fallback(session: AsyncSession, rows: list[dict]) -> dict[tuple, int]:
+        """
+        缺少答案唯一索引时的答案写入（不提交）：先查询已有答案，
+        不存在则插入，已存在且置信度更高时更新
+        
+        Returns:
+            有变化的答案 {(question_id, source, answer): 答案id}
+        """
+        found: dict[tuple, Answer] = {}
+        question_ids = list({row["question_id"] for row in rows})
+        for chunk in _chunks(question_ids, settings.batch_search_chunk_size):
+            stmt = select(Answer).where(Answer.question_id.in_(chunk)).order_by(Answer.id)
+            for ans in (await session.execute(stmt)).scalars().all():
+                found.setdefault((ans.question_id, ans.source, ans.answer), ans)
+        
+        changed: dict[tuple, int] = {}
+        new_rows = []
+        for row in rows:
+            key = (row["question_id"], row["source"], row["answer"])
+            ans = found.get(key)
+            if ans is None:
+                new_rows.append(row)
+            elif (ans.confidence or 0.0) < row["confidence"]:
+                ans.confidence = row["confidence"]
+                changed[key] = ans.id
+        await session.flush()
+        
+        if new_rows:
+            stmt = _insert(session, Answer).returning(Answer.id, Answer.question_id, Answer.source, Answer.answer)
+            for row in (await session.execute(stmt, new_rows)).all():
+                changed[(row.question_id, row.source, row.answer)] = row.id
+        return changed
+    
+    @staticmethod
+    async def save_question_deferred(question_data: dict, session: AsyncSession) -> bool:
+        """
+        异步保存题目：加入写入队列，队列未启动或已满时同步保存
+        
+        Returns:
+            是否已入队或保存成功
+        """
+        if write_buffer is not None and write_buffer.submit(question_data):
+            return True
+        return await SearchService.save_question(question_data, session)
+    
+    @staticmethod
+    async def flush_saves(items: list[dict]) -> list[dict]:
+        """写入队列的落库函数，使用独立会话批量保存"""
+        async with async_session_maker() as session:
+            return await SearchService.batch_save_questions(items, session)
+    
+    @staticmethod
+    async def flush_save(item: dict) -> bool:
+        """写入队列的单条落库函数（批量落库失败时逐条重试）"""
+        async with async_session_maker() as session:
+            return await SearchService.save_question(item, session)
+    
+    @staticmethod
+    async def _on_questions_created(questions: list[Question]):
+        """新题目提交后更新共享答案表、布隆过滤器、内存索引并清除旧缓存"""
+        for question in questions:
+            SearchService.publish_answer(question)
+            if question_filter is not None:
+                question_filter.add(question.platform, question.question_id)
+                question_filter.add(question.platform, question.normalized_hash)
+            question_index.add((question.platform, question.type), question.id, question.content)
+            semantic_index.add((question.platform,), question.id, question.content, question.type)
+            # 同hash此前可能缓存了模糊匹配结果
+            search_cache.delete(("hash", question.platform, question.normalized_hash))
+            await shared_cache.delete(shared_cache.search_key("hash", question.platform, question.normalized_hash))
+    
+    @staticmethod
+    async def _update_best_answer(
+        session: AsyncSession,
+        answer: Answer,
+        demoted: bool = False
+    ) -> Question | None:
+        """
+        增量维护最佳答案（不提交，由调用方提交）
+        
+        只将变化的答案与当前最佳答案比较，最多修改两行答案和一行题目；
+        当前最佳答案排序下降（demoted）或题目尚无最佳答案时，
+        额外按优先级查询排名第一的其他答案。
+        
+        Args:
+            session: 数据库会话
+            answer: 新增或排序字段变化的答案（已flush）
+            demoted: 答案的排序字段是否可能下降（如反对票）
+        
+        Returns:
+            最佳答案或其排序字段有变化时返回题目，否则None
+        """
+        stmt = AnswerService.accepted_answers_stmt(answer.question_id)
+        accepted = (await session.execute(stmt)).scalars().all()
+        if len(accepted) > 1:
+            # 历史数据存在多个最佳答案标记，全量重选
+            return await SearchService.refresh_best_answer(session, answer.question_id)
+        
+        current = accepted[0] if accepted else None
+        stmt = AnswerService.top_answer_stmt(answer, current, demoted)
+        top = (await session.execute(stmt)).scalar_one_or_none() if stmt is not None else None
+        
+        best = AnswerService.choose_best_answer(answer, current, top)
+        if best is None:
+            return None
+        question = await session.get(Question, answer.question_id)
+        AnswerService.accept_answer(question, best, current)
+        return question
+    
+    @staticmethod
+    async def update_best_answer(
+        session: AsyncSession,
+        answer: Answer,
+        demoted: bool = False
+    ) -> Question | None:
+        """增量维护最佳答案并提交，同步失效缓存、更新共享答案表"""
+        question = await SearchService._update_best_answer(session, answer, demoted)
+        await session.commit()
+        if question:
+            await invalidate_question(question.id)
+            SearchService.publish_answer(question)
+            logger.info(f"更新最佳答案: Question {question.id}")
+        return question
+    
+    @staticmethod
+    async def refresh_best_answer(session: AsyncSession, question_id: int) -> Question | None:
+        """重新选出最佳答案并同步到Question表（不提交，由调用方提交）"""
+        questions = await SearchService._refresh_best_answers(session, [question_id])
+        return questions[0] if questions else None
+    
+    @staticmethod
+    async def _refresh_best_answers(session: AsyncSession, question_ids: list[int]) -> list[Question]:
+        """
+        批量重新选出最佳答案并同步到Question表（不提交，由调用方提交）
+        
+        Returns:
+            已更新的题目
+        """
+        if not question_ids:
+            return []
+        
+        # 获取所有答案
+        answers_by_question: dict[int, list[Answer]] = {}
+        questions = []
+        for chunk in _chunks(question_ids, settings.batch_search_chunk_size):
+            stmt = select(Answer).where(Answer.question_id.in_(chunk)).order_by(Answer.id)
+            for ans in (await session.execute(stmt)).scalars().all():
+                answers_by_question.setdefault(ans.question_id, []).append(ans)
+            stmt = select(Question).where(Question.id.in_(chunk))
+            questions.extend((await session.execute(stmt)).scalars().all())
+        
+        updated = []
+        for question in questions:
+            answers = answers_by_question.get(question.id)
+            if not answers:
+                continue
+            
+            # 按优先级选择最佳答案，只修改标记有变化的行
+            best_answer = max(answers, key=AnswerService.answer_priority)
+            for ans in answers:
+                if ans.is_accepted and ans is not best_answer:
+                    ans.is_accepted = False
+            AnswerService.accept_answer(question, best_answer)
+            updated.append(question)
+        
+        return updated
+
+
+# 唯一索引检查结果: (是否存在, 检查时间)；缺失时每60秒重新检查，执行迁移后无需重启
+_UNIQUE_INDEX_RECHECK = 60
+_unique_index_state: tuple[bool, float] | None = None
+
+
+async def _unique_indexes_ready(session: AsyncSession) -> bool:
+    """INSERT ... ON CONFLICT依赖的唯一索引（migrations/004）是否已创建"""
+    global _unique_index_state
+    now = time.monotonic()
+    if _unique_index_state is not None and (
+        _unique_index_state[0] or now - _unique_index_state[1] < _UNIQUE_INDEX_RECHECK
+    ):
+        return _unique_index_state[0]
+    
+    if session.bind.dialect.name == "postgresql":
+        names = ["ux_questions_hash_platform", "ux_answers_dedupe_md5"]
+        stmt = text("SELECT indexname FROM pg_indexes WHERE indexname = ANY(:names)").bindparams(names=names)
+    else:
+        names = ["ux_questions_hash_platform", "ux_answers_dedupe"]
+        stmt = text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND name IN (:q, :a)"
+        ).bindparams(q=names[0], a=names[1])
+    ready = set((await session.execute(stmt)).scalars().all()) >= set(names)
+    if not ready and (_unique_index_state is None or _unique_index_state[0]):
+        logger.warning("缺少唯一索引（未执行migrations/004），保存题目改为先查询再写入")
+    _unique_index_state = (ready, now)
+    return ready
+
+
+def _insert(session: AsyncSession, model):
+    """按数据库方言创建支持ON CONFLICT的INSERT语句"""
+    if session.bind.dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
+def _answer_conflict_target(session: AsyncSession) -> list:
+    """答案去重唯一索引的列（PostgreSQL按md5(answer)建索引）"""
+    if session.bind.dialect.name == "postgresql":
+        return [Answer.question_id, Answer.source, func.md5(Answer.answer)]
+    return [Answer.question_id, Answer.source, Answer.answer]
+
+
+def _chunks(items: list, size: int):
+    """按固定大小切分列表"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
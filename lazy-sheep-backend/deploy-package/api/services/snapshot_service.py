@@ -0,0 +1,65 @@
+"""
+索引快照服务 - 从数据库构建n-gram索引快照，按水位补齐快照之后的变更
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import select, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from api.models import Question
+from api.utils.index_snapshot import index_snapshot, write_snapshot
+from api.utils.ngram_index import extract_ngrams
+from loguru import logger
+
+
+class SnapshotService:
+    """索引快照服务"""
+
+    @staticmethod
+    async def build(session: AsyncSession, path: str, chunk_size: int = 1000) -> dict:
+        """
+        扫描全部题目构建快照文件
+
+        Returns:
+            {"questions": 题目数, "partitions": 分区数, "watermarkId": 水位主键}
+        """
+        partitions: dict[tuple, list[tuple[int, frozenset[str]]]] = {}
+        last_id = 0
+        watermark_time = 0.0
+        total = 0
+        while True:
+            stmt = select(
+                Question.id, Question.platform, Question.type, Question.content, Question.updated_at
+            ).where(Question.id > last_id).order_by(Question.id).limit(chunk_size)
+            rows = (await session.execute(stmt)).all()
+            if not rows:
+                break
+            for row in rows:
+                partitions.setdefault((row.platform, row.type), []).append(
+                    (row.id, frozenset(extract_ngrams(row.content or "")))
+                )
+                if row.updated_at:
+                    watermark_time = max(watermark_time, SnapshotService._timestamp(row.updated_at))
+            last_id = rows[-1].id
+            total += len(rows)
+
+        write_snapshot(path, partitions, last_id, watermark_time)
+        logger.info(f"索引快照已生成: {path}, {total}题, 水位id={last_id}")
+        return {"questions": total, "partitions": len(partitions), "watermarkId": last_id}
+
+    @staticmethod
+    def catch_up_filter(session: AsyncSession):
+        """快照之后新增或更新的题目（主键或updated_at超过水位）"""
+        watermark_time = datetime.fromtimestamp(index_snapshot.watermark_time, timezone.utc)
+        if session.bind.dialect.name == "sqlite":
+            # SQLite中以不带时区的UTC时间存储
+            watermark_time = watermark_time.replace(tzinfo=None)
+        return or_(
+            Question.id > index_snapshot.watermark_id,
+            Question.updated_at > watermark_time
+        )
+
+    @staticmethod
+    def _timestamp(value: datetime) -> float:
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
@@ -0,0 +1,82 @@
+"""
+投票服务 - 原子累加投票数，只在排序可能变化时重新评估最佳答案
+"""
+from sqlalchemy import select, update, case
+from sqlalchemy.ext.asyncio import AsyncSession
+from api.config import get_settings
+from api.database import async_session_maker
+from api.models import Answer
+from api.services.search_service import SearchService
+from api.utils.cache import invalidate_question
+from loguru import logger
+
+settings = get_settings()
+
+
+class VoteService:
+    """投票服务"""
+    
+    @staticmethod
+    async def apply_votes(session: AsyncSession, deltas: dict[int, int]) -> dict[int, dict]:
+        """
+        批量应用投票增量并提交
+        
+        使用 UPDATE ... SET vote_count = vote_count + CASE id ... END 原子累加，
+        并发投票不会丢失更新。只有以下情况才会重新评估最佳答案：
+        非最佳答案得到赞同票（可能超过当前最佳答案），或最佳答案得到反对票（可能被超过）。
+        
+        Args:
+            session: 数据库会话
+            deltas: {answer_id: 投票增量}
+            
+        Returns:
+            {answer_id: 更新后的答案字典}，不存在的答案不在结果中
+        """
+        deltas = {answer_id: delta for answer_id, delta in deltas.items() if delta}
+        if not deltas:
+            return {}
+        
+        updated: dict[int, dict] = {}
+        rerank: list[tuple[int, int]] = []
+        ids = list(deltas)
+        for start in range(0, len(ids), settings.batch_search_chunk_size):
+            chunk = ids[start:start + settings.batch_search_chunk_size]
+            stmt = update(Answer).where(Answer.id.in_(chunk)).values(
+                vote_count=Answer.vote_count + case(
+                    {answer_id: deltas[answer_id] for answer_id in chunk},
+                    value=Answer.id
+                )
+            ).returning(Answer.id, Answer.is_accepted)
+            rows = (await session.execute(
+                stmt, execution_options={"synchronize_session": False}
+            )).all()
+            for row in rows:
+                updated[row.id] = None
+                # 排序只在这两种情况下可能变化
+                if (deltas[row.id] > 0) != bool(row.is_accepted):
+                    rerank.append((row.id, deltas[row.id]))
+        
+        questions = {}
+        for answer_id, delta in rerank:
+            answer = await session.get(Answer, answer_id, populate_existing=True)
+            question = await SearchService._update_best_answer(session, answer, demoted=delta < 0)
+            if question:
+                questions[question.id] = question
+        
+        await session.commit()
+        for question in questions.values():
+            await invalidate_question(question.id)
+            SearchService.publish_answer(question)
+        
+        stmt = select(Answer).where(Answer.id.in_(list(updated)))
+        for answer in (await session.execute(stmt)).scalars().all():
+            updated[answer.id] = answer.to_dict()
+        
+        logger.info(f"投票落库: {len(updated)}个答案, 重新评估{len(rerank)}个, 最佳答案变化{len(questions)}题")
+        return updated
+    
+    @staticmethod
+    async def flush_votes(deltas: dict[int, int]) -> dict[int, dict]:
+        """投票缓冲的落库函数，使用独立会话"""
+        async with async_session_maker() as session:
+            return await VoteService.apply_votes(session, deltas)
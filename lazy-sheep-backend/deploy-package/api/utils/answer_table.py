@@ -0,0 +1,179 @@
+"""
+共享精确答案表 - 规范化hash -> 最佳答案，所有gunicorn worker共享同一块内存
+
+表在导入时分配为匿名共享mmap（MAP_SHARED），preload_app=True时由主进程分配并在
+when_ready钩子中从数据库构建，fork出的worker直接继承映射，不再各自复制。
+
+槽位布局（开放寻址，线性探测，只追加/覆盖不删除）:
+    seq u32 | key 16字节 | 负载长度 u16 | 负载JSON
+
+读无锁（seqlock：seq为奇数表示写入中，读前后seq不一致则重读），
+写入由跨进程锁串行化，先将seq加一（奇数），写完后再加一（偶数）。
+写锁带超时：持锁的worker异常退出后锁无法释放，等待超时即停用整张表
+（所有worker查询一律未命中，改走数据库），避免阻塞事件循环或返回过期答案。
+答案超出槽位大小时写入null占位，读到null视为未命中，由调用方查询数据库。
+"""
+import hashlib
+import json
+import mmap
+import multiprocessing
+import struct
+
+from loguru import logger
+
+from api.config import get_settings
+
+settings = get_settings()
+
+# 表头: magic | 槽位数 | 槽位大小 | 已用槽位 | 是否已构建
+_HEADER = struct.Struct("<4sIIIB")
+_HEADER_SIZE = 64
+_USED_OFFSET = 12
+_BUILT_OFFSET = 16
+_DISABLED_OFFSET = 17
+_SLOT = struct.Struct("<I16sH")
+MAGIC = b"LSAT"
+# 已用槽位超过该比例后不再插入新键（只允许覆盖），保证探测长度
+MAX_LOAD_FACTOR = 0.7
+_READ_RETRIES = 1000
+# 写锁最长等待时间（秒），正常持锁时间为微秒级
+_LOCK_TIMEOUT = 1.0
+
+
+class SharedAnswerTable:
+    """基于共享内存的开放寻址哈希表"""
+
+    def __init__(self, slots: int, slot_size: int):
+        capacity = 1
+        while capacity < slots:
+            capacity <<= 1
+        self.capacity = capacity
+        self.slot_size = slot_size
+        self._mm = mmap.mmap(-1, _HEADER_SIZE + capacity * slot_size)
+        self._lock = multiprocessing.Lock()
+        _HEADER.pack_into(self._mm, 0, MAGIC, capacity, slot_size, 0, 0)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def built(self) -> bool:
+        return bool(_HEADER.unpack_from(self._mm, 0)[4])
+
+    @property
+    def disabled(self) -> bool:
+        return bool(self._mm[_DISABLED_OFFSET])
+
+    def __len__(self) -> int:
+        return _HEADER.unpack_from(self._mm, 0)[3]
+
+    @staticmethod
+    def _key(platform: str, content_hash: str) -> bytes:
+        return hashlib.md5(f"{platform}:{content_hash}".encode()).digest()
+
+    def _offset(self, slot: int) -> int:
+        return _HEADER_SIZE + slot * self.slot_size
+
+    def get(self, platform: str, content_hash: str) -> dict | None:
+        """查询答案（无锁），未命中返回None"""
+        if self.disabled:
+            return None
+        key = self._key(platform, content_hash)
+        slot = int.from_bytes(key[:8], "little") & (self.capacity - 1)
+        for _ in range(self.capacity):
+            offset = self._offset(slot)
+            for _ in range(_READ_RETRIES):
+                seq, slot_key, length = _SLOT.unpack_from(self._mm, offset)
+                if seq & 1:
+                    continue
+                payload = self._mm[offset + _SLOT.size:offset + _SLOT.size + length] if slot_key == key else None
+                if _SLOT.unpack_from(self._mm, offset)[0] == seq:
+                    break
+            else:
+                # 写入进程异常退出导致槽位停留在写入中状态
+                break
+            if seq == 0:
+                self.misses += 1
+                return None
+            if payload is not None:
+                result = json.loads(payload)
+                if result is None:
+                    break
+                self.hits += 1
+                return result
+            slot = (slot + 1) & (self.capacity - 1)
+        self.misses += 1
+        return None
+
+    def put(self, platform: str, content_hash: str | None, result: dict) -> bool:
+        """
+        写入或覆盖答案
+
+        Returns:
+            是否写入成功（表已满时返回False，调用方照常走数据库）
+        """
+        if not content_hash or self.disabled:
+            return False
+        payload = json.dumps(result, ensure_ascii=False, separators=(",", ":")).encode()
+        if _SLOT.size + len(payload) > self.slot_size:
+            # 覆盖可能存在的旧答案，避免读到过期数据
+            payload = b"null"
+
+        key = self._key(platform, content_hash)
+        slot = int.from_bytes(key[:8], "little") & (self.capacity - 1)
+        if not self._lock.acquire(timeout=_LOCK_TIMEOUT):
+            # 不能跳过这次写入继续使用：表中保留的旧答案会被其他worker当作最新答案返回
+            self._mm[_DISABLED_OFFSET] = 1
+            logger.error("共享答案表写锁等待超时（持锁的worker可能已异常退出），已停用答案表")
+            return False
+        try:
+            for _ in range(self.capacity):
+                offset = self._offset(slot)
+                seq, slot_key, _ = _SLOT.unpack_from(self._mm, offset)
+                if seq == 0:
+                    used = len(self)
+                    if used >= self.capacity * MAX_LOAD_FACTOR:
+                        return False
+                    struct.pack_into("<I", self._mm, _USED_OFFSET, used + 1)
+                    break
+                if slot_key == key:
+                    break
+                slot = (slot + 1) & (self.capacity - 1)
+            else:
+                return False
+
+            struct.pack_into("<I", self._mm, offset, seq + 1)
+            self._mm[offset + _SLOT.size:offset + _SLOT.size + len(payload)] = payload
+            struct.pack_into("<16sH", self._mm, offset + 4, key, len(payload))
+            struct.pack_into("<I", self._mm, offset, seq + 2)
+        finally:
+            self._lock.release()
+        return True
+
+    def mark_built(self):
+        """标记构建完成（worker据此跳过重复构建）"""
+        struct.pack_into("<B", self._mm, _BUILT_OFFSET, 1)
+
+    def stats(self) -> dict:
+        """容量与命中统计（命中数为当前进程）"""
+        total = self.hits + self.misses
+        return {
+            "built": self.built,
+            "disabled": self.disabled,
+            "size": len(self),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+def _create_table() -> SharedAnswerTable | None:
+    if not settings.answer_table_enabled:
+        return None
+    table = SharedAnswerTable(settings.answer_table_slots, settings.answer_table_slot_size)
+    logger.debug(f"共享答案表已分配: {table.capacity}槽 x {table.slot_size}字节")
+    return table
+
+
+# 全局共享答案表（answer_table_enabled=False时为None）
+answer_table = _create_table()
@@ -0,0 +1,77 @@
+"""
+熔断器 - AI服务连续失败时快速失败，避免每个请求都等到超时
+
+状态：
+- closed: 正常调用，连续失败达到阈值后打开
+- open: 直接拒绝，经过恢复时间后进入半开
+- half_open: 只放行一个探测请求，成功则关闭，失败则重新打开
+  （探测请求超过恢复时间仍无结果时放行下一个）
+"""
+import math
+import time
+
+
+class CircuitBreaker:
+    """按连续失败次数打开的熔断器（当前进程）"""
+
+    def __init__(self, failure_threshold: int, recovery_time: float):
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self._failures = 0
+        self._opened_at = 0.0
+        self._state = "closed"
+        self._probe_at: float | None = None
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == "open" and time.monotonic() - self._opened_at >= self.recovery_time:
+            self._state = "half_open"
+            self._probe_at = None
+        return self._state
+
+    def allow(self) -> bool:
+        """是否允许发起调用（半开状态只放行一个探测请求）"""
+        if self.failure_threshold <= 0:
+            return True
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open":
+            now = time.monotonic()
+            if self._probe_at is None or now - self._probe_at >= self.recovery_time:
+                self._probe_at = now
+                return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        self._failures = 0
+        self._probe_at = None
+        self._state = "closed"
+
+    def record_failure(self):
+        self._failures += 1
+        self._probe_at = None
+        if self._state == "half_open" or (
+            self._state == "closed" and self.failure_threshold > 0 and self._failures >= self.failure_threshold
+        ):
+            self._state = "open"
+            self._opened_at = time.monotonic()
+            self.opened += 1
+
+    def retry_after(self) -> int:
+        """距离进入半开状态的秒数"""
+        if self._state != "open":
+            return 1
+        remaining = self.recovery_time - (time.monotonic() - self._opened_at)
+        return max(math.ceil(remaining), 1)
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutiveFailures": self._failures,
+            "opened": self.opened,
+            "rejected": self.rejected
+        }
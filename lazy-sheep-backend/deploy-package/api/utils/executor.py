@@ -0,0 +1,133 @@
+"""
+打分执行器 - 将CPU密集的文本规范化和相似度打分移出事件循环
+
+scoring_executor:
+- inline: 在事件循环中直接执行（默认，适合低并发）
+- thread: 线程池（difflib等纯Python打分受GIL限制，主要用于避免长时间阻塞）
+- process: 进程池（真正并行，需要序列化候选文本；需显式开启，gunicorn下每个worker
+  各自启动scoring_workers个子进程，注意与workers数量合计不要超过CPU核心数）
+
+候选数少于 scoring_inline_threshold 时始终直接执行，避免调度开销。
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from loguru import logger
+
+from api.config import get_settings
+from api.utils.text_matcher import fuzzy_match
+from api.utils.vector_scorer import HAS_NUMPY, fuzzy_match_batch
+
+settings = get_settings()
+
+_executor: Executor | None = None
+
+
+def get_executor() -> Executor | None:
+    """获取打分执行器（延迟创建，gunicorn预加载时确保在worker进程内创建）"""
+    global _executor
+    if settings.scoring_executor == "inline":
+        return None
+    if _executor is None:
+        workers = settings.scoring_workers
+        if settings.scoring_executor == "process":
+            # spawn: 避免在已有事件循环/线程的worker进程中fork
+            _executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scoring")
+        logger.info(f"打分执行器已启动: {settings.scoring_executor} x {workers}")
+    return _executor
+
+
+async def start_executor():
+    """创建执行器并预热（进程池首次提交时才启动子进程，提前启动避免首个请求承担开销）"""
+    executor = get_executor()
+    if executor is None:
+        return
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*[
+        loop.run_in_executor(executor, fuzzy_match, "", [], 1.0, settings.fuzzy_scorer)
+        for _ in range(settings.scoring_workers)
+    ])
+
+
+def shutdown_executor():
+    """关闭打分执行器（应用关闭时调用）"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def run_index_query(query, *args):
+    """
+    执行内存索引查询（倒排表遍历为纯Python计算，非inline时移出事件循环）
+
+    索引位于当前进程内存中，进程池无法访问，scoring_executor=process时改用默认线程池。
+    """
+    executor = get_executor()
+    if executor is None:
+        return query(*args)
+    if isinstance(executor, ProcessPoolExecutor):
+        executor = None
+    return await asyncio.get_running_loop().run_in_executor(executor, query, *args)
+
+
+def _fuzzy_match_chunk(
+    items: list[tuple[str, list[str]]],
+    threshold: float,
+    scorer: str,
+    rescore_top: int
+) -> list[dict | None]:
+    """执行器中的工作单元：对一组(查询, 候选列表)做模糊匹配，多个查询时走NumPy向量化粗排"""
+    if HAS_NUMPY and rescore_top > 0 and len(items) > 1:
+        return fuzzy_match_batch(items, threshold, scorer, rescore_top)
+    return [fuzzy_match(query, candidates, threshold, scorer) for query, candidates in items]
+
+
+async def fuzzy_match_async(
+    query: str,
+    candidates: list[str],
+    threshold: float = 0.85
+) -> dict | None:
+    """fuzzy_match的异步版本，候选较多时在执行器中运行"""
+    return (await fuzzy_match_many([(query, candidates)], threshold))[0]
+
+
+async def fuzzy_match_many(
+    items: list[tuple[str, list[str]]],
+    threshold: float = 0.85
+) -> list[dict | None]:
+    """
+    批量模糊匹配
+
+    按 scoring_chunk_size 个查询切分为工作单元并发提交执行器。
+
+    Args:
+        items: [(查询文本, 候选文本列表), ...]
+        threshold: 相似度阈值
+
+    Returns:
+        与items一一对应的fuzzy_match结果
+    """
+    scorer = settings.fuzzy_scorer
+    rescore_top = settings.batch_rescore_top
+    executor = get_executor()
+    total_candidates = sum(len(candidates) for _, candidates in items)
+    if executor is None or total_candidates < settings.scoring_inline_threshold:
+        return _fuzzy_match_chunk(items, threshold, scorer, rescore_top)
+
+    loop = asyncio.get_running_loop()
+    size = max(settings.scoring_chunk_size, 1)
+    futures = [
+        loop.run_in_executor(executor, _fuzzy_match_chunk, items[i:i + size], threshold, scorer, rescore_top)
+        for i in range(0, len(items), size)
+    ]
+    results = []
+    for chunk in await asyncio.gather(*futures):
+        results.extend(chunk)
+    return results
@@ -0,0 +1,261 @@
+"""
+AI调用并发限制 - 每个worker限制同时进行的AI请求数，超出时按优先级排队
+
+交互请求（单题答题）优先于批量任务；排队超过最长等待时间抛出LimiterBusy，
+由路由返回503和Retry-After，避免流量高峰时大量请求堆积到gunicorn超时。
+可选的跨worker总并发上限使用主进程创建的信号量（preload_app=True时各worker共享），
+各worker持有的许可数记录在共享内存中，worker被超时或OOM杀死后由主进程在
+child_exit钩子中归还（reclaim），避免总上限永久缩小。
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import multiprocessing
+import os
+import time
+from contextlib import asynccontextmanager
+
+from loguru import logger
+
+from api.config import get_settings
+
+settings = get_settings()
+
+# 优先级（数值越小越优先）
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+# 跨worker信号量轮询间隔（秒）
+_GLOBAL_POLL_INTERVAL = 0.02
+# 共享内存中最多记录的worker数
+_MAX_TRACKED_WORKERS = 256
+
+
+class LimiterBusy(Exception):
+    """排队超时"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"AI服务繁忙，请{retry_after}秒后重试")
+        self.retry_after = retry_after
+
+
+class GlobalPermits:
+    """
+    跨worker并发许可
+
+    信号量限制总数，共享数组按 (pid, 持有数) 记录每个worker当前持有的许可，
+    主进程在worker退出后调用reclaim归还其未释放的许可。
+    """
+
+    def __init__(self, limit: int, max_workers: int = _MAX_TRACKED_WORKERS):
+        self._semaphore = multiprocessing.BoundedSemaphore(limit)
+        self._held = multiprocessing.Array("q", 2 * max_workers, lock=False)
+        self._claim_lock = multiprocessing.Lock()
+        self._pid = None
+        self._entry: int | None = None
+
+    def _own_entry(self) -> int | None:
+        """当前进程在共享数组中的位置（首次使用时登记，数组已满或登记锁超时返回None）"""
+        pid = os.getpid()
+        if self._pid == pid:
+            return self._entry
+        if not self._claim_lock.acquire(timeout=1.0):
+            logger.warning("AI全局并发许可登记锁超时，本进程持有的许可将无法在异常退出后归还")
+            return None
+        try:
+            self._pid = pid
+            self._entry = None
+            free = None
+            for i in range(0, len(self._held), 2):
+                if self._held[i] == pid:
+                    self._entry = i
+                    break
+                if free is None and self._held[i] == 0:
+                    free = i
+            if self._entry is None and free is not None:
+                self._held[free] = pid
+                self._held[free + 1] = 0
+                self._entry = free
+            return self._entry
+        finally:
+            self._claim_lock.release()
+
+    def try_acquire(self) -> bool:
+        """不等待地获取一个许可"""
+        if not self._semaphore.acquire(block=False):
+            return False
+        entry = self._own_entry()
+        if entry is not None:
+            self._held[entry + 1] += 1
+        return True
+
+    def release(self):
+        entry = self._own_entry()
+        if entry is not None and self._held[entry + 1] > 0:
+            self._held[entry + 1] -= 1
+        self._semaphore.release()
+
+    def reclaim(self, pid: int) -> int:
+        """归还已退出worker持有的许可（主进程调用），返回归还数量"""
+        reclaimed = 0
+        for i in range(0, len(self._held), 2):
+            if self._held[i] != pid:
+                continue
+            for _ in range(self._held[i + 1]):
+                try:
+                    self._semaphore.release()
+                    reclaimed += 1
+                except ValueError:
+                    break
+            self._held[i + 1] = 0
+            self._held[i] = 0
+        return reclaimed
+
+
+class LLMLimiter:
+    """带优先级队列的异步并发限制"""
+
+    def __init__(self, max_concurrency: int, global_concurrency: int = 0):
+        self.max_concurrency = max_concurrency
+        self._active = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._global = GlobalPermits(global_concurrency) if global_concurrency > 0 else None
+        self.acquired = 0
+        self.rejected = 0
+        self.max_depth = 0
+        self._total_wait = 0.0
+        self.max_wait_ms = 0.0
+        self._avg_hold = 1.0
+
+    @property
+    def depth(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_INTERACTIVE, max_wait: float | None = None):
+        """
+        占用一个并发槽位
+
+        Raises:
+            LimiterBusy: 排队超过max_wait秒
+        """
+        start = time.monotonic()
+        deadline = start + (max_wait if max_wait is not None else settings.llm_max_queue_wait)
+        await self._acquire(priority, deadline)
+        try:
+            if self._global is not None:
+                await self._acquire_global(deadline)
+        except BaseException:
+            # 排队超时或等待全局槽位时被取消（请求超时、对冲取消、关闭），归还本地槽位
+            self._release()
+            raise
+
+        wait = time.monotonic() - start
+        self.acquired += 1
+        self._total_wait += wait
+        self.max_wait_ms = max(self.max_wait_ms, wait * 1000)
+        try:
+            yield
+        finally:
+            hold = time.monotonic() - start - wait
+            self._avg_hold = 0.9 * self._avg_hold + 0.1 * hold
+            if self._global is not None:
+                self._global.release()
+            self._release()
+
+    def try_acquire(self) -> bool:
+        """
+        不排队地占用一个槽位（用于对冲请求等可放弃的调用），成功后须调用release归还
+
+        本地槽位已满、有请求在排队或全局许可不足时返回False。
+        """
+        if self._active >= self.max_concurrency or self.depth:
+            return False
+        if self._global is not None and not self._global.try_acquire():
+            return False
+        self._active += 1
+        return True
+
+    def release(self):
+        """归还try_acquire占用的槽位"""
+        if self._global is not None:
+            self._global.release()
+        self._release()
+
+    async def _acquire(self, priority: int, deadline: float):
+        if self._active < self.max_concurrency and not self.depth:
+            self._active += 1
+            return
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        self.max_depth = max(self.max_depth, self.depth)
+        # 不使用wait_for：槽位转交后、恢复运行前被取消时wait_for会吞掉取消（Python 3.11）
+        timer = loop.call_later(max(deadline - time.monotonic(), 0), self._expire, future)
+        try:
+            # 释放槽位时由_release直接转交（_active不变）
+            await future
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise LimiterBusy(self.retry_after())
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 已被转交槽位，继续转交给下一个等待者
+                self._release()
+            else:
+                future.cancel()
+            raise
+        finally:
+            timer.cancel()
+
+    @staticmethod
+    def _expire(future: asyncio.Future):
+        if not future.done():
+            future.set_exception(asyncio.TimeoutError())
+
+    async def _acquire_global(self, deadline: float):
+        while not self._global.try_acquire():
+            if time.monotonic() >= deadline:
+                self.rejected += 1
+                raise LimiterBusy(self.retry_after())
+            await asyncio.sleep(_GLOBAL_POLL_INTERVAL)
+
+    def _release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    def reclaim(self, pid: int) -> int:
+        """归还已退出worker持有的全局许可（gunicorn child_exit钩子中由主进程调用）"""
+        if self._global is None:
+            return 0
+        return self._global.reclaim(pid)
+
+    def retry_after(self) -> int:
+        """按平均占用时间估算的重试等待秒数"""
+        estimate = self._avg_hold * (self.depth + 1) / self.max_concurrency
+        return min(max(math.ceil(estimate), 1), 60)
+
+    def stats(self) -> dict:
+        """并发与排队统计（当前进程）"""
+        return {
+            "maxConcurrency": self.max_concurrency,
+            "active": self._active,
+            "queueDepth": self.depth,
+            "maxQueueDepth": self.max_depth,
+            "acquired": self.acquired,
+            "rejected": self.rejected,
+            "avgWaitMs": round(self._total_wait / self.acquired * 1000, 2) if self.acquired else 0.0,
+            "maxWaitMs": round(self.max_wait_ms, 2),
+            "avgCallMs": round(self._avg_hold * 1000, 2)
+        }
+
+
+# 全局AI调用限制（每个worker一个；跨worker信号量在preload时由主进程创建）
+llm_limiter = LLMLimiter(settings.llm_max_concurrency, settings.llm_global_concurrency)
@@ -0,0 +1,42 @@
+"""
+请求合并（singleflight）- 相同键的并发调用只执行一次，其余调用等待同一结果
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    进程内请求合并
+
+    第一个调用方创建任务执行，期间相同键的调用方共享该任务的结果或异常。
+    任务独立于调用方运行，发起的请求被取消（如客户端断开）不会影响其他等待者。
+    """
+
+    def __init__(self):
+        self._flights: dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """执行或加入键为key的调用"""
+        task = self._flights.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.create_task(func())
+            self._flights[key] = task
+            task.add_done_callback(lambda _: self._flights.pop(key, None))
+        else:
+            self.followers += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        """合并统计（当前进程）"""
+        return {
+            "inflight": len(self._flights),
+            "leaders": self.leaders,
+            "followers": self.followers
+        }
@@ -46,3 +46,35 @@ preload_app = True
 
 # PID文件
 pidfile = './data/gunicorn.pid'
+
+
+def when_ready(server):
+    """主进程预加载应用后构建共享精确答案表和布隆过滤器，随后fork出的worker直接共享同一块内存"""
+    import asyncio
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from api.config import get_settings
+    from api.services.search_service import SearchService
+
+    async def build():
+        # 独立的数据库引擎，避免主进程建立的连接被worker继承
+        engine = create_async_engine(get_settings().database_url)
+        try:
+            async with AsyncSession(engine) as session:
+                await SearchService.build_answer_table(session)
+                await SearchService.rebuild_question_filter(session)
+        finally:
+            await engine.dispose()
+
+    try:
+        asyncio.run(build())
+    except Exception as e:
+        server.log.warning(f"共享答案表/布隆过滤器构建失败，将由worker启动时构建: {e}")
+
+
+def child_exit(server, worker):
+    """worker退出后（包括超时或OOM被杀）归还其未释放的AI全局并发许可"""
+    from api.utils.llm_limiter import llm_limiter
+
+    reclaimed = llm_limiter.reclaim(worker.pid)
+    if reclaimed:
+        server.log.warning(f"worker {worker.pid} 退出时持有{reclaimed}个AI全局并发许可，已归还")
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+题库维护工具
+用于执行数据回填等批量维护任务
+"""
+import asyncio
+import sys
+import time
+from sqlalchemy import select, update, func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from api.config import get_settings
+from api.database import engine, init_db
+from api.models.answer import Answer
+from api.models.question import Question
+from api.services.fulltext_service import FulltextService
+from api.services.quality_service import QualityService
+from api.services.snapshot_service import SnapshotService
+from api.utils.text_matcher import normalized_hash
+
+
+async def backfill_normalized_hash(recompute: bool = False, chunk_size: int = 1000):
+    """回填questions.normalized_hash（recompute=True时重算全部，用于规范化规则变更后）"""
+    
+    start = time.perf_counter()
+    last_id = 0
+    scanned = 0
+    updated = 0
+    
+    async with AsyncSession(engine) as session:
+        while True:
+            stmt = select(Question.id, Question.content, Question.normalized_hash).where(
+                Question.id > last_id
+            ).order_by(Question.id).limit(chunk_size)
+            if not recompute:
+                stmt = stmt.where(Question.normalized_hash.is_(None))
+            
+            rows = (await session.execute(stmt)).all()
+            if not rows:
+                break
+            
+            changes = []
+            for row in rows:
+                value = normalized_hash(row.content or "")
+                if value != row.normalized_hash:
+                    changes.append({"id": row.id, "normalized_hash": value})
+            
+            if changes:
+                # 按主键批量UPDATE
+                await session.execute(update(Question), changes)
+                await session.commit()
+            
+            scanned += len(rows)
+            updated += len(changes)
+            last_id = rows[-1].id
+            print(f"  已处理 {scanned} 题，更新 {updated} 题")
+    
+    elapsed = time.perf_counter() - start
+    print(f"✅ 回填完成: 扫描 {scanned} 题，更新 {updated} 题，耗时 {elapsed:.1f}s")
+
+
+async def build_fulltext():
+    """重建全文检索记录（SEARCH_BACKEND=fulltext）"""
+    
+    start = time.perf_counter()
+    async with AsyncSession(engine) as session:
+        total = await FulltextService.rebuild(session)
+    
+    elapsed = time.perf_counter() - start
+    print(f"✅ 全文索引重建完成: {total} 题，耗时 {elapsed:.1f}s")
+
+
+async def build_index_snapshot():
+    """生成n-gram索引快照（worker启动时mmap加载，只需从数据库补齐快照之后的题目）"""
+    
+    path = get_settings().index_snapshot_path
+    start = time.perf_counter()
+    async with AsyncSession(engine) as session:
+        stats = await SnapshotService.build(session, path)
+    
+    elapsed = time.perf_counter() - start
+    print(f"✅ 索引快照已生成: {path}")
+    print(f"   {stats['questions']} 题，{stats['partitions']} 个分区，水位id={stats['watermarkId']}，耗时 {elapsed:.1f}s")
+
+
+async def recompute_best_answers(platform: str | None = None):
+    """按当前排序规则重算全部题目的最佳答案"""
+    
+    async with AsyncSession(engine) as session:
+        stats = await QualityService.recompute_best_answers(session, platform)
+    
+    print(
+        f"✅ 最佳答案重算完成: 扫描 {stats['questionsScanned']} 题，"
+        f"修改答案 {stats['answersChanged']} 行、题目 {stats['questionsChanged']} 行，"
+        f"耗时 {stats['elapsedSeconds']}s（{stats['questionsPerSecond']} 题/秒）"
+    )
+    print("   运行中的服务需重启后共享答案表和缓存才会更新（或调用 POST /api/quality/recompute-best-answers）")
+
+
+async def dedupe_questions():
+    """合并规范化hash相同的重复题目和重复答案（执行004迁移前运行）"""
+    
+    start = time.perf_counter()
+    async with AsyncSession(engine) as session:
+        stats = await QualityService.merge_duplicate_questions(session)
+    
+    elapsed = time.perf_counter() - start
+    print(
+        f"✅ 重复数据合并完成: {stats['duplicateGroups']} 组重复题目，删除题目 {stats['questionsRemoved']} 题，"
+        f"改挂答案 {stats['answersMoved']} 条，合并重复答案 {stats['answersMerged']} 条，耗时 {elapsed:.1f}s"
+    )
+    print("   现在可以执行 migrations/004_add_composite_indexes_*.sql；运行中的服务需重启（并重新运行build-index）")
+
+
+def _hot_queries():
+    """热点查询（与SearchService/答案去重使用的语句一致，参数为示例值）"""
+    return [
+        ("questionId精确查询", select(Question).where(
+            Question.question_id == "q1", Question.platform == "czbk")),
+        ("questionId批量查询", select(Question).where(
+            Question.question_id.in_(["q1", "q2"]), Question.platform == "czbk")),
+        ("规范化hash精确查询", select(Question).where(
+            Question.normalized_hash == "0" * 32, Question.platform == "czbk").limit(1)),
+        ("规范化hash批量查询", select(Question).where(
+            Question.normalized_hash.in_(["0" * 32, "1" * 32]), Question.platform == "czbk")),
+        ("模糊匹配索引加载", select(Question.id, Question.content).where(
+            Question.type == "0", Question.platform == "czbk")),
+        ("答案去重", select(Answer).where(
+            Answer.question_id == 1, Answer.answer == "A", Answer.source == "ai")),
+        ("题目全部答案", select(Answer).where(Answer.question_id == 1)),
+    ]
+
+
+async def check_indexes():
+    """检查唯一索引冲突数据，并输出热点查询的执行计划"""
+    
+    async with AsyncSession(engine) as session:
+        dialect = session.bind.dialect
+        
+        # 1. 阻碍唯一索引创建的重复数据
+        print("🔍 重复数据检查")
+        duplicate_checks = [
+            ("questions(normalized_hash, platform)", select(
+                Question.normalized_hash, Question.platform, func.count()
+            ).where(Question.normalized_hash.isnot(None)).group_by(
+                Question.normalized_hash, Question.platform
+            ).having(func.count() > 1)),
+            ("answers(question_id, source, answer)", select(
+                Answer.question_id, Answer.source, Answer.answer, func.count()
+            ).group_by(Answer.question_id, Answer.source, Answer.answer).having(func.count() > 1)),
+        ]
+        for name, stmt in duplicate_checks:
+            rows = (await session.execute(stmt.limit(10))).all()
+            if rows:
+                print(f"  ⚠️ {name} 存在重复（最多显示10组），执行004迁移前先运行 dedupe 合并:")
+                for row in rows:
+                    print(f"     {tuple(row)}")
+            else:
+                print(f"  ✅ {name} 无重复")
+        print()
+        
+        # 2. 执行计划
+        explain = "EXPLAIN QUERY PLAN " if dialect.name == "sqlite" else "EXPLAIN "
+        full_scan = "SCAN " if dialect.name == "sqlite" else "Seq Scan"
+        print(f"📋 热点查询执行计划 ({dialect.name})")
+        for name, stmt in _hot_queries():
+            sql = str(stmt.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+            rows = (await session.execute(text(explain + sql))).all()
+            plan = [str(row[-1]) for row in rows]
+            # SQLite中 "SCAN 表 USING INDEX" 为索引扫描，仅 "SCAN 表" 为全表扫描
+            scanned = any(full_scan in line and "USING" not in line for line in plan)
+            print(f"  {'⚠️ 全表扫描' if scanned else '✅'} {name}")
+            for line in plan:
+                print(f"       {line}")
+
+
+async def main():
+    """主函数"""
+    
+    # 初始化数据库
+    await init_db()
+    
+    if len(sys.argv) < 2:
+        print("=" * 80)
+        print("🔧 题库维护工具")
+        print("=" * 80)
+        print()
+        print("用法:")
+        print()
+        print("  回填规范化hash（执行 migrations/002_add_normalized_hash.sql 后运行）:")
+        print("    python manage_questions.py backfill-hash [--all]")
+        print("    --all: 重新计算所有题目（规范化规则变更后使用）")
+        print()
+        print("  重建全文检索索引（执行 migrations/003_add_fulltext_*.sql 后运行）:")
+        print("    python manage_questions.py build-fulltext")
+        print()
+        print("  合并重复题目（backfill-hash之后、执行 migrations/004_add_composite_indexes_*.sql 之前必须运行）:")
+        print("    python manage_questions.py dedupe")
+        print()
+        print("  检查索引（执行 migrations/004_add_composite_indexes_*.sql 前后运行）:")
+        print("    python manage_questions.py check-indexes")
+        print()
+        print("  重算最佳答案（最佳答案排序规则变更后运行）:")
+        print("    python manage_questions.py recompute-best [--platform=czbk]")
+        print()
+        print("  生成搜索索引快照（重启服务前运行，缩短worker预热时间）:")
+        print("    python manage_questions.py build-index")
+        print()
+        print("=" * 80)
+        return
+    
+    command = sys.argv[1]
+    
+    if command == "backfill-hash":
+        await backfill_normalized_hash(recompute="--all" in sys.argv[2:])
+    
+    elif command == "build-fulltext":
+        await build_fulltext()
+    
+    elif command == "build-index":
+        await build_index_snapshot()
+    
+    elif command == "dedupe":
+        await dedupe_questions()
+    
+    elif command == "check-indexes":
+        await check_indexes()
+    
+    elif command == "recompute-best":
+        platform = next((arg.split("=", 1)[1] for arg in sys.argv[2:] if arg.startswith("--platform=")), None)
+        await recompute_best_answers(platform)
+    
+    else:
+        print(f"❌ 未知命令: {command}")
+        print("可用命令: backfill-hash, build-fulltext, build-index, dedupe, check-indexes, recompute-best")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
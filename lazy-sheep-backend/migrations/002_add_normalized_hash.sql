@@ -0,0 +1,8 @@
+-- 添加规范化题干hash列，格式差异（HTML、空白、全半角、图片签名参数）不影响精确匹配
+-- PostgreSQL: psql -h localhost -U lazy_user -d lazy_sheep -f migrations/002_add_normalized_hash.sql
+-- SQLite:     sqlite3 data/questions.db < migrations/002_add_normalized_hash.sql
+-- 执行后运行回填: cd deploy-package && python manage_questions.py backfill-hash
+
+ALTER TABLE questions ADD COLUMN normalized_hash VARCHAR(32);
+
+CREATE INDEX IF NOT EXISTS ix_questions_normalized_hash ON questions(normalized_hash);
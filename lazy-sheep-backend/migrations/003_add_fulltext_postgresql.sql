@@ -0,0 +1,21 @@
+-- 全文检索候选召回（PostgreSQL pg_trgm），配合 SEARCH_BACKEND=fulltext 使用
+-- 执行: psql -h localhost -U lazy_user -d lazy_sheep -f migrations/003_add_fulltext_postgresql.sql
+-- 执行后建立索引: cd deploy-package && python manage_questions.py build-fulltext
+-- 注意: CREATE EXTENSION 需要数据库超级用户或库所有者权限
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- content_normalized: 规范化题干（去HTML、全半角统一、去空白），由应用层生成
+CREATE TABLE IF NOT EXISTS question_search (
+    question_id INTEGER PRIMARY KEY REFERENCES questions(id) ON DELETE CASCADE,
+    platform VARCHAR(20),
+    type VARCHAR(10),
+    content_normalized TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_question_search_trgm
+    ON question_search USING GIN (content_normalized gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_question_search_platform_type
+    ON question_search(platform, type);
+
+COMMENT ON TABLE question_search IS '模糊匹配候选召回（pg_trgm）';
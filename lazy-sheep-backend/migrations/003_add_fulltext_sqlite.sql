@@ -0,0 +1,18 @@
+-- 全文检索候选召回（SQLite FTS5），配合 SEARCH_BACKEND=fulltext 使用
+-- 执行: sqlite3 data/questions.db < migrations/003_add_fulltext_sqlite.sql
+-- 执行后建立索引: cd deploy-package && python manage_questions.py build-fulltext
+
+-- content: 规范化题干的n-gram词串（中文二元组、英文单词及三元组），由应用层生成
+-- rowid 与 questions.id 一致
+CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+    content,
+    platform UNINDEXED,
+    type UNINDEXED,
+    tokenize = 'unicode61'
+);
+
+-- 删除题目时同步删除检索记录
+CREATE TRIGGER IF NOT EXISTS questions_fts_delete AFTER DELETE ON questions
+BEGIN
+    DELETE FROM questions_fts WHERE rowid = OLD.id;
+END;
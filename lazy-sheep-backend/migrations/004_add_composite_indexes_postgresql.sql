@@ -0,0 +1,23 @@
+-- 热点查询的复合索引（PostgreSQL）
+-- 保存题目的 INSERT ... ON CONFLICT 以这里的唯一索引为冲突目标，升级应用前必须执行
+-- 执行前必须合并重复数据（backfill-hash后规范化题干相同的题目hash相同，唯一索引会因重复而创建失败）:
+--   cd deploy-package && python manage_questions.py dedupe && python manage_questions.py check-indexes
+-- 执行: psql -h localhost -U lazy_user -d lazy_sheep -f migrations/004_add_composite_indexes_postgresql.sql
+-- CONCURRENTLY建索引不锁表，但不能在事务块中执行（psql -f 默认逐条自动提交即可）
+
+-- 精确匹配/去重: WHERE normalized_hash = ? AND platform = ?
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ux_questions_hash_platform ON questions(normalized_hash, platform);
+
+-- 模糊匹配索引加载: WHERE platform = ? AND type = ?
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_questions_platform_type ON questions(platform, type);
+
+-- 答案去重: WHERE question_id = ? AND source = ? AND answer = ?
+-- B-tree单条记录有长度上限（约2.7KB），长答案按md5建索引
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ux_answers_dedupe_md5 ON answers(question_id, source, md5(answer));
+
+-- 已被上述复合索引的前缀覆盖
+DROP INDEX CONCURRENTLY IF EXISTS ix_questions_normalized_hash;
+DROP INDEX CONCURRENTLY IF EXISTS ix_answers_question_id;
+
+ANALYZE questions;
+ANALYZE answers;
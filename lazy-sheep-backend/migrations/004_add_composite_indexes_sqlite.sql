@@ -0,0 +1,21 @@
+-- 热点查询的复合索引（SQLite）
+-- 保存题目的 INSERT ... ON CONFLICT 以这里的唯一索引为冲突目标，升级应用前必须执行
+-- 执行前必须合并重复数据（backfill-hash后规范化题干相同的题目hash相同，唯一索引会因重复而创建失败）:
+--   cd deploy-package && python manage_questions.py dedupe && python manage_questions.py check-indexes
+-- 执行: sqlite3 data/questions.db < migrations/004_add_composite_indexes_sqlite.sql
+-- 执行后再次运行 check-indexes 确认各查询均使用索引
+
+-- 精确匹配/去重: WHERE normalized_hash = ? AND platform = ?
+CREATE UNIQUE INDEX IF NOT EXISTS ux_questions_hash_platform ON questions(normalized_hash, platform);
+
+-- 模糊匹配索引加载: WHERE platform = ? AND type = ?（SQLite二级索引自带rowid，只取id时无需回表）
+CREATE INDEX IF NOT EXISTS ix_questions_platform_type ON questions(platform, type);
+
+-- 答案去重: WHERE question_id = ? AND source = ? AND answer = ?
+CREATE UNIQUE INDEX IF NOT EXISTS ux_answers_dedupe ON answers(question_id, source, answer);
+
+-- 已被上述复合索引的前缀覆盖
+DROP INDEX IF EXISTS ix_questions_normalized_hash;
+DROP INDEX IF EXISTS ix_answers_question_id;
+
+ANALYZE;
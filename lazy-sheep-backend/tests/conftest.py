@@ -0,0 +1,18 @@
+"""
+单元测试公共配置
+
+单元测试不连接数据库、Redis和AI服务，只测试进程内/共享内存的数据结构。
+导入api模块前设置环境变量，避免读取开发环境的 .env 配置。
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_TEST_DIR = tempfile.mkdtemp(prefix="lazy-sheep-test-")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_TEST_DIR}/questions.db")
+os.environ.setdefault("LOG_FILE", os.path.join(_TEST_DIR, "app.log"))
+os.environ.setdefault("REDIS_ENABLED", "false")
+os.environ.setdefault("DEEPSEEK_API_KEY", "sk-test")
+os.environ.setdefault("DEEPSEEK_BASE_URL", "http://127.0.0.1:9/")
@@ -0,0 +1,156 @@
+"""
+AI答案缓存与请求合并单元测试（AI调用用假实现代替）
+"""
+import asyncio
+
+import pytest
+
+from api.services.ai_service import AIService
+from api.utils.cache import ai_cache
+
+OPTIONS = [
+    {"key": "A", "text": "北京"},
+    {"key": "B", "text": "上海"},
+    {"key": "C", "text": "广州"},
+    {"key": "D", "text": "深圳"}
+]
+SHUFFLED = [
+    {"key": "A", "text": "深圳"},
+    {"key": "B", "text": "广州"},
+    {"key": "C", "text": "北京"},
+    {"key": "D", "text": "上海"}
+]
+
+
+@pytest.fixture(autouse=True)
+def clear_ai_cache():
+    ai_cache.clear()
+    yield
+    ai_cache.clear()
+
+
+class FakeModel:
+    """按选项文本作答的假AI调用，记录调用次数"""
+
+    def __init__(self, correct: str = "北京", answer: str | None = None, delay: float = 0.01):
+        self.correct = correct
+        self.answer = answer
+        self.delay = delay
+        self.calls = 0
+
+    async def generate(self, content, question_type, options, model, attempted_answers=None, priority=0):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        answer = self.answer
+        if answer is None:
+            answer = next(opt["key"] for opt in options if opt["text"] == self.correct)
+        return {"answer": answer, "confidence": 0.9, "model": model}
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    fake = FakeModel()
+    monkeypatch.setattr(AIService, "_generate", staticmethod(fake.generate))
+    return fake
+
+
+def _entry(result: dict, options: list, question_type: str = "0") -> dict:
+    keys, texts = AIService._option_texts(options)
+    return asyncio.run(AIService._store_entry("fp", result, question_type, keys, texts))
+
+
+def _from_entry(entry: dict, options: list) -> dict | None:
+    keys, texts = AIService._option_texts(options)
+    return AIService._from_entry(entry, keys, texts)
+
+
+def test_fingerprint_ignores_option_order():
+    keys, texts = AIService._option_texts(OPTIONS)
+    shuffled_keys, shuffled_texts = AIService._option_texts(SHUFFLED)
+    assert AIService._fingerprint("首都是？", "0", keys, texts, "m", 0.1) == \
+        AIService._fingerprint("首都是？", "0", shuffled_keys, shuffled_texts, "m", 0.1)
+
+
+def test_entry_stores_option_texts_and_remaps():
+    entry = _entry({"answer": "A", "confidence": 0.9}, OPTIONS)
+    assert entry["optionTexts"] == ["北京"]
+    assert ai_cache.get("fp") == entry
+    assert _from_entry(entry, OPTIONS)["answer"] == "A"
+    assert _from_entry(entry, SHUFFLED)["answer"] == "C"
+
+
+def test_multiple_choice_entry_remaps_sorted():
+    entry = _entry({"answer": "A,B", "confidence": 0.9}, OPTIONS, question_type="1")
+    assert _from_entry(entry, SHUFFLED)["answer"] == "C,D"
+
+
+def test_entry_not_mappable_to_other_options():
+    entry = _entry({"answer": "A", "confidence": 0.9}, OPTIONS)
+    other = [{"key": "A", "text": "杭州"}, {"key": "B", "text": "上海"}]
+    assert _from_entry(entry, other) is None
+
+
+def test_unmappable_answer_is_not_cached_and_keeps_option_order():
+    entry = _entry({"answer": "E", "confidence": 0.5}, OPTIONS)
+    assert ai_cache.get("fp") is None
+    assert "optionTexts" not in entry
+    # 字母只对原选项顺序有效
+    assert _from_entry(entry, OPTIONS)["answer"] == "E"
+    assert _from_entry(entry, SHUFFLED) is None
+
+
+def test_non_choice_entry_is_returned_as_is():
+    entry = _entry({"answer": "对", "confidence": 0.9}, [], question_type="2")
+    assert _from_entry(entry, [])["answer"] == "对"
+
+
+def test_cache_hit_remaps_to_shuffled_request(fake_model):
+    async def scenario():
+        first = await AIService.answer_question("中国的首都是？", "0", OPTIONS)
+        second = await AIService.answer_question("中国的首都是？", "0", SHUFFLED)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert (first["answer"], first["cached"]) == ("A", False)
+    assert (second["answer"], second["cached"]) == ("C", True)
+    assert fake_model.calls == 1
+
+
+def test_concurrent_requests_share_one_call(fake_model):
+    async def scenario():
+        return await asyncio.gather(
+            AIService.answer_question("中国的首都是？", "0", OPTIONS),
+            AIService.answer_question("中国的首都是？", "0", OPTIONS),
+            AIService.answer_question("中国的首都是？", "0", SHUFFLED)
+        )
+
+    results = asyncio.run(scenario())
+    assert [result["answer"] for result in results] == ["A", "A", "C"]
+    assert fake_model.calls == 1
+
+
+def test_unmappable_answer_not_shared_with_other_option_order(fake_model):
+    fake_model.answer = "E"
+
+    async def scenario():
+        return await asyncio.gather(
+            AIService.answer_question("中国的首都是？", "0", OPTIONS),
+            AIService.answer_question("中国的首都是？", "0", OPTIONS),
+            AIService.answer_question("中国的首都是？", "0", SHUFFLED)
+        )
+
+    results = asyncio.run(scenario())
+    assert all(result["answer"] == "E" for result in results)
+    # 选项顺序相同的请求共用一次调用，顺序不同的请求单独调用
+    assert fake_model.calls == 2
+    assert len(ai_cache) == 0
+
+
+def test_reanswer_bypasses_cache(fake_model):
+    async def scenario():
+        await AIService.answer_question("中国的首都是？", "0", OPTIONS)
+        return await AIService.answer_question("中国的首都是？", "0", OPTIONS, attempted_answers=["B"])
+
+    result = asyncio.run(scenario())
+    assert "cached" not in result
+    assert fake_model.calls == 2
@@ -0,0 +1,111 @@
+"""
+共享答案表（seqlock开放寻址表）单元测试
+"""
+import multiprocessing
+import os
+import struct
+
+import pytest
+
+from api.utils import answer_table as answer_table_module
+from api.utils.answer_table import SharedAnswerTable, _SLOT
+
+
+@pytest.fixture
+def table():
+    return SharedAnswerTable(slots=16, slot_size=256)
+
+
+def _slot_offset(table: SharedAnswerTable, platform: str, content_hash: str) -> int:
+    key = table._key(platform, content_hash)
+    slot = int.from_bytes(key[:8], "little") & (table.capacity - 1)
+    return table._offset(slot)
+
+
+def test_put_and_get(table):
+    assert table.put("czbk", "h1", {"answer": "A"})
+    assert table.get("czbk", "h1") == {"answer": "A"}
+    assert table.get("czbk", "h2") is None
+    # 平台不同视为不同的键
+    assert table.get("other", "h1") is None
+    assert len(table) == 1
+
+
+def test_overwrite_keeps_size(table):
+    table.put("czbk", "h1", {"answer": "A"})
+    table.put("czbk", "h1", {"answer": "B"})
+    assert table.get("czbk", "h1") == {"answer": "B"}
+    assert len(table) == 1
+
+
+def test_put_without_hash_is_ignored(table):
+    assert not table.put("czbk", None, {"answer": "A"})
+    assert not table.put("czbk", "", {"answer": "A"})
+    assert len(table) == 0
+
+
+def test_oversized_payload_overwrites_as_miss(table):
+    table.put("czbk", "h1", {"answer": "A"})
+    # 超出槽位大小的答案写为null，旧答案不能继续被读到
+    assert table.put("czbk", "h1", {"answer": "x" * 1000})
+    assert table.get("czbk", "h1") is None
+
+
+def test_full_table_rejects_new_keys(table):
+    stored = 0
+    for i in range(table.capacity):
+        if table.put("czbk", f"h{i}", {"answer": str(i)}):
+            stored += 1
+    assert stored < table.capacity
+    assert len(table) == stored
+    assert not table.put("czbk", "another", {"answer": "B"})
+    # 已有的键仍可覆盖
+    assert table.put("czbk", "h0", {"answer": "B"})
+    assert table.get("czbk", "h0") == {"answer": "B"}
+
+
+def test_collisions_probe_to_next_slot(table):
+    for i in range(10):
+        table.put("czbk", f"h{i}", {"answer": str(i)})
+    for i in range(10):
+        assert table.get("czbk", f"h{i}") == {"answer": str(i)}
+
+
+def test_slot_stuck_in_write_is_a_miss(table, monkeypatch):
+    table.put("czbk", "h1", {"answer": "A"})
+    offset = _slot_offset(table, "czbk", "h1")
+    seq = _SLOT.unpack_from(table._mm, offset)[0]
+    # 模拟写入进程在写入中途退出：序号停留在奇数
+    struct.pack_into("<I", table._mm, offset, seq + 1)
+    monkeypatch.setattr(answer_table_module, "_READ_RETRIES", 10)
+    assert table.get("czbk", "h1") is None
+
+
+def _hold_lock_and_exit(lock):
+    lock.acquire()
+    # 不释放锁直接退出，模拟worker在持锁期间被杀死
+    os._exit(0)
+
+
+def test_lock_timeout_disables_table(table, monkeypatch):
+    table.put("czbk", "h1", {"answer": "A"})
+    monkeypatch.setattr(answer_table_module, "_LOCK_TIMEOUT", 0.05)
+    child = multiprocessing.get_context("fork").Process(target=_hold_lock_and_exit, args=(table._lock,))
+    child.start()
+    child.join()
+
+    assert not table.put("czbk", "h1", {"answer": "B"})
+    assert table.disabled
+    # 停用后不再返回可能过期的答案
+    assert table.get("czbk", "h1") is None
+    assert not table.put("czbk", "h2", {"answer": "C"})
+    assert table.stats()["disabled"]
+
+
+def test_writes_visible_across_fork(table):
+    ctx = multiprocessing.get_context("fork")
+    child = ctx.Process(target=table.put, args=("czbk", "h1", {"answer": "A"}))
+    child.start()
+    child.join()
+    assert child.exitcode == 0
+    assert table.get("czbk", "h1") == {"answer": "A"}
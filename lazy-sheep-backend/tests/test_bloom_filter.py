@@ -0,0 +1,118 @@
+"""
+共享双缓冲布隆过滤器单元测试
+"""
+import multiprocessing
+import os
+
+import pytest
+
+from api.utils import bloom_filter as bloom_filter_module
+from api.utils.bloom_filter import SharedBloomFilter
+
+
+@pytest.fixture
+def bloom():
+    return SharedBloomFilter(capacity=1000, error_rate=0.001)
+
+
+def _rebuild(bloom: SharedBloomFilter, items: list[tuple[str, str]]):
+    buffer = bloom.begin_rebuild()
+    bloom.add_to_buffer(buffer, items)
+    bloom.finish_rebuild(buffer)
+
+
+def test_unbuilt_filter_never_skips(bloom):
+    assert not bloom.built
+    assert bloom.might_contain("czbk", "missing")
+    assert bloom.stats()["checks"] == 0
+
+
+def test_empty_value_never_skips(bloom):
+    _rebuild(bloom, [])
+    assert bloom.might_contain("czbk", None)
+    assert bloom.might_contain("czbk", "")
+
+
+def test_rebuild_and_lookup(bloom):
+    _rebuild(bloom, [("czbk", f"h{i}") for i in range(100)])
+    assert bloom.built
+    assert all(bloom.might_contain("czbk", f"h{i}") for i in range(100))
+    assert not bloom.might_contain("czbk", "missing")
+    # 平台是键的一部分
+    assert not bloom.might_contain("other", "h1")
+    assert bloom.stats()["negatives"] == 2
+
+
+def test_add_after_build_is_visible(bloom):
+    _rebuild(bloom, [("czbk", "h1")])
+    bloom.add("czbk", "h2")
+    assert bloom.might_contain("czbk", "h2")
+
+
+def test_add_during_rebuild_survives_swap(bloom):
+    _rebuild(bloom, [("czbk", "h1")])
+    buffer = bloom.begin_rebuild()
+    bloom.add_to_buffer(buffer, [("czbk", "h1")])
+    # 重建期间其他worker新增的键写入两个缓冲区，切换后仍可见
+    bloom.add("czbk", "h2")
+    assert bloom.might_contain("czbk", "h2")
+    bloom.finish_rebuild(buffer)
+    assert bloom.might_contain("czbk", "h2")
+
+
+def test_rebuild_drops_removed_keys(bloom):
+    _rebuild(bloom, [("czbk", "h1"), ("czbk", "h2")])
+    _rebuild(bloom, [("czbk", "h1")])
+    assert bloom.might_contain("czbk", "h1")
+    assert not bloom.might_contain("czbk", "h2")
+
+
+def test_lookups_use_active_buffer_during_rebuild(bloom):
+    _rebuild(bloom, [("czbk", "h1")])
+    buffer = bloom.begin_rebuild()
+    # 非活动缓冲区已清空，但查询仍使用旧的活动缓冲区
+    assert bloom.might_contain("czbk", "h1")
+    bloom.finish_rebuild(buffer)
+    assert not bloom.might_contain("czbk", "h1")
+
+
+def test_try_claim_rebuild(bloom):
+    assert bloom.try_claim_rebuild(interval=3600)
+    # 已有worker认领重建，其他worker不再认领
+    assert not bloom.try_claim_rebuild(interval=3600)
+    _rebuild(bloom, [("czbk", "h1")])
+    # 刚构建完成，未到重建间隔
+    assert not bloom.try_claim_rebuild(interval=3600)
+
+
+def test_build_in_child_visible_to_parent(bloom):
+    ctx = multiprocessing.get_context("fork")
+    child = ctx.Process(target=_rebuild, args=(bloom, [("czbk", "h1")]))
+    child.start()
+    child.join()
+    assert child.exitcode == 0
+    assert bloom.built
+    assert bloom.might_contain("czbk", "h1")
+    assert not bloom.might_contain("czbk", "h2")
+
+
+def _hold_lock_and_exit(lock):
+    lock.acquire()
+    # 不释放锁直接退出，模拟worker在持锁期间被杀死
+    os._exit(0)
+
+
+def test_lock_timeout_disables_filter(bloom, monkeypatch):
+    _rebuild(bloom, [("czbk", "h1")])
+    monkeypatch.setattr(bloom_filter_module, "_LOCK_TIMEOUT", 0.05)
+    child = multiprocessing.get_context("fork").Process(target=_hold_lock_and_exit, args=(bloom._lock,))
+    child.start()
+    child.join()
+
+    bloom.add("czbk", "h2")
+    assert bloom.disabled
+    # 停用后一律判定为可能存在，新增的键不会被误判为不存在
+    assert bloom.might_contain("czbk", "h2")
+    assert bloom.begin_rebuild() is None
+    assert not bloom.try_claim_rebuild(interval=0)
+    assert bloom.stats()["disabled"]
@@ -0,0 +1,233 @@
+"""
+AI调用并发限制单元测试
+"""
+import asyncio
+import multiprocessing
+import os
+
+import pytest
+
+from api.utils.llm_limiter import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    GlobalPermits,
+    LimiterBusy,
+    LLMLimiter
+)
+
+
+async def _hold(limiter: LLMLimiter, release: asyncio.Event, order: list, name: str, priority: int = 0):
+    async with limiter.slot(priority, max_wait=5):
+        order.append(name)
+        await release.wait()
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_slot_limits_concurrency():
+    async def scenario():
+        limiter = LLMLimiter(2)
+        release = asyncio.Event()
+        order = []
+        tasks = [asyncio.create_task(_hold(limiter, release, order, str(i))) for i in range(3)]
+        await _settle()
+        running, depth = len(order), limiter.depth
+        release.set()
+        await asyncio.gather(*tasks)
+        return running, depth, limiter
+
+    running, depth, limiter = asyncio.run(scenario())
+    assert (running, depth) == (2, 1)
+    assert limiter.stats()["active"] == 0
+    assert limiter.acquired == 3
+
+
+def test_hand_off_by_priority_then_fifo():
+    async def scenario():
+        limiter = LLMLimiter(1)
+        release = asyncio.Event()
+        order = []
+        holder = asyncio.create_task(_hold(limiter, release, order, "holder"))
+        await _settle()
+        waiters = []
+        for name, priority in (("batch1", PRIORITY_BATCH), ("batch2", PRIORITY_BATCH),
+                               ("interactive1", PRIORITY_INTERACTIVE), ("interactive2", PRIORITY_INTERACTIVE)):
+            waiters.append(asyncio.create_task(_hold(limiter, release, order, name, priority)))
+            await _settle()
+        release.set()
+        await asyncio.gather(holder, *waiters)
+        return order, limiter
+
+    order, limiter = asyncio.run(scenario())
+    assert order == ["holder", "interactive1", "interactive2", "batch1", "batch2"]
+    assert limiter.stats()["active"] == 0
+
+
+def test_queue_timeout_raises_limiter_busy():
+    async def scenario():
+        limiter = LLMLimiter(1)
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(limiter, release, [], "holder"))
+        await _settle()
+        with pytest.raises(LimiterBusy) as exc_info:
+            async with limiter.slot(max_wait=0.05):
+                pass
+        depth = limiter.depth
+        release.set()
+        await holder
+        return exc_info.value, depth, limiter
+
+    error, depth, limiter = asyncio.run(scenario())
+    assert error.retry_after >= 1
+    assert depth == 0
+    assert limiter.rejected == 1
+    assert limiter.stats()["active"] == 0
+
+
+def test_cancel_while_queued_does_not_leak():
+    async def scenario():
+        limiter = LLMLimiter(1)
+        release = asyncio.Event()
+        order = []
+        holder = asyncio.create_task(_hold(limiter, release, order, "holder"))
+        await _settle()
+        waiter = asyncio.create_task(_hold(limiter, release, order, "cancelled"))
+        await _settle()
+        waiter.cancel()
+        await _settle()
+        release.set()
+        await holder
+        # 被取消的等待者不能占住槽位
+        async with limiter.slot(max_wait=0.1):
+            order.append("next")
+        return order, limiter
+
+    order, limiter = asyncio.run(scenario())
+    assert order == ["holder", "next"]
+    assert limiter.stats()["active"] == 0
+
+
+def test_cancel_after_hand_off_passes_slot_on():
+    async def scenario():
+        limiter = LLMLimiter(1)
+        release = asyncio.Event()
+        release.set()
+        order = []
+        assert limiter.try_acquire()
+        first = asyncio.create_task(_hold(limiter, release, order, "first"))
+        await _settle()
+        second = asyncio.create_task(_hold(limiter, release, order, "second"))
+        await _settle()
+        # 槽位转交给first后、first恢复运行前被取消：槽位继续转交给second
+        limiter.release()
+        first.cancel()
+        await asyncio.gather(first, second, return_exceptions=True)
+        return order, limiter
+
+    order, limiter = asyncio.run(scenario())
+    assert order == ["second"]
+    assert limiter.stats()["active"] == 0
+
+
+def test_try_acquire_and_release():
+    async def scenario():
+        limiter = LLMLimiter(1)
+        assert limiter.try_acquire()
+        assert not limiter.try_acquire()
+        release = asyncio.Event()
+        waiter = asyncio.create_task(_hold(limiter, release, [], "waiter"))
+        await _settle()
+        limiter.release()
+        await _settle()
+        # 槽位已转交给排队的请求
+        assert limiter.stats()["active"] == 1
+        assert not limiter.try_acquire()
+        release.set()
+        await waiter
+        return limiter
+
+    limiter = asyncio.run(scenario())
+    assert limiter.stats()["active"] == 0
+    assert limiter.try_acquire()
+    limiter.release()
+
+
+def test_global_limit_timeout_releases_local_slot():
+    async def scenario():
+        limiter = LLMLimiter(2, global_concurrency=1)
+        assert limiter._global.try_acquire()  # 其他worker占用全局许可
+        with pytest.raises(LimiterBusy):
+            async with limiter.slot(max_wait=0.05):
+                pass
+        limiter._global.release()
+        return limiter
+
+    limiter = asyncio.run(scenario())
+    assert limiter.stats()["active"] == 0
+
+
+def test_cancel_during_global_wait_releases_local_slot():
+    async def scenario():
+        limiter = LLMLimiter(1, global_concurrency=1)
+        assert limiter._global.try_acquire()
+        task = asyncio.create_task(_hold(limiter, asyncio.Event(), [], "waiter"))
+        await asyncio.sleep(0.05)
+        active = limiter.stats()["active"]
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        limiter._global.release()
+        return active, limiter
+
+    active, limiter = asyncio.run(scenario())
+    assert active == 1
+    assert limiter.stats()["active"] == 0
+    assert limiter.try_acquire()
+    limiter.release()
+
+
+def test_global_try_acquire_respects_limit():
+    permits = GlobalPermits(2)
+    assert permits.try_acquire()
+    assert permits.try_acquire()
+    assert not permits.try_acquire()
+    permits.release()
+    assert permits.try_acquire()
+
+
+def _acquire_and_exit(permits: GlobalPermits, count: int):
+    for _ in range(count):
+        permits.try_acquire()
+    # 不归还许可直接退出，模拟worker被杀死
+    os._exit(0)
+
+
+def test_reclaim_permits_of_dead_worker():
+    permits = GlobalPermits(3)
+    child = multiprocessing.get_context("fork").Process(target=_acquire_and_exit, args=(permits, 2))
+    child.start()
+    child.join()
+
+    assert permits.try_acquire()
+    assert not permits.try_acquire()
+    assert permits.reclaim(child.pid) == 2
+    # 重复调用不会多归还
+    assert permits.reclaim(child.pid) == 0
+    assert permits.try_acquire()
+    assert permits.try_acquire()
+    assert not permits.try_acquire()
+
+
+def test_reclaim_ignores_other_workers():
+    permits = GlobalPermits(2)
+    assert permits.try_acquire()
+    assert permits.reclaim(os.getpid() + 100000) == 0
+    assert permits.try_acquire()
+    assert not permits.try_acquire()
+
+
+def test_reclaim_without_global_limit():
+    assert LLMLimiter(2).reclaim(12345) == 0
@@ -0,0 +1,73 @@
+"""
+题库答案按选项文本映射单元测试
+"""
+from api.services.ai_service import AIService
+from api.utils.text_matcher import answer_option_texts, option_keys_and_texts
+
+OPTIONS = [
+    {"key": "A", "text": "北京"},
+    {"key": "B", "text": "上海"},
+    {"key": "C", "text": "广州"},
+    {"key": "D", "text": "深圳"}
+]
+SHUFFLED = [
+    {"key": "A", "text": "深圳"},
+    {"key": "B", "text": "广州"},
+    {"key": "C", "text": "北京"},
+    {"key": "D", "text": "上海"}
+]
+
+
+def test_option_keys_and_texts():
+    keys, texts = option_keys_and_texts([" 北京 ", "ＡＢＣ"])
+    assert keys == ["A", "B"]
+    # 去除空白、全角转半角
+    assert texts == ["北京", "abc"]
+    assert option_keys_and_texts(None) == ([], [])
+
+
+def test_answer_option_texts_single_and_multiple():
+    assert answer_option_texts("B", OPTIONS) == ["上海"]
+    assert answer_option_texts("C,A", OPTIONS) == ["北京", "广州"]
+    # "AC" 形式的多选答案
+    assert answer_option_texts("CA", OPTIONS) == ["北京", "广州"]
+    assert answer_option_texts(" A , C ", OPTIONS) == ["北京", "广州"]
+
+
+def test_answer_option_texts_unmappable():
+    assert answer_option_texts("E", OPTIONS) is None
+    assert answer_option_texts("A,E", OPTIONS) is None
+    assert answer_option_texts("", OPTIONS) is None
+    assert answer_option_texts(None, OPTIONS) is None
+    assert answer_option_texts("A", []) is None
+    # 选项文本重复时无法按文本对应
+    assert answer_option_texts("A", [{"key": "A", "text": "对"}, {"key": "B", "text": " 对"}]) is None
+
+
+def test_answer_option_texts_ignores_formatting():
+    formatted = [{"key": "A", "text": "北京。"}, {"key": "B", "text": "上　海"}]
+    plain = [{"key": "A", "text": "上海"}, {"key": "B", "text": "北京."}]
+    assert answer_option_texts("A", formatted) == answer_option_texts("B", plain)
+
+
+def test_remap_bank_answer_to_shuffled_options():
+    stored = {"answer": "A,B", "optionTexts": answer_option_texts("A,B", OPTIONS)}
+    assert AIService.remap_bank_answer(stored, "1", OPTIONS) == "A,B"
+    assert AIService.remap_bank_answer(stored, "1", SHUFFLED) == "C,D"
+
+
+def test_remap_bank_answer_without_option_texts():
+    # 旧题库记录没有optionTexts，不能直接使用题库字母
+    assert AIService.remap_bank_answer({"answer": "A"}, "0", SHUFFLED) is None
+
+
+def test_remap_bank_answer_options_do_not_match():
+    stored = {"answer": "A", "optionTexts": ["北京"]}
+    other = [{"key": "A", "text": "杭州"}, {"key": "B", "text": "上海"}]
+    assert AIService.remap_bank_answer(stored, "0", other) is None
+
+
+def test_remap_bank_answer_non_choice():
+    assert AIService.remap_bank_answer({"answer": "对"}, "2", None) == "对"
+    # 请求未带选项时原样返回
+    assert AIService.remap_bank_answer({"answer": "A"}, "0", None) == "A"
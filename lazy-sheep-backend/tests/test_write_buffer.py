@@ -0,0 +1,209 @@
+"""
+异步写入队列单元测试（落库函数用内存中的假实现代替）
+"""
+import asyncio
+
+from api.utils.write_buffer import WriteBehindBuffer
+
+
+def _question(content: str, answer: str = "A", confidence: float = 0.8) -> dict:
+    return {
+        "platform": "czbk",
+        "questionContent": content,
+        "answer": answer,
+        "source": "ai",
+        "confidence": confidence
+    }
+
+
+class FakeStore:
+    """按题目内容决定成功或失败的假落库函数"""
+
+    def __init__(self, bad: set[str] = (), batch_error: bool = False, item_ok: bool = True):
+        self.bad = set(bad)
+        self.batch_error = batch_error
+        self.item_ok = item_ok
+        self.batches: list[list[dict]] = []
+        self.items: list[dict] = []
+        self.saved: list[dict] = []
+
+    async def save_batch(self, items: list[dict]) -> list[dict]:
+        self.batches.append(items)
+        if self.batch_error:
+            raise RuntimeError("database is locked")
+        results = []
+        for item in items:
+            if item["questionContent"] in self.bad:
+                results.append({"status": "failed"})
+            else:
+                self.saved.append(item)
+                results.append({"status": "saved"})
+        return results
+
+    async def save_item(self, item: dict) -> bool:
+        self.items.append(item)
+        if not self.item_ok or item["questionContent"] in self.bad:
+            return False
+        self.saved.append(item)
+        return True
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_submit_before_start_is_rejected():
+    buffer = WriteBehindBuffer()
+    assert not buffer.submit(_question("q1"))
+
+
+def test_coalesces_and_keeps_highest_confidence():
+    async def scenario():
+        store = FakeStore()
+        buffer = WriteBehindBuffer(flush_interval=60)
+        buffer.start(store.save_batch)
+        assert buffer.submit(_question("q1", confidence=0.5))
+        assert buffer.submit(_question(" q1 ", confidence=0.9))
+        assert buffer.submit(_question("q1", confidence=0.7))
+        # 答案不同的写入不合并
+        assert buffer.submit(_question("q1", answer="B"))
+        await buffer.drain()
+        return store, buffer
+
+    store, buffer = _run(scenario())
+    assert len(store.saved) == 2
+    assert {item["answer"]: item["confidence"] for item in store.saved} == {"A": 0.9, "B": 0.8}
+    assert buffer.coalesced == 2
+    assert buffer.written == 2
+
+
+def test_rejects_when_full():
+    async def scenario():
+        buffer = WriteBehindBuffer(flush_interval=60, max_pending=2)
+        buffer.start(FakeStore().save_batch)
+        results = [buffer.submit(_question(f"q{i}")) for i in range(3)]
+        await buffer.drain()
+        return results, buffer
+
+    results, buffer = _run(scenario())
+    assert results == [True, True, False]
+    assert buffer.rejected == 1
+
+
+def test_batch_failure_retries_items_individually():
+    async def scenario():
+        store = FakeStore(bad={"q2"})
+        buffer = WriteBehindBuffer(flush_interval=60)
+        buffer.start(store.save_batch, store.save_item)
+        for i in range(3):
+            buffer.submit(_question(f"q{i}"))
+        await buffer.drain()
+        return store, buffer
+
+    store, buffer = _run(scenario())
+    assert {item["questionContent"] for item in store.saved} == {"q0", "q1"}
+    # 批量落库失败的一条逐条重试后仍失败，重新入队直到超过重试次数
+    assert buffer.written == 2
+    assert buffer.retried == buffer.max_retries + 1
+    assert buffer.requeued == buffer.max_retries
+    assert buffer.failed == 1
+    assert len(buffer) == 0
+
+
+def test_batch_exception_falls_back_to_item_handler():
+    async def scenario():
+        store = FakeStore(batch_error=True)
+        buffer = WriteBehindBuffer(flush_interval=60)
+        buffer.start(store.save_batch, store.save_item)
+        buffer.submit(_question("q1"))
+        buffer.submit(_question("q2"))
+        await buffer.drain()
+        return store, buffer
+
+    store, buffer = _run(scenario())
+    assert {item["questionContent"] for item in store.saved} == {"q1", "q2"}
+    assert buffer.written == 2
+    assert buffer.requeued == 0
+    assert buffer.failed == 0
+
+
+def test_requeue_then_drop_without_item_handler():
+    async def scenario():
+        store = FakeStore(batch_error=True)
+        buffer = WriteBehindBuffer(flush_interval=60, max_retries=2)
+        buffer.start(store.save_batch)
+        buffer.submit(_question("q1"))
+        await buffer.drain()
+        return store, buffer
+
+    store, buffer = _run(scenario())
+    # 首次落库 + 重试2次
+    assert len(store.batches) == 3
+    assert buffer.requeued == 2
+    assert buffer.failed == 1
+    assert buffer.written == 0
+    assert buffer._attempts == {}
+
+
+def test_transient_failure_recovers_and_resets_attempts():
+    async def scenario():
+        store = FakeStore(batch_error=True)
+        buffer = WriteBehindBuffer(flush_interval=60, max_retries=1)
+        buffer.start(store.save_batch)
+        buffer.submit(_question("q1"))
+        await buffer.flush()
+        assert len(buffer) == 1
+        store.batch_error = False
+        await buffer.flush()
+        await buffer.drain()
+        return store, buffer
+
+    store, buffer = _run(scenario())
+    assert [item["questionContent"] for item in store.saved] == ["q1"]
+    assert buffer.written == 1
+    assert buffer.failed == 0
+    assert buffer._attempts == {}
+
+
+def test_requeue_keeps_newer_higher_confidence_write():
+    async def scenario():
+        buffer = WriteBehindBuffer(flush_interval=60)
+
+        async def save_batch(items):
+            # 落库期间又提交了相同写入
+            buffer.submit(_question("q1", confidence=0.95))
+            return [{"status": "failed"} for _ in items]
+
+        buffer.start(save_batch)
+        buffer.submit(_question("q1", confidence=0.6))
+        await buffer.flush()
+        pending = list(buffer._pending.values())
+        buffer._closing = True
+        buffer._wakeup.set()
+        await buffer._task
+        return pending
+
+    pending = _run(scenario())
+    assert len(pending) == 1
+    assert pending[0]["confidence"] == 0.95
+
+
+def test_background_task_flushes_on_size():
+    async def scenario():
+        store = FakeStore()
+        buffer = WriteBehindBuffer(flush_size=2, flush_interval=60)
+        buffer.start(store.save_batch)
+        buffer.submit(_question("q1"))
+        buffer.submit(_question("q2"))
+        for _ in range(10):
+            await asyncio.sleep(0)
+            if store.saved:
+                break
+        saved = len(store.saved)
+        await buffer.drain()
+        return saved, buffer
+
+    saved, buffer = _run(scenario())
+    assert saved == 2
+    assert buffer.stats()["written"] == 2
+    assert not buffer.stats()["running"]